@@ -4,8 +4,10 @@ from django.utils.html import format_html
 from .models import (
     User, Category, Priority, Ticket, TicketComment, 
     TicketAttachment, TicketVote, TicketActivity, 
-    Notification, UserProfile
+    Notification, UserProfile, SLAPolicy, EmailOutbox,
+    BroadcastNotification
 )
+from .services import NotificationService
 
 
 @admin.register(User)
@@ -94,6 +96,31 @@ class PriorityAdmin(admin.ModelAdmin):
     tickets_count.short_description = 'Tickets'
 
 
+@admin.register(SLAPolicy)
+class SLAPolicyAdmin(admin.ModelAdmin):
+    """
+    SLA Policy admin
+    """
+    list_display = ['name', 'priority', 'category', 'first_response_minutes', 'resolution_minutes', 'is_active']
+    list_filter = ['is_active', 'priority', 'category']
+    search_fields = ['name']
+    readonly_fields = ['created_at', 'updated_at']
+    list_per_page = 25
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    """
+    Email Outbox admin
+    """
+    list_display = ['id', 'event', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'event', 'created_at']
+    search_fields = ['subject']
+    readonly_fields = ['created_at', 'sent_at', 'last_error']
+    ordering = ['-created_at']
+    list_per_page = 25
+
+
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
     """
@@ -103,7 +130,9 @@ class TicketAdmin(admin.ModelAdmin):
                    'created_by', 'assigned_to', 'votes_display', 'created_at']
     list_filter = ['status', 'priority', 'category', 'is_internal', 'created_at']
     search_fields = ['ticket_number', 'subject', 'description', 'created_by__username']
-    readonly_fields = ['ticket_number', 'created_at', 'updated_at', 'resolved_at', 'closed_at']
+    readonly_fields = ['ticket_number', 'created_at', 'updated_at', 'resolved_at', 'closed_at',
+                       'first_response_at', 'first_response_due_at', 'first_response_breached_at',
+                       'resolution_due_at', 'resolution_breached_at']
     date_hierarchy = 'created_at'
     list_per_page = 25
     list_select_related = ['created_by', 'assigned_to', 'category', 'priority']
@@ -122,6 +151,11 @@ class TicketAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at', 'resolved_at', 'closed_at'),
             'classes': ('collapse',)
         }),
+        ('SLA', {
+            'fields': ('first_response_at', 'first_response_due_at', 'first_response_breached_at',
+                       'resolution_due_at', 'resolution_breached_at'),
+            'classes': ('collapse',)
+        }),
     )
     
     def status_display(self, obj):
@@ -192,6 +226,21 @@ class TicketVoteAdmin(admin.ModelAdmin):
     list_filter = ['vote_type', 'created_at']
     search_fields = ['ticket__ticket_number', 'user__username']
     readonly_fields = ['created_at']
+    
+    # Votes edited here bypass TicketVoteService, so recount the affected tickets
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        obj.update_ticket_vote_counts()
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        obj.update_ticket_vote_counts()
+    
+    def delete_queryset(self, request, queryset):
+        votes_by_ticket = {vote.ticket_id: vote for vote in queryset.select_related('ticket')}
+        super().delete_queryset(request, queryset)
+        for vote in votes_by_ticket.values():
+            vote.update_ticket_vote_counts()
 
 
 @admin.register(TicketActivity)
@@ -220,16 +269,32 @@ class NotificationAdmin(admin.ModelAdmin):
     actions = ['mark_as_read', 'mark_as_unread']
     
     def mark_as_read(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
         updated = queryset.update(is_read=True)
+        NotificationService.recount_unread(user_ids)
         self.message_user(request, f'{updated} notifications marked as read.')
     mark_as_read.short_description = 'Mark selected notifications as read'
     
     def mark_as_unread(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
         updated = queryset.update(is_read=False)
+        NotificationService.recount_unread(user_ids)
         self.message_user(request, f'{updated} notifications marked as unread.')
     mark_as_unread.short_description = 'Mark selected notifications as unread'
 
 
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    """
+    Broadcast Notification admin
+    """
+    list_display = ['title', 'audience', 'notification_type', 'ticket', 'created_at']
+    list_filter = ['audience', 'notification_type', 'created_at']
+    search_fields = ['title', 'message', 'ticket__ticket_number']
+    readonly_fields = ['created_at']
+    date_hierarchy = 'created_at'
+
+
 # Customize admin site headers
 admin.site.site_header = 'QuickDesk Administration'
 admin.site.site_title = 'QuickDesk Admin'
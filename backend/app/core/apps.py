@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app.core'
+
+    def ready(self):
+        from .search import ensure_search_index
+        from .services import NotificationService, TicketChangeService, TicketRollupService
+        post_migrate.connect(ensure_search_index, sender=self)
+        post_delete.connect(TicketRollupService.ticket_deleted, sender=self.get_model('Ticket'))
+        post_delete.connect(TicketChangeService.ticket_deleted, sender=self.get_model('Ticket'))
+        post_delete.connect(NotificationService.notification_deleted, sender=self.get_model('Notification'))
+        post_delete.connect(NotificationService.broadcast_deleted, sender=self.get_model('BroadcastNotification'))
@@ -0,0 +1,64 @@
+"""
+Conditional GET support (ETag / Last-Modified) for polled endpoints
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """
+    Build a quoted ETag from the given validator parts
+    """
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+class ConditionalGetMixin:
+    """
+    Answer list and retrieve requests with 304 Not Modified when the client's
+    validators still match, without loading or serializing the rows.
+
+    Views implement ``get_list_validators()`` and ``get_object_validators()``
+    returning ``(etag, last_modified)`` from a cheap query, or ``None`` to
+    skip the check.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.get_list_validators, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.get_object_validators, super().retrieve, *args, **kwargs)
+
+    def get_list_validators(self):
+        return None
+
+    def get_object_validators(self):
+        return None
+
+    def validator_parts(self):
+        """
+        Request state that changes the representation besides the rows themselves
+        """
+        user = self.request.user
+        return [user.pk, user.role, self.request.get_full_path()]
+
+    def conditional_response(self, request, get_validators, handler, *args, **kwargs):
+        validators = get_validators()
+        if validators is None:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            # Representations differ per user, so shared caches must revalidate
+            response['Cache-Control'] = 'private, no-cache'
+        return response
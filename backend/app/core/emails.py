@@ -0,0 +1,104 @@
+"""
+Notification email rendering for QuickDesk
+"""
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils.autoreload import file_changed
+from django.utils.html import strip_tags
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def compiled_template(template_name):
+    """
+    Load and compile an email template once per process, or None if it does not exist
+    """
+    try:
+        return get_template(template_name)
+    except TemplateDoesNotExist:
+        return None
+
+
+def clear_template_cache(**kwargs):
+    # The development autoreloader swaps edited templates in without restarting
+    compiled_template.cache_clear()
+
+
+file_changed.connect(clear_template_cache)
+
+
+class EmailRenderer:
+    """
+    Renders each notification event once into its HTML and plain-text parts.
+    ``emails/<event>.txt`` provides the text part; events without one fall back
+    to stripping the HTML.
+    """
+
+    _lock = threading.Lock()
+    # event -> [renders, total seconds, slowest seconds]
+    _timings = {}
+
+    @staticmethod
+    def base_context():
+        options = settings.QUICKDESK_SETTINGS
+        return {
+            'site_name': options.get('SITE_NAME', 'QuickDesk'),
+            'site_url': options.get('SITE_URL', 'http://localhost:3000'),
+        }
+
+    @classmethod
+    def render(cls, event, context):
+        """
+        Render the email for ``event``. Returns an (html, text) tuple that is shared
+        by every recipient of the event.
+        """
+        started = time.perf_counter()
+        context = {**cls.base_context(), **context}
+
+        html_template = compiled_template(f'emails/{event}.html')
+        if html_template is None:
+            raise TemplateDoesNotExist(f'emails/{event}.html')
+        html = html_template.render(context)
+
+        text_template = compiled_template(f'emails/{event}.txt')
+        text = text_template.render(context).strip() + '\n' if text_template else strip_tags(html)
+
+        cls.record_timing(event, time.perf_counter() - started)
+        return html, text
+
+    @classmethod
+    def record_timing(cls, event, elapsed):
+        with cls._lock:
+            timing = cls._timings.setdefault(event, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] = max(timing[2], elapsed)
+        logger.debug("Rendered %s email in %.2f ms", event, elapsed * 1000)
+
+    @classmethod
+    def render_stats(cls):
+        """
+        Render counts and timings in milliseconds per event for this process
+        """
+        with cls._lock:
+            return {
+                event: {
+                    'renders': renders,
+                    'total_ms': round(total * 1000, 3),
+                    'avg_ms': round(total * 1000 / renders, 3),
+                    'max_ms': round(slowest * 1000, 3),
+                }
+                for event, (renders, total, slowest) in cls._timings.items()
+            }
+
+    @classmethod
+    def reset_stats(cls):
+        with cls._lock:
+            cls._timings.clear()
@@ -0,0 +1,270 @@
+"""
+Publish/subscribe of ticket and notification events for push streams
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One stream's queue of events. Events are handed over from any thread onto the
+    subscriber's event loop; when a slow client falls behind, the oldest are dropped.
+    """
+
+    def __init__(self, backend, loop, max_queued):
+        self.backend = backend
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queued)
+        self.dropped = 0
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """
+        Next event, or None if nothing arrived within ``timeout`` seconds
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class EventBackend:
+    """
+    Keeps the subscribers of this process. Subclasses decide how a published
+    event reaches ``dispatch()`` in every process.
+    """
+
+    def __init__(self, options=None):
+        self.options = options or {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, loop=None):
+        subscription = Subscription(
+            self, loop or asyncio.get_running_loop(), self.options.get('max_queued', 100)
+        )
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # The subscriber's event loop has shut down
+                self.unsubscribe(subscription)
+
+    def publish(self, event):
+        raise NotImplementedError
+
+
+class InProcessBackend(EventBackend):
+    """
+    Delivers events to streams served by the same process only
+    """
+
+    def publish(self, event):
+        self.dispatch(event)
+
+
+class PostgresBackend(EventBackend):
+    """
+    Shares events between processes with PostgreSQL LISTEN/NOTIFY. Each process
+    runs one listener thread on its own connection, started by the first subscriber.
+    """
+    channel = 'quickdesk_events'
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        self._listener = None
+
+    def publish(self, event):
+        payload = json.dumps(event, cls=DjangoJSONEncoder, separators=(',', ':'))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def subscribe(self, loop=None):
+        subscription = super().subscribe(loop)
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self.listen, name='quickdesk-events', daemon=True)
+                self._listener.start()
+        return subscription
+
+    def listen(self):
+        import psycopg2
+
+        while True:
+            try:
+                listener = psycopg2.connect(**connection.get_connection_params())
+                listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([listener], [], [], 30) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        notify = listener.notifies.pop(0)
+                        self.dispatch(json.loads(notify.payload))
+            except Exception:
+                logger.exception("Event listener connection lost, reconnecting")
+                threading.Event().wait(1)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    The process-wide backend named by QUICKDESK_SETTINGS['EVENT_BACKEND']
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                options = settings.QUICKDESK_SETTINGS
+                backend_class = import_string(options.get('EVENT_BACKEND', 'app.core.events.InProcessBackend'))
+                _backend = backend_class({'max_queued': options.get('EVENT_STREAM_MAX_QUEUED', 100)})
+    return _backend
+
+
+def publish(event):
+    """
+    Publish an event once the current transaction commits
+    """
+    def send():
+        try:
+            get_backend().publish(event)
+        except Exception:
+            # Push is best effort; clients catch up from the REST endpoints
+            logger.exception("Failed to publish %s event", event.get('type'))
+
+    transaction.on_commit(send)
+
+
+def publish_ticket_changed(ticket, action, staff_only=False):
+    publish_ticket_values({
+        'id': ticket.pk,
+        'ticket_number': ticket.ticket_number,
+        'status': ticket.status,
+        'created_by_id': ticket.created_by_id,
+        'assigned_to_id': ticket.assigned_to_id,
+        'is_internal': ticket.is_internal,
+    }, action, staff_only)
+
+
+def publish_ticket_values(values, action, staff_only=False):
+    """
+    Same as publish_ticket_changed, from a ``.values()`` row of the ticket.
+    ``staff_only`` events, such as internal notes, aren't sent to customers.
+    """
+    publish({
+        'type': 'ticket.changed',
+        'action': action,
+        'staff_only': staff_only,
+        'ticket': {
+            'id': str(values['id']),
+            'ticket_number': values['ticket_number'],
+            'status': values['status'],
+            'created_by': str(values['created_by_id']),
+            'assigned_to': str(values['assigned_to_id']) if values['assigned_to_id'] else None,
+            'is_internal': values['is_internal'],
+        },
+    })
+
+
+# NOTIFY payloads are limited to 8000 bytes, so long recipient lists are split
+RECIPIENTS_PER_EVENT = 100
+
+
+def publish_notification(ticket, notification_type, title, user_ids=None, audience=None, excluded_user_id=None):
+    """
+    Announce a notification to its recipients: a list of user ids, or a broadcast audience
+    """
+    notification = {
+        'notification_type': notification_type,
+        'title': title,
+        'ticket_id': str(ticket.pk),
+        'ticket_number': ticket.ticket_number,
+    }
+    if audience is not None:
+        publish({
+            'type': 'notification',
+            'audience': audience,
+            'excluded_user': str(excluded_user_id) if excluded_user_id else None,
+            'notification': notification,
+        })
+        return
+
+    user_ids = [str(user_id) for user_id in user_ids]
+    for start in range(0, len(user_ids), RECIPIENTS_PER_EVENT):
+        publish({
+            'type': 'notification',
+            'user_ids': user_ids[start:start + RECIPIENTS_PER_EVENT],
+            'notification': notification,
+        })
+
+
+def is_visible(user, event):
+    """
+    Whether ``user`` may receive ``event``, using the same rules as the REST endpoints
+    """
+    from .models import BroadcastNotification
+
+    user_id = str(user.pk)
+    if event['type'] == 'notification':
+        if 'audience' in event:
+            return (
+                event['audience'] in BroadcastNotification.audiences_for(user) and
+                event['excluded_user'] != user_id
+            )
+        return user_id in event['user_ids']
+
+    if event['type'] == 'ticket.changed':
+        ticket = event['ticket']
+        if user.role == 'admin':
+            return True
+        if ticket['is_internal']:
+            return False
+        if user.role == 'agent':
+            return True
+        return not event.get('staff_only') and ticket['created_by'] == user_id
+
+    return False
+
+
+def client_payload(event):
+    """
+    The part of an event sent to clients, without the routing fields
+    """
+    return {key: value for key, value in event.items() if key not in ('user_ids', 'audience', 'excluded_user', 'staff_only')}
@@ -0,0 +1,165 @@
+"""
+Idempotency-Key support for POST endpoints that clients retry
+"""
+import functools
+import hashlib
+import json
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.http.request import RawPostDataException
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """
+    Hash of what makes a retry the same request: method, path and body
+    """
+    digest = hashlib.sha256()
+    for part in (request.method, request.get_full_path(), request.content_type or ''):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    try:
+        body = request.body
+    except RawPostDataException:
+        # Multipart bodies were already streamed into request.data
+        body = json.dumps(request.data, sort_keys=True, default=str).encode()
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def in_progress():
+    return Response(
+        {'error': f'A request with this {HEADER} is still in progress'},
+        status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'}
+    )
+
+
+def claim(user, key, fingerprint):
+    """
+    Take the key for this request. Returns ``(record, None)`` when this request
+    should run, or ``(None, response)`` with the response to answer instead.
+    """
+    from .models import IdempotencyKey
+
+    options = settings.QUICKDESK_SETTINGS
+    now = timezone.now()
+
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, key=key, request_hash=fingerprint), None
+    except IntegrityError:
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is None:
+        # Released by a failed first request just now
+        return None, in_progress()
+
+    expired = record.created_at < now - timedelta(hours=options.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    # A view's writes commit together with its stored response, so a claim left
+    # without one never wrote anything and can be taken over
+    abandoned = record.status_code is None and (
+        record.created_at < now - timedelta(seconds=options.get('IDEMPOTENCY_LOCK_SECONDS', 60))
+    )
+    if expired or abandoned:
+        taken = IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).update(
+            request_hash=fingerprint, status_code=None, response_body=None, created_at=now
+        )
+        if not taken:
+            return None, in_progress()
+        record.request_hash, record.status_code, record.response_body, record.created_at = fingerprint, None, None, now
+        return record, None
+
+    if record.request_hash != fingerprint:
+        return None, Response(
+            {'error': f'This {HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record.status_code is None:
+        return None, in_progress()
+    return None, Response(record.response_body, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def refresh(record_pk):
+    """
+    Move a running claim's start to now, so retries keep waiting for it
+    """
+    from .models import IdempotencyKey
+
+    return IdempotencyKey.objects.filter(pk=record_pk, status_code__isnull=True).update(created_at=timezone.now())
+
+
+def keep_alive(record_pk, stopped, interval):
+    """
+    Refresh a claim every ``interval`` seconds until ``stopped`` is set. Runs in
+    its own thread, so each refresh commits outside the view's transaction.
+    """
+    try:
+        while not stopped.wait(interval):
+            try:
+                refresh(record_pk)
+            except DatabaseError:
+                # SQLite has one writer at a time; the view's transaction may hold it
+                pass
+    finally:
+        connection.close()
+
+
+def idempotent(view_method):
+    """
+    Run a view method at most once per ``Idempotency-Key`` and user. The method's
+    writes and its stored response commit in one transaction; retries with the
+    same key and body get the stored response back. Exceptions and 5xx responses
+    roll back and release the key. Requests without the header run as usual.
+
+    While the method runs, its claim is refreshed every third of
+    IDEMPOTENCY_LOCK_SECONDS, so only the claim of a process that died can be
+    taken over by a retry, however long the request takes.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        record, response = claim(request.user, key, request_fingerprint(request))
+        if response is not None:
+            return response
+
+        stopped = threading.Event()
+        lock_seconds = settings.QUICKDESK_SETTINGS.get('IDEMPOTENCY_LOCK_SECONDS', 60)
+        heartbeat = threading.Thread(
+            target=keep_alive, args=(record.pk, stopped, lock_seconds / 3), name='quickdesk-idempotency', daemon=True
+        )
+        heartbeat.start()
+        try:
+            with transaction.atomic():
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code >= 500:
+                    transaction.set_rollback(True)
+                else:
+                    record.status_code = response.status_code
+                    record.response_body = response.data
+                    record.save(update_fields=['status_code', 'response_body'])
+        except Exception:
+            record.delete()
+            raise
+        finally:
+            stopped.set()
+            heartbeat.join()
+        if response.status_code >= 500:
+            record.delete()
+        return response
+
+    return wrapper
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Subquery
+from app.core.models import Ticket, TicketComment
+
+
+class Command(BaseCommand):
+    help = 'Fill in Ticket.first_response_at from the first public agent comment'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of tickets to update per statement',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        agent_replies = TicketComment.objects.filter(
+            ticket=OuterRef('pk'), created_by__role='agent', is_internal=False
+        )
+        first_response = agent_replies.order_by('created_at').values('created_at')[:1]
+        last_pk = None
+        scanned = 0
+        updated = 0
+
+        while True:
+            # Walk the table by primary key so each chunk is an index range scan
+            chunk = Ticket.objects.filter(first_response_at__isnull=True).order_by('pk')
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            ticket_ids = list(chunk.values_list('pk', flat=True)[:chunk_size])
+            if not ticket_ids:
+                break
+            last_pk = ticket_ids[-1]
+
+            # One set-based UPDATE per chunk; rows set concurrently by add_comment are skipped
+            updated += Ticket.objects.filter(
+                Exists(agent_replies), pk__in=ticket_ids, first_response_at__isnull=True
+            ).update(first_response_at=Subquery(first_response))
+            scanned += len(ticket_ids)
+            self.stdout.write(f"Scanned {scanned} tickets")
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully backfilled first responses on {updated} of {scanned} tickets'
+        ))
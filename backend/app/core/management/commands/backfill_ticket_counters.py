@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from app.core.models import Ticket, TicketComment, TicketAttachment, TicketActivity
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized activity counters on tickets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of tickets to recompute per transaction',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        fields = ['comment_count', 'attachment_count', 'last_activity_at', 'last_commenter_role']
+        last_pk = None
+        updated = 0
+
+        while True:
+            # Walk the table by primary key so each chunk is an index range scan
+            chunk = Ticket.objects.order_by('pk')
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            last_commenter = TicketComment.objects.filter(
+                ticket=OuterRef('pk')
+            ).order_by('-created_at').values('created_by__role')[:1]
+            # Lock the chunk so concurrent comments aren't lost by bulk_update
+            with transaction.atomic():
+                tickets = list(
+                    chunk.annotate(latest_commenter_role=Subquery(last_commenter))
+                    .only('pk', 'created_at').select_for_update()[:chunk_size]
+                )
+                if not tickets:
+                    break
+                last_pk = tickets[-1].pk
+                ticket_ids = [ticket.pk for ticket in tickets]
+
+                comments = {
+                    row['ticket_id']: row for row in
+                    TicketComment.objects.filter(ticket_id__in=ticket_ids).order_by()
+                    .values('ticket_id').annotate(count=Count('id'), latest=Max('created_at'))
+                }
+                attachments = {
+                    row['ticket_id']: row for row in
+                    TicketAttachment.objects.filter(ticket_id__in=ticket_ids).order_by()
+                    .values('ticket_id').annotate(count=Count('id'), latest=Max('created_at'))
+                }
+                activities = dict(
+                    TicketActivity.objects.filter(ticket_id__in=ticket_ids).order_by()
+                    .values('ticket_id').annotate(latest=Max('created_at')).values_list('ticket_id', 'latest')
+                )
+
+                for ticket in tickets:
+                    comment_row = comments.get(ticket.pk, {})
+                    attachment_row = attachments.get(ticket.pk, {})
+                    timestamps = [
+                        ticket.created_at,
+                        comment_row.get('latest'),
+                        attachment_row.get('latest'),
+                        activities.get(ticket.pk),
+                    ]
+                    ticket.comment_count = comment_row.get('count', 0)
+                    ticket.attachment_count = attachment_row.get('count', 0)
+                    ticket.last_activity_at = max(ts for ts in timestamps if ts)
+                    ticket.last_commenter_role = ticket.latest_commenter_role
+
+                Ticket.objects.bulk_update(tickets, fields)
+            updated += len(tickets)
+            self.stdout.write(f"Recomputed counters for {updated} tickets")
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully backfilled {updated} tickets'))
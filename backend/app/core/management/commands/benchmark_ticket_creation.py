@@ -0,0 +1,89 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from app.core.models import User, Category, Priority, Ticket
+from app.core.services import TicketService
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent ticket creation through TicketService.create_ticket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=500, help='Number of tickets to create')
+        parser.add_argument('--workers', type=int, default=8, help='Number of concurrent worker threads')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark tickets afterwards')
+
+    def handle(self, *args, **options):
+        total = options['tickets']
+        workers = max(1, options['workers'])
+
+        priority = Priority.objects.order_by('level').first()
+        if not priority:
+            raise CommandError('No priorities found. Run "python manage.py populate_defaults" first.')
+
+        user, created = User.objects.get_or_create(
+            username='benchmark_agent',
+            defaults={'role': 'agent', 'email_notifications': False}
+        )
+        if created:
+            user.set_unusable_password()
+            user.save()
+        category, _ = Category.objects.get_or_create(
+            name='Benchmark',
+            defaults={'description': 'Tickets created by benchmark_ticket_creation', 'created_by': user}
+        )
+
+        ticket_ids = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(count):
+            try:
+                for _ in range(count):
+                    try:
+                        ticket = TicketService.create_ticket({
+                            'subject': 'Benchmark ticket',
+                            'description': 'Created by benchmark_ticket_creation',
+                            'category': category,
+                            'priority': priority,
+                        }, user)
+                        with lock:
+                            ticket_ids.append(ticket.id)
+                    except Exception as e:
+                        with lock:
+                            errors.append(e)
+            finally:
+                connection.close()
+
+        shares = [total // workers + (1 if i < total % workers else 0) for i in range(workers)]
+        threads = [threading.Thread(target=worker, args=(share,)) for share in shares if share]
+
+        # Keep notification emails in memory while benchmarking
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+        numbers = list(Ticket.objects.filter(id__in=ticket_ids).values_list('ticket_number', flat=True))
+        duplicates = len(numbers) - len(set(numbers))
+
+        self.stdout.write(f"Created {len(ticket_ids)} tickets with {len(threads)} workers in {elapsed:.2f}s")
+        if elapsed > 0:
+            self.stdout.write(f"Throughput: {len(ticket_ids) / elapsed:.1f} tickets/s")
+        self.stdout.write(f"Errors: {len(errors)}")
+        for error in errors[:5]:
+            self.stdout.write(f"  {type(error).__name__}: {error}")
+        self.stdout.write(f"Duplicate ticket numbers: {duplicates}")
+
+        if not options['keep']:
+            Ticket.objects.filter(id__in=ticket_ids).delete()
+
+        if errors or duplicates:
+            raise CommandError('Benchmark finished with errors')
+        self.stdout.write(self.style.SUCCESS('Benchmark completed successfully'))
@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from app.core.models import User, Category, Priority, Ticket, TicketVote
+from app.core.services import TicketService, TicketVoteService
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark concurrent voting on one ticket through TicketVoteService and check '
+        'that the vote counts match the stored votes afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=2000, help='Number of votes to cast')
+        parser.add_argument('--workers', type=int, default=8, help='Number of concurrent worker threads')
+        parser.add_argument('--voters', type=int, default=50, help='Number of distinct voting users')
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=None,
+            help='Override VOTE_COUNTER_SHARDS; the ticket is sharded from its first vote',
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark ticket and voters afterwards')
+
+    def handle(self, *args, **options):
+        total = options['votes']
+        workers = max(1, options['workers'])
+
+        priority = Priority.objects.order_by('level').first()
+        if not priority:
+            raise CommandError('No priorities found. Run "python manage.py populate_defaults" first.')
+
+        owner, _ = User.objects.get_or_create(
+            username='benchmark_agent',
+            defaults={'role': 'agent', 'email_notifications': False}
+        )
+        category, _ = Category.objects.get_or_create(
+            name='Benchmark',
+            defaults={'description': 'Tickets created by benchmarks', 'created_by': owner}
+        )
+        voters = []
+        for index in range(max(1, options['voters'])):
+            voter, created = User.objects.get_or_create(
+                username=f'benchmark_voter_{index}',
+                defaults={'role': 'customer', 'email_notifications': False}
+            )
+            if created:
+                voter.set_unusable_password()
+                voter.save()
+            voters.append(voter)
+
+        overrides = {'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend'}
+        if options['shards'] is not None:
+            from django.conf import settings
+            overrides['QUICKDESK_SETTINGS'] = {
+                **settings.QUICKDESK_SETTINGS,
+                'VOTE_COUNTER_SHARDS': options['shards'],
+                'VOTE_SHARDING_THRESHOLD': 0,
+            }
+
+        errors = []
+        results = Counter()
+        lock = threading.Lock()
+
+        with override_settings(**overrides):
+            ticket = TicketService.create_ticket({
+                'subject': 'Benchmark ticket',
+                'description': 'Created by benchmark_ticket_votes',
+                'category': category,
+                'priority': priority,
+            }, owner)
+
+            def worker(count, seed):
+                rng = random.Random(seed)
+                try:
+                    for _ in range(count):
+                        try:
+                            # Voters repeat, so votes are added, switched and removed concurrently
+                            result = TicketVoteService.cast_vote(
+                                ticket, rng.choice(voters), rng.choice(('up', 'down'))
+                            )
+                            with lock:
+                                results[result] += 1
+                        except Exception as e:
+                            with lock:
+                                errors.append(e)
+                finally:
+                    connection.close()
+
+            shares = [total // workers + (1 if i < total % workers else 0) for i in range(workers)]
+            threads = [threading.Thread(target=worker, args=(share, i)) for i, share in enumerate(shares) if share]
+
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            TicketVoteService.flush_shards([ticket.pk])
+
+        ticket.refresh_from_db(fields=['upvotes', 'downvotes'])
+        stored = Counter(TicketVote.objects.filter(ticket=ticket).values_list('vote_type', flat=True))
+        mismatch = ticket.upvotes != stored['up'] or ticket.downvotes != stored['down']
+
+        cast = sum(results.values())
+        self.stdout.write(f"Cast {cast} votes with {len(threads)} workers in {elapsed:.2f}s")
+        if elapsed > 0:
+            self.stdout.write(f"Throughput: {cast / elapsed:.1f} votes/s")
+        self.stdout.write(
+            f"Added {results['added']}, changed {results['changed']}, removed {results['removed']}"
+        )
+        self.stdout.write(f"Errors: {len(errors)}")
+        for error in errors[:5]:
+            self.stdout.write(f"  {type(error).__name__}: {error}")
+        self.stdout.write(
+            f"Ticket counts: {ticket.upvotes} up / {ticket.downvotes} down, "
+            f"stored votes: {stored['up']} up / {stored['down']} down"
+        )
+
+        if not options['keep']:
+            ticket.delete()
+            User.objects.filter(pk__in=[voter.pk for voter in voters]).delete()
+
+        if mismatch:
+            raise CommandError('Vote counts do not match the stored votes')
+        if errors:
+            raise CommandError('Benchmark finished with errors')
+        self.stdout.write(self.style.SUCCESS('Benchmark completed successfully'))
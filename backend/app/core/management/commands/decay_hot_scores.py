@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from app.core.services import TicketVoteService
+
+
+class Command(BaseCommand):
+    help = 'Re-decay the trending hot scores of voted tickets in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Tickets updated per statement')
+        parser.add_argument('--poll-interval', type=float, default=300.0, help='Seconds between passes')
+        parser.add_argument('--once', action='store_true', help='Run one pass, then exit')
+
+    def handle(self, *args, **options):
+        passes = 0
+        try:
+            while True:
+                decayed = TicketVoteService.decay_hot_scores(chunk_size=max(1, options['chunk_size']))
+                passes += 1
+                if decayed:
+                    self.stdout.write(f"Decayed hot scores of {decayed} tickets")
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Hot score decay stopped after {passes} passes'))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from app.core.services import TicketVoteService
+
+
+class Command(BaseCommand):
+    help = 'Fold sharded vote count deltas (VOTE_COUNTER_SHARDS) into the ticket vote counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds between flushes')
+        parser.add_argument('--once', action='store_true', help='Flush once, then exit')
+
+    def handle(self, *args, **options):
+        flushed = 0
+        try:
+            while True:
+                flushed += TicketVoteService.flush_shards()
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Flushed vote counts of {flushed} tickets'))
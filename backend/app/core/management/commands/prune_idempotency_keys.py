@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from app.core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL_HOURS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=settings.QUICKDESK_SETTINGS.get('IDEMPOTENCY_KEY_TTL_HOURS', 24),
+            help='Keep keys from the last N hours',
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(hours=options['hours'])
+        deleted, _ = IdempotencyKey.objects.filter(created_at__lt=before).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} idempotency keys older than {options["hours"]} hours'))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from app.core.services import TicketChangeService
+
+
+class Command(BaseCommand):
+    help = 'Delete ticket change log entries older than the retention period of the changes feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.QUICKDESK_SETTINGS.get('TICKET_CHANGES_RETENTION_DAYS', 30),
+            help='Keep changes from the last N days (clients with older cursors must resync)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per statement',
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        deleted = TicketChangeService.prune(before, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} ticket changes older than {options["days"]} days'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from app.core.search import install_sqlite_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate and repopulate the SQLite full-text ticket index (PostgreSQL keeps its index in sync by itself)'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f'Nothing to do on {connection.vendor}: search_vector is a generated column')
+            return
+
+        # Needed after VACUUM, which may renumber the rowids the index is keyed by
+        install_sqlite_search_index(connection, rebuild=True)
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt the ticket search index'))
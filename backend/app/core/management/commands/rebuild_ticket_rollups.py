@@ -0,0 +1,117 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from app.core.models import Ticket, TicketActivity, TicketDailyStat
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily ticket rollup from ticket history. Status changes are replayed from the '
+        'activity log; category, priority, assignee and visibility are taken at their current values.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of tickets to read per query',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        statuses = {choice[0] for choice in Ticket.STATUS_CHOICES}
+        # (day, category, priority, assignee, status, is_internal) -> [created, resolved, entered, left]
+        totals = defaultdict(lambda: [0, 0, 0, 0])
+        last_pk = None
+        processed = 0
+
+        while True:
+            chunk = Ticket.objects.order_by('pk')
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            tickets = list(chunk.values(
+                'pk', 'status', 'category_id', 'priority_id', 'assigned_to_id', 'is_internal',
+                'created_at', 'updated_at', 'resolved_at', 'closed_at'
+            )[:chunk_size])
+            if not tickets:
+                break
+            last_pk = tickets[-1]['pk']
+
+            transitions = defaultdict(list)
+            activities = TicketActivity.objects.filter(
+                ticket_id__in=[ticket['pk'] for ticket in tickets], action='status_changed'
+            ).order_by('created_at').values_list('ticket_id', 'created_at', 'old_value', 'new_value')
+            for ticket_id, changed_at, old_status, new_status in activities:
+                if old_status in statuses and new_status in statuses:
+                    transitions[ticket_id].append((changed_at, old_status, new_status))
+
+            for ticket in tickets:
+                self.replay(ticket, transitions[ticket['pk']] or self.infer_transitions(ticket), totals)
+            processed += len(tickets)
+            self.stdout.write(f"Replayed {processed} tickets")
+
+        rows = [
+            TicketDailyStat(
+                day=day, category_id=category_id, priority_id=priority_id, assigned_to_id=assigned_to_id,
+                status=status, is_internal=is_internal,
+                created=created, resolved=resolved, entered=entered, left=left
+            )
+            for (day, category_id, priority_id, assigned_to_id, status, is_internal), (created, resolved, entered, left)
+            in totals.items()
+        ]
+        with transaction.atomic():
+            TicketDailyStat.objects.all().delete()
+            TicketDailyStat.objects.bulk_create(rows, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {len(rows)} rollup rows from {processed} tickets'))
+
+    @staticmethod
+    def infer_transitions(ticket):
+        """
+        Status path for tickets without logged status changes, from their timestamps
+        """
+        path = []
+        if ticket['status'] == 'open':
+            return path
+        current = 'open'
+        for status, changed_at in (('resolved', ticket['resolved_at']), ('closed', ticket['closed_at'])):
+            if changed_at:
+                path.append((changed_at, current, status))
+                current = status
+        if current != ticket['status']:
+            path.append((ticket['updated_at'], current, ticket['status']))
+        return path
+
+    @staticmethod
+    def replay(ticket, transitions, totals):
+        def key(day, status):
+            return (
+                timezone.localdate(day), ticket['category_id'], ticket['priority_id'],
+                ticket['assigned_to_id'], status, ticket['is_internal']
+            )
+
+        status = transitions[0][1] if transitions else ticket['status']
+        row = totals[key(ticket['created_at'], status)]
+        row[0] += 1
+        row[2] += 1
+        if status == 'resolved':
+            row[1] += 1
+
+        # Close any gap left by unlogged changes with a final move at updated_at
+        path = list(transitions)
+        final = path[-1][2] if path else status
+        if final != ticket['status']:
+            path.append((ticket['updated_at'], final, ticket['status']))
+
+        for changed_at, _, new_status in path:
+            if new_status == status:
+                continue
+            totals[key(changed_at, status)][3] += 1
+            row = totals[key(changed_at, new_status)]
+            row[2] += 1
+            if new_status == 'resolved':
+                row[1] += 1
+            status = new_status
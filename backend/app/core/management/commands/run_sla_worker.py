@@ -0,0 +1,143 @@
+import heapq
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from app.core.models import SLAPolicy, Ticket
+from app.core.services import SLAService
+
+
+class Command(BaseCommand):
+    help = (
+        'Watch SLA deadlines and send breach notifications. Deadlines are kept in a min-heap; '
+        'after the initial load only tickets changed since the last poll are re-read.'
+    )
+
+    SLA_FIELDS = (
+        'id', 'status', 'first_response_at',
+        'first_response_due_at', 'resolution_due_at',
+        'first_response_breached_at', 'resolution_breached_at',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=0.5,
+            help='Seconds between polls for changed tickets (bounds breach latency)',
+        )
+        parser.add_argument(
+            '--settle-seconds',
+            type=float,
+            default=5.0,
+            help='Overlap between polls so rows committed late are still picked up',
+        )
+        parser.add_argument(
+            '--recompute',
+            action='store_true',
+            help='Recompute deadlines of open tickets first, e.g. after editing SLA policies',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process deadlines that are already due, then exit',
+        )
+
+    def handle(self, *args, **options):
+        # (due_at, ticket_id, kind) entries; superseded ones are skipped when popped
+        self.heap = []
+        # (ticket_id, kind) -> due_at of the live entry
+        self.pending = {}
+        self.breaches = 0
+
+        if options['recompute']:
+            self.recompute_deadlines()
+
+        watermark = timezone.now()
+        self.load_pending()
+        self.stdout.write(f"Watching {len(self.pending)} SLA deadlines")
+
+        settle = timedelta(seconds=options['settle_seconds'])
+        try:
+            while True:
+                self.fire_due(timezone.now())
+                if options['once']:
+                    break
+
+                polled_at = timezone.now()
+                self.refresh_changed(watermark - settle)
+                watermark = polled_at
+
+                delay = options['poll_interval']
+                if self.heap:
+                    delay = min(delay, max(0.0, (self.heap[0][0] - timezone.now()).total_seconds()))
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'SLA worker stopped after recording {self.breaches} breaches'))
+
+    def active_tickets(self):
+        return Ticket.objects.filter(status__in=SLAService.ACTIVE_STATUSES).filter(
+            Q(first_response_due_at__isnull=False, first_response_at__isnull=True,
+              first_response_breached_at__isnull=True) |
+            Q(resolution_due_at__isnull=False, resolution_breached_at__isnull=True)
+        ).only(*self.SLA_FIELDS)
+
+    def load_pending(self):
+        for ticket in self.active_tickets().iterator(chunk_size=2000):
+            self.track(ticket)
+
+    def refresh_changed(self, since):
+        """
+        Re-read tickets touched since ``since`` and update their heap entries
+        """
+        changed = Ticket.objects.filter(
+            Q(updated_at__gt=since) | Q(last_activity_at__gt=since)
+        ).only(*self.SLA_FIELDS)
+        for ticket in changed.iterator(chunk_size=2000):
+            self.track(ticket)
+
+    def track(self, ticket):
+        deadlines = dict(SLAService.pending_deadlines(ticket))
+        for kind in ('first_response', 'resolution'):
+            key = (ticket.pk, kind)
+            due_at = deadlines.get(kind)
+            if due_at is None:
+                self.pending.pop(key, None)
+            elif self.pending.get(key) != due_at:
+                self.pending[key] = due_at
+                heapq.heappush(self.heap, (due_at, ticket.pk, kind))
+
+    def fire_due(self, now):
+        while self.heap and self.heap[0][0] <= now:
+            due_at, ticket_id, kind = heapq.heappop(self.heap)
+            if self.pending.get((ticket_id, kind)) != due_at:
+                continue
+            del self.pending[(ticket_id, kind)]
+            if SLAService.record_breach(ticket_id, kind, due_at, now=now):
+                self.breaches += 1
+                self.stdout.write(f"SLA breach: {kind} on ticket {ticket_id} (due {due_at:%Y-%m-%d %H:%M:%S})")
+
+    def recompute_deadlines(self, chunk_size=1000):
+        fields = ['first_response_due_at', 'resolution_due_at', 'updated_at']
+        policies = list(SLAPolicy.objects.filter(is_active=True))
+        last_pk = None
+        updated = 0
+        while True:
+            chunk = Ticket.objects.filter(status__in=SLAService.ACTIVE_STATUSES).order_by('pk')
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            tickets = list(chunk.only('id', 'created_at', 'priority', 'category')[:chunk_size])
+            if not tickets:
+                break
+            last_pk = tickets[-1].pk
+            now = timezone.now()
+            for ticket in tickets:
+                SLAService.apply_deadlines(ticket, policies)
+                ticket.updated_at = now
+            Ticket.objects.bulk_update(tickets, fields)
+            updated += len(tickets)
+        self.stdout.write(f"Recomputed deadlines for {updated} open tickets")
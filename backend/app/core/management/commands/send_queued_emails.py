@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from app.core.services import EmailOutboxService
+
+
+class Command(BaseCommand):
+    help = 'Deliver emails from the outbox in batches over a reused connection, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails per batch (EMAIL_OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the emails that are due now, then exit')
+
+    def handle(self, *args, **options):
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        try:
+            while True:
+                results = EmailOutboxService.send_batch(batch_size=options['batch_size'])
+                for key, value in results.items():
+                    totals[key] += value
+                if any(results.values()):
+                    self.stdout.write(
+                        f"Sent {results['sent']}, retrying {results['retried']}, failed {results['failed']}"
+                    )
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Delivered {totals['sent']} emails ({totals['retried']} retries scheduled, {totals['failed']} failed)"
+        ))
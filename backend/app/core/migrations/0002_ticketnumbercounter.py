@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+TICKET_NUMBER_SEQUENCE = 'core_ticket_number_seq'
+
+
+def seed_ticket_number_counter(apps, schema_editor):
+    """
+    Start ticket number allocation after the highest existing TICK-NNN number
+    """
+    Ticket = apps.get_model('core', 'Ticket')
+    TicketNumberCounter = apps.get_model('core', 'TicketNumberCounter')
+
+    highest = 0
+    numbers = Ticket.objects.filter(ticket_number__startswith='TICK-').values_list('ticket_number', flat=True)
+    for ticket_number in numbers.iterator():
+        suffix = ticket_number.split('-', 1)[1]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+
+    TicketNumberCounter.objects.update_or_create(name='ticket_number', defaults={'value': highest})
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE SEQUENCE IF NOT EXISTS {TICKET_NUMBER_SEQUENCE} START WITH {highest + 1}"
+        )
+
+
+def drop_ticket_number_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {TICKET_NUMBER_SEQUENCE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketNumberCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_ticket_number_counter, drop_ticket_number_sequence),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:19
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Fill the counters of existing tickets from their comments, attachments and
+    activities. Same computation as the backfill_ticket_counters command, kept
+    inline so later changes to the command don't alter this migration.
+    """
+    Ticket = apps.get_model('core', 'Ticket')
+    TicketComment = apps.get_model('core', 'TicketComment')
+    TicketAttachment = apps.get_model('core', 'TicketAttachment')
+    TicketActivity = apps.get_model('core', 'TicketActivity')
+    fields = ['comment_count', 'attachment_count', 'last_activity_at', 'last_commenter_role']
+    chunk_size = 1000
+    last_pk = None
+
+    while True:
+        chunk = Ticket.objects.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        last_commenter = TicketComment.objects.filter(
+            ticket=OuterRef('pk')
+        ).order_by('-created_at').values('created_by__role')[:1]
+        tickets = list(
+            chunk.annotate(latest_commenter_role=Subquery(last_commenter)).only('pk', 'created_at')[:chunk_size]
+        )
+        if not tickets:
+            break
+        last_pk = tickets[-1].pk
+        ticket_ids = [ticket.pk for ticket in tickets]
+
+        comments = {
+            row['ticket_id']: row for row in
+            TicketComment.objects.filter(ticket_id__in=ticket_ids).order_by()
+            .values('ticket_id').annotate(count=Count('id'), latest=Max('created_at'))
+        }
+        attachments = {
+            row['ticket_id']: row for row in
+            TicketAttachment.objects.filter(ticket_id__in=ticket_ids).order_by()
+            .values('ticket_id').annotate(count=Count('id'), latest=Max('created_at'))
+        }
+        activities = dict(
+            TicketActivity.objects.filter(ticket_id__in=ticket_ids).order_by()
+            .values('ticket_id').annotate(latest=Max('created_at')).values_list('ticket_id', 'latest')
+        )
+
+        for ticket in tickets:
+            comment_row = comments.get(ticket.pk, {})
+            attachment_row = attachments.get(ticket.pk, {})
+            timestamps = [
+                ticket.created_at,
+                comment_row.get('latest'),
+                attachment_row.get('latest'),
+                activities.get(ticket.pk),
+            ]
+            ticket.comment_count = comment_row.get('count', 0)
+            ticket.attachment_count = attachment_row.get('count', 0)
+            ticket.last_activity_at = max(ts for ts in timestamps if ts)
+            ticket.last_commenter_role = ticket.latest_commenter_role
+
+        Ticket.objects.bulk_update(tickets, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_ticketnumbercounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='attachment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_commenter_role',
+            field=models.CharField(blank=True, choices=[('customer', 'Customer'), ('agent', 'Support Agent'), ('admin', 'Administrator')], max_length=20, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['last_activity_at'], name='core_ticket_last_ac_0cac74_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:05
+
+from django.db import migrations
+
+
+POSTGRES_CREATE = [
+    """
+    ALTER TABLE core_ticket ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(ticket_number, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(subject, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX core_ticket_search_vector_idx ON core_ticket USING GIN (search_vector)",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS core_ticket_search_vector_idx",
+    "ALTER TABLE core_ticket DROP COLUMN IF EXISTS search_vector",
+]
+
+# Kept inline so later changes to app.core.search don't alter this migration
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_ticket_fts USING fts5(
+        ticket_number, subject, description,
+        content='core_ticket', content_rowid='rowid', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_ticket_fts_insert AFTER INSERT ON core_ticket BEGIN
+        INSERT INTO core_ticket_fts(rowid, ticket_number, subject, description)
+        VALUES (new.rowid, new.ticket_number, new.subject, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_ticket_fts_delete AFTER DELETE ON core_ticket BEGIN
+        INSERT INTO core_ticket_fts(core_ticket_fts, rowid, ticket_number, subject, description)
+        VALUES ('delete', old.rowid, old.ticket_number, old.subject, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_ticket_fts_update
+    AFTER UPDATE OF ticket_number, subject, description ON core_ticket BEGIN
+        INSERT INTO core_ticket_fts(core_ticket_fts, rowid, ticket_number, subject, description)
+        VALUES ('delete', old.rowid, old.ticket_number, old.subject, old.description);
+        INSERT INTO core_ticket_fts(rowid, ticket_number, subject, description)
+        VALUES (new.rowid, new.ticket_number, new.subject, new.description);
+    END
+    """,
+    "INSERT INTO core_ticket_fts(core_ticket_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS core_ticket_fts_update",
+    "DROP TRIGGER IF EXISTS core_ticket_fts_delete",
+    "DROP TRIGGER IF EXISTS core_ticket_fts_insert",
+    "DROP TABLE IF EXISTS core_ticket_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Add the database's native full-text index over ticket_number, subject and description
+    """
+    statements = {'postgresql': POSTGRES_CREATE, 'sqlite': SQLITE_CREATE}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'postgresql': POSTGRES_DROP, 'sqlite': SQLITE_DROP}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_ticket_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketDailyStat',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('open', 'Open'), ('in_progress', 'In Progress'), ('resolved', 'Resolved'), ('closed', 'Closed')], max_length=20)),
+                ('is_internal', models.BooleanField(default=False)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('resolved', models.PositiveIntegerField(default=0)),
+                ('entered', models.PositiveIntegerField(default=0)),
+                ('left', models.PositiveIntegerField(default=0)),
+                ('assigned_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.category')),
+                ('priority', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.priority')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'status'], name='core_ticket_day_a90179_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:32
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+
+def backfill_first_response(apps, schema_editor):
+    """
+    Set first_response_at of existing tickets from their first public agent comment.
+    Same update as the backfill_first_response command, kept inline so later
+    changes to the command don't alter this migration.
+    """
+    Ticket = apps.get_model('core', 'Ticket')
+    TicketComment = apps.get_model('core', 'TicketComment')
+    agent_replies = TicketComment.objects.filter(
+        ticket=OuterRef('pk'), created_by__role='agent', is_internal=False
+    )
+    first_response = agent_replies.order_by('created_at').values('created_at')[:1]
+    chunk_size = 1000
+    last_pk = None
+
+    while True:
+        chunk = Ticket.objects.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        ticket_ids = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not ticket_ids:
+            break
+        last_pk = ticket_ids[-1]
+        Ticket.objects.filter(Exists(agent_replies), pk__in=ticket_ids).update(
+            first_response_at=Subquery(first_response)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_ticket_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['first_response_at'], name='core_ticket_first_r_1fc933_idx'),
+        ),
+        migrations.RunPython(backfill_first_response, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:34
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_ticket_first_response_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SLAPolicy',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('first_response_minutes', models.PositiveIntegerField(blank=True, null=True)),
+                ('resolution_minutes', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'SLA Policy',
+                'verbose_name_plural': 'SLA Policies',
+            },
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_breached_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolution_breached_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolution_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('ticket_created', 'Ticket Created'), ('ticket_assigned', 'Ticket Assigned'), ('ticket_updated', 'Ticket Updated'), ('comment_added', 'Comment Added'), ('status_changed', 'Status Changed'), ('sla_breached', 'SLA Breached')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['first_response_due_at'], name='core_ticket_first_r_5bb9f7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['resolution_due_at'], name='core_ticket_resolut_14b331_idx'),
+        ),
+        migrations.AddField(
+            model_name='slapolicy',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sla_policies', to='core.category'),
+        ),
+        migrations.AddField(
+            model_name='slapolicy',
+            name='priority',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sla_policies', to='core.priority'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='slapolicy',
+            unique_together={('priority', 'category')},
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:43
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_unread(apps, schema_editor):
+    """
+    Fill the counter of read states created before it existed; states created
+    later are counted when first read
+    """
+    Notification = apps.get_model('core', 'Notification')
+    NotificationReadState = apps.get_model('core', 'NotificationReadState')
+    unread = Notification.objects.filter(user=OuterRef('user'), is_read=False).order_by().values('user')
+    NotificationReadState.objects.update(
+        unread_count=Coalesce(Subquery(unread.annotate(total=Count('pk')).values('total')), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_broadcast_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationreadstate',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', 'created_at'], name='core_notif_user_unread_idx'),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
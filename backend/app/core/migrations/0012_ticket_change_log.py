@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_notification_unread_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('ticket_id', models.UUIDField(db_index=True)),
+                ('owner_id', models.UUIDField()),
+                ('is_internal', models.BooleanField(default=False)),
+                ('action', models.CharField(max_length=30)),
+                ('comment_id', models.UUIDField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_ticket_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketVoteShard',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('upvotes', models.IntegerField(default=0)),
+                ('downvotes', models.IntegerField(default=0)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vote_shards', to='core.ticket')),
+            ],
+            options={
+                'unique_together': {('ticket', 'shard')},
+            },
+        ),
+    ]
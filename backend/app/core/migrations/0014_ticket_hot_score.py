@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:52
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def score_existing_votes(apps, schema_editor):
+    """
+    Seed hot scores from the votes cast so far, each decayed from when it was cast
+    """
+    Ticket = apps.get_model('core', 'Ticket')
+    TicketVote = apps.get_model('core', 'TicketVote')
+    half_life = settings.QUICKDESK_SETTINGS.get('TRENDING_HALF_LIFE_HOURS', 24) * 3600
+    floor = settings.QUICKDESK_SETTINGS.get('TRENDING_MIN_SCORE', 0.05)
+    now = timezone.now()
+
+    scores = defaultdict(float)
+    for ticket_id, vote_type, created_at in TicketVote.objects.values_list('ticket_id', 'vote_type', 'created_at').iterator():
+        weight = 0.5 ** (max(0.0, (now - created_at).total_seconds()) / half_life)
+        scores[ticket_id] += weight if vote_type == 'up' else -weight
+    for ticket_id, score in scores.items():
+        if abs(score) >= floor:
+            Ticket.objects.filter(pk=ticket_id).update(hot_score=score, hot_score_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_ticket_vote_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='hot_score_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('hot_score_at__isnull', False)), fields=['-hot_score', 'id'], name='core_ticket_hot_idx'),
+        ),
+        migrations.RunPython(score_existing_votes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:10
+
+from collections import defaultdict
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """
+    Rebuild the daily rollup from the tickets that existed before it was maintained.
+    Same replay as the rebuild_ticket_rollups command, kept inline so later changes
+    to the command don't alter this migration.
+    """
+    Ticket = apps.get_model('core', 'Ticket')
+    TicketActivity = apps.get_model('core', 'TicketActivity')
+    TicketDailyStat = apps.get_model('core', 'TicketDailyStat')
+    statuses = {'open', 'in_progress', 'resolved', 'closed'}
+    # (day, category, priority, assignee, status, is_internal) -> [created, resolved, entered, left]
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+
+    transitions = defaultdict(list)
+    activities = TicketActivity.objects.filter(action='status_changed').order_by('created_at').values_list(
+        'ticket_id', 'created_at', 'old_value', 'new_value'
+    )
+    for ticket_id, changed_at, old_status, new_status in activities.iterator():
+        if old_status in statuses and new_status in statuses:
+            transitions[ticket_id].append((changed_at, old_status, new_status))
+
+    tickets = Ticket.objects.values(
+        'pk', 'status', 'category_id', 'priority_id', 'assigned_to_id', 'is_internal',
+        'created_at', 'updated_at', 'resolved_at', 'closed_at'
+    )
+    for ticket in tickets.iterator():
+        def key(day, status):
+            return (
+                timezone.localdate(day), ticket['category_id'], ticket['priority_id'],
+                ticket['assigned_to_id'], status, ticket['is_internal']
+            )
+
+        path = transitions[ticket['pk']]
+        if not path and ticket['status'] != 'open':
+            # Without logged changes, infer the path from the ticket's timestamps
+            current = 'open'
+            for status, changed_at in (('resolved', ticket['resolved_at']), ('closed', ticket['closed_at'])):
+                if changed_at:
+                    path.append((changed_at, current, status))
+                    current = status
+
+        status = path[0][1] if path else ticket['status']
+        row = totals[key(ticket['created_at'], status)]
+        row[0] += 1
+        row[2] += 1
+        if status == 'resolved':
+            row[1] += 1
+
+        # Close any gap left by unlogged changes with a final move at updated_at
+        final = path[-1][2] if path else status
+        if final != ticket['status']:
+            path.append((ticket['updated_at'], final, ticket['status']))
+
+        for changed_at, _, new_status in path:
+            if new_status == status:
+                continue
+            totals[key(changed_at, status)][3] += 1
+            row = totals[key(changed_at, new_status)]
+            row[2] += 1
+            if new_status == 'resolved':
+                row[1] += 1
+            status = new_status
+
+    TicketDailyStat.objects.all().delete()
+    TicketDailyStat.objects.bulk_create([
+        TicketDailyStat(
+            day=day, category_id=category_id, priority_id=priority_id, assigned_to_id=assigned_to_id,
+            status=status, is_internal=is_internal,
+            created=created, resolved=resolved, entered=entered, left=left
+        )
+        for (day, category_id, priority_id, assigned_to_id, status, is_internal), (created, resolved, entered, left)
+        in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
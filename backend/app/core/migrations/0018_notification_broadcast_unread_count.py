@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_email_outbox_sending_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationreadstate',
+            name='unread_broadcast_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
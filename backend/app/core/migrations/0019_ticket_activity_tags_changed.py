@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_notification_broadcast_unread_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticketactivity',
+            name='action',
+            field=models.CharField(choices=[('created', 'Ticket Created'), ('status_changed', 'Status Changed'), ('assigned', 'Assigned'), ('unassigned', 'Unassigned'), ('comment_added', 'Comment Added'), ('priority_changed', 'Priority Changed'), ('category_changed', 'Category Changed'), ('tags_changed', 'Tags Changed')], max_length=20),
+        ),
+    ]
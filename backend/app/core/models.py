@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 import uuid
 
@@ -89,6 +91,54 @@ class Priority(models.Model):
         return self.get_name_display()
 
 
+class SLAPolicy(models.Model):
+    """
+    First-response and resolution targets for a priority, a category, or both.
+    The most specific active policy applies: category and priority, then
+    priority only, then category only.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=100)
+    priority = models.ForeignKey(Priority, on_delete=models.CASCADE, null=True, blank=True, related_name='sla_policies')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='sla_policies')
+    first_response_minutes = models.PositiveIntegerField(null=True, blank=True)
+    resolution_minutes = models.PositiveIntegerField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "SLA Policy"
+        verbose_name_plural = "SLA Policies"
+        unique_together = ['priority', 'category']
+    
+    def clean(self):
+        if not self.priority_id and not self.category_id:
+            raise ValidationError("An SLA policy needs a priority, a category, or both")
+    
+    def __str__(self):
+        return self.name
+
+
+class TicketQuerySet(models.QuerySet):
+    """
+    Custom queryset for tickets
+    """
+    
+    def with_list_annotations(self, user=None):
+        """
+        Annotate the user's vote so list serializers don't run extra queries
+        per row. Comment and attachment counts are maintained columns.
+        """
+        queryset = self
+        
+        if user is not None and user.is_authenticated:
+            votes = TicketVote.objects.filter(ticket=OuterRef('pk'), user=user)
+            queryset = queryset.annotate(user_vote=Subquery(votes.values('vote_type')[:1]))
+        
+        return queryset
+
+
 class Ticket(models.Model):
     """
     Main ticket model for help desk system
@@ -116,6 +166,10 @@ class Ticket(models.Model):
     # Voting system
     upvotes = models.PositiveIntegerField(default=0)
     downvotes = models.PositiveIntegerField(default=0)
+    # Trending rank: net votes halved every TRENDING_HALF_LIFE_HOURS, as of hot_score_at.
+    # Maintained by TicketVoteService; hot_score_at is null once the score has decayed to 0
+    hot_score = models.FloatField(default=0)
+    hot_score_at = models.DateTimeField(null=True, blank=True)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -127,6 +181,28 @@ class Ticket(models.Model):
     is_internal = models.BooleanField(default=False)  # Internal tickets created by agents/admins
     tags = models.JSONField(default=list, blank=True)
     
+    # Activity counters, maintained by TicketService with F() updates
+    comment_count = models.PositiveIntegerField(default=0)
+    attachment_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(default=timezone.now)
+    last_commenter_role = models.CharField(max_length=20, choices=User.ROLE_CHOICES, blank=True, null=True)
+    first_response_at = models.DateTimeField(null=True, blank=True)  # First public agent comment
+    
+    # SLA deadlines, computed on save from the matching SLAPolicy
+    first_response_due_at = models.DateTimeField(null=True, blank=True)
+    resolution_due_at = models.DateTimeField(null=True, blank=True)
+    # Set once by the SLA worker when a deadline is missed
+    first_response_breached_at = models.DateTimeField(null=True, blank=True)
+    resolution_breached_at = models.DateTimeField(null=True, blank=True)
+    
+    # Columns only written with queryset updates, never by a plain save()
+    MAINTAINED_FIELDS = (
+        'comment_count', 'attachment_count', 'last_activity_at', 'last_commenter_role', 'first_response_at',
+        'first_response_breached_at', 'resolution_breached_at', 'hot_score', 'hot_score_at',
+    )
+    
+    objects = TicketQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -134,26 +210,99 @@ class Ticket(models.Model):
             models.Index(fields=['assigned_to', 'status']),
             models.Index(fields=['created_by', 'status']),
             models.Index(fields=['category', 'status']),
+            models.Index(fields=['last_activity_at']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
+            models.Index(fields=['first_response_at']),
+            models.Index(fields=['first_response_due_at']),
+            models.Index(fields=['resolution_due_at']),
+            models.Index(
+                fields=['-hot_score', 'id'], name='core_ticket_hot_idx',
+                condition=models.Q(hot_score_at__isnull=False)
+            ),
         ]
     
+    # Fields that key the TicketDailyStat rollup
+    ROLLUP_FIELDS = ('status', 'category_id', 'priority_id', 'assigned_to_id', 'is_internal')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rollup_key = instance.get_rollup_key()
+        return instance
+    
+    def get_rollup_key(self):
+        """Current rollup dimensions, or None when any of them wasn't loaded"""
+        deferred = self.get_deferred_fields()
+        if any(field.removesuffix('_id') in deferred or field in deferred for field in self.ROLLUP_FIELDS):
+            return None
+        return {field: getattr(self, field) for field in self.ROLLUP_FIELDS}
+    
     def save(self, *args, **kwargs):
-        if not self.ticket_number:
+        """
+        Saving a ticket loaded from the database updates only its loaded fields,
+        leaving out MAINTAINED_FIELDS. Deferred fields aren't fetched, and a ticket
+        whose row was deleted raises DatabaseError instead of being inserted again.
+        """
+        deferred = self.get_deferred_fields()
+        if 'ticket_number' not in deferred and not self.ticket_number:
             # Generate ticket number like TICK-001, TICK-002, etc.
-            last_ticket = Ticket.objects.filter(ticket_number__startswith='TICK-').order_by('ticket_number').last()
-            if last_ticket:
-                last_number = int(last_ticket.ticket_number.split('-')[1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            self.ticket_number = f"TICK-{new_number:03d}"
+            from .numbering import TicketNumberAllocator
+            self.ticket_number = f"TICK-{TicketNumberAllocator.next_number():03d}"
         
         # Auto-set resolved_at and closed_at timestamps
-        if self.status == 'resolved' and not self.resolved_at:
-            self.resolved_at = timezone.now()
-        elif self.status == 'closed' and not self.closed_at:
-            self.closed_at = timezone.now()
+        if deferred.isdisjoint({'status', 'resolved_at', 'closed_at'}):
+            if self.status == 'resolved' and not self.resolved_at:
+                self.resolved_at = timezone.now()
+            elif self.status == 'closed' and not self.closed_at:
+                self.closed_at = timezone.now()
+        
+        # Don't overwrite counters bumped concurrently since this instance was loaded
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+                and field.attname not in deferred
+            ]
         
-        super().save(*args, **kwargs)
+        from .services import SLAService, TicketRollupService
+        adding = self._state.adding
+        before = getattr(self, '_rollup_key', None)
+        
+        # Deadlines follow the ticket's priority and category
+        if adding or (before is not None and (
+            before['priority_id'] != self.priority_id or before['category_id'] != self.category_id
+        )):
+            SLAService.apply_deadlines(self)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'first_response_due_at', 'resolution_due_at'}
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            after = self.get_rollup_key()
+            if adding:
+                TicketRollupService.record_change(None, after)
+            elif before is not None and after is not None:
+                # Fields left out of update_fields weren't written
+                update_fields = kwargs.get('update_fields')
+                if update_fields is not None:
+                    after = {
+                        field: value if field.removesuffix('_id') in update_fields else before[field]
+                        for field, value in after.items()
+                    }
+                if after != before:
+                    TicketRollupService.record_change(before, after)
+        self._rollup_key = after
+    
+    def delete(self, *args, **kwargs):
+        """
+        Take the rollup key being removed from the row, not from this instance,
+        which may predate a set-based update of the ticket
+        """
+        with transaction.atomic(using=kwargs.get('using')):
+            current = type(self).objects.select_for_update().filter(pk=self.pk).values(*self.ROLLUP_FIELDS).first()
+            if current is not None:
+                self._rollup_key = current
+            return super().delete(*args, **kwargs)
     
     def __str__(self):
         return f"{self.ticket_number} - {self.subject}"
@@ -164,10 +313,9 @@ class Ticket(models.Model):
     
     @property
     def response_time(self):
-        """Calculate response time from creation to first agent comment"""
-        first_comment = self.comments.filter(created_by__role='agent').first()
-        if first_comment:
-            return first_comment.created_at - self.created_at
+        """Calculate response time from creation to first public agent comment"""
+        if self.first_response_at:
+            return self.first_response_at - self.created_at
         return None
     
     @property
@@ -178,6 +326,17 @@ class Ticket(models.Model):
         return None
 
 
+class TicketNumberCounter(models.Model):
+    """
+    Counter row backing ticket number allocation on databases without sequences
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
 class TicketComment(models.Model):
     """
     Comments/updates on tickets
@@ -248,24 +407,40 @@ class TicketVote(models.Model):
     class Meta:
         unique_together = ['ticket', 'user']  # One vote per user per ticket
     
-    def save(self, *args, **kwargs):
-        # Update ticket vote counts
-        super().save(*args, **kwargs)
-        self.update_ticket_vote_counts()
-    
-    def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        self.update_ticket_vote_counts()
-    
     def update_ticket_vote_counts(self):
-        """Update the vote counts on the related ticket"""
-        upvotes = TicketVote.objects.filter(ticket=self.ticket, vote_type='up').count()
-        downvotes = TicketVote.objects.filter(ticket=self.ticket, vote_type='down').count()
+        """
+        Recount the votes of the related ticket. Votes cast through
+        TicketVoteService adjust the counts themselves; this repairs them
+        after votes are edited directly.
+        """
+        from django.db.models import Count, Q
+        from .services import TicketChangeService
         
-        Ticket.objects.filter(id=self.ticket.id).update(
-            upvotes=upvotes,
-            downvotes=downvotes
-        )
+        with transaction.atomic():
+            # The recount supersedes any deltas still waiting in shards
+            TicketVoteShard.objects.filter(ticket_id=self.ticket_id).delete()
+            counts = TicketVote.objects.filter(ticket_id=self.ticket_id).aggregate(
+                upvotes=Count('id', filter=Q(vote_type='up')),
+                downvotes=Count('id', filter=Q(vote_type='down'))
+            )
+            Ticket.objects.filter(id=self.ticket_id).update(updated_at=timezone.now(), **counts)
+            TicketChangeService.record(self.ticket, 'voted')
+
+
+class TicketVoteShard(models.Model):
+    """
+    Vote count deltas of a hot ticket, spread over a few rows so concurrent
+    voters don't all update the ticket row. Folded into Ticket.upvotes and
+    Ticket.downvotes by TicketVoteService.flush_shards.
+    """
+    id = models.BigAutoField(primary_key=True)
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='vote_shards')
+    shard = models.PositiveSmallIntegerField()
+    upvotes = models.IntegerField(default=0)
+    downvotes = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['ticket', 'shard']
 
 
 class TicketActivity(models.Model):
@@ -280,6 +455,7 @@ class TicketActivity(models.Model):
         ('comment_added', 'Comment Added'),
         ('priority_changed', 'Priority Changed'),
         ('category_changed', 'Category Changed'),
+        ('tags_changed', 'Tags Changed'),
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -299,6 +475,118 @@ class TicketActivity(models.Model):
         return f"{self.get_action_display()} - {self.ticket.ticket_number}"
 
 
+class TicketChange(models.Model):
+    """
+    Append-only log of ticket changes, read by the /api/tickets/changes/ feed.
+    The auto-incrementing id is the feed's sequence. Rows keep plain ids rather
+    than foreign keys so deletions can be reported too.
+    """
+    id = models.BigAutoField(primary_key=True)
+    ticket_id = models.UUIDField(db_index=True)
+    # Copied from the ticket so the feed can apply role rules without a join
+    owner_id = models.UUIDField()
+    is_internal = models.BooleanField(default=False)
+    action = models.CharField(max_length=30)
+    comment_id = models.UUIDField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"#{self.id} {self.action} ({self.ticket_id})"
+
+
+class TicketDailyStat(models.Model):
+    """
+    Daily ticket flow per category, priority, assignee, status and visibility.
+    
+    Rows are additive: concurrent writers may create more than one row for the
+    same key, so readers always SUM over the key.
+    """
+    id = models.BigAutoField(primary_key=True)
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    priority = models.ForeignKey(Priority, on_delete=models.CASCADE, related_name='+')
+    assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=Ticket.STATUS_CHOICES)
+    is_internal = models.BooleanField(default=False)
+    
+    # Tickets created / resolved on this day
+    created = models.PositiveIntegerField(default=0)
+    resolved = models.PositiveIntegerField(default=0)
+    # Tickets that moved into / out of this key, summing entered - left gives the live count
+    entered = models.PositiveIntegerField(default=0)
+    left = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['day', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.status}: +{self.entered} -{self.left}"
+
+
+class EmailOutbox(models.Model):
+    """
+    Emails queued in the same transaction as the change that triggers them,
+    delivered in batches by the send_queued_emails worker
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    event = models.CharField(max_length=50)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Queued Email"
+        verbose_name_plural = "Email Outbox"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response of a POST sent with an Idempotency-Key header, replayed when the
+    client retries with the same key. status_code is null while the first
+    request is still running.
+    """
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        unique_together = ['user', 'key']
+    
+    def __str__(self):
+        return f"{self.user_id} {self.key} ({self.status_code or 'in progress'})"
+
+
 class Notification(models.Model):
     """
     User notifications for ticket updates
@@ -309,6 +597,7 @@ class Notification(models.Model):
         ('ticket_updated', 'Ticket Updated'),
         ('comment_added', 'Comment Added'),
         ('status_changed', 'Status Changed'),
+        ('sla_breached', 'SLA Breached'),
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -322,11 +611,95 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id']),
+            # Only unread rows, for recounts and mark-read updates
+            models.Index(
+                fields=['user', 'created_at'], condition=models.Q(is_read=False), name='core_notif_user_unread_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
 
+class BroadcastNotification(models.Model):
+    """
+    A notification stored once for a whole audience (e.g. all agents) and merged
+    into each member's inbox at read time
+    """
+    AUDIENCE_CHOICES = [
+        ('agents', 'Agents'),
+        ('admins', 'Admins'),
+        ('staff', 'Agents and Admins'),
+    ]
+    
+    AUDIENCE_ROLES = {
+        'agents': ('agent',),
+        'admins': ('admin',),
+        'staff': ('agent', 'admin'),
+    }
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES)
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='broadcast_notifications')
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    # The user who caused the event doesn't need to hear about it
+    excluded_user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['audience', 'created_at', 'id']),
+        ]
+    
+    @classmethod
+    def audiences_for(cls, user):
+        return [audience for audience, roles in cls.AUDIENCE_ROLES.items() if user.role in roles]
+    
+    def __str__(self):
+        return f"{self.title} ({self.get_audience_display()})"
+
+
+class NotificationReadState(models.Model):
+    """
+    Per-user read cursor: broadcasts created at or before broadcasts_read_at are read.
+    Also holds the user's unread personal notification and broadcast counts, maintained
+    by NotificationService. A null broadcast count is recounted on the next read.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='notification_read_state'
+    )
+    broadcasts_read_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+    unread_broadcast_count = models.PositiveIntegerField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.user.username} read up to {self.broadcasts_read_at}"
+
+
+class BroadcastOverride(models.Model):
+    """
+    Per-user state of a single broadcast newer than the read cursor, or hidden by the user
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_overrides')
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='overrides')
+    is_read = models.BooleanField(default=False)
+    is_hidden = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['user', 'broadcast']
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.broadcast_id}"
+
+
 class UserProfile(models.Model):
     """
     Extended user profile information
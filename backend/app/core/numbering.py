@@ -0,0 +1,101 @@
+"""
+Ticket number allocation for QuickDesk
+"""
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Ticket, TicketNumberCounter
+
+
+TICKET_NUMBER_SEQUENCE = 'core_ticket_number_seq'
+TICKET_NUMBER_COUNTER = 'ticket_number'
+
+
+class TicketNumberAllocator:
+    """
+    Hands out ticket numbers from blocks reserved once per worker process.
+
+    On PostgreSQL blocks come from a database sequence. ``nextval`` is never
+    rolled back, so a cached block stays valid whatever happens to the
+    transaction that reserved it.
+
+    Other databases reserve from a ``TicketNumberCounter`` row with a single
+    ``UPDATE ... SET value = value + n``. A block is only cached when that
+    reservation commits on its own; inside a caller's transaction a single
+    number is reserved instead, so a rollback hands it back together with
+    the ticket that used it.
+
+    Numbers are unique and increasing per worker, but workers interleave and
+    unused numbers of a block are skipped when the process exits.
+    """
+    _lock = threading.Lock()
+    _block = deque()
+
+    @classmethod
+    def next_number(cls):
+        """
+        Return the next free ticket number
+        """
+        with cls._lock:
+            if not cls._block:
+                if connection.vendor != 'postgresql' and connection.in_atomic_block:
+                    return cls._reserve(1)[0]
+                cls._block.extend(cls._reserve(cls.block_size()))
+            return cls._block.popleft()
+
+    @classmethod
+    def reset(cls):
+        """
+        Drop any numbers cached by this process
+        """
+        with cls._lock:
+            cls._block.clear()
+
+    @staticmethod
+    def block_size():
+        return max(1, settings.QUICKDESK_SETTINGS.get('TICKET_NUMBER_BLOCK_SIZE', 20))
+
+    @classmethod
+    def _reserve(cls, size):
+        """
+        Reserve ``size`` numbers and return them in ascending order
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(%s) FROM generate_series(1, %s)",
+                    [TICKET_NUMBER_SEQUENCE, size]
+                )
+                return sorted(row[0] for row in cursor.fetchall())
+
+        with transaction.atomic():
+            updated = TicketNumberCounter.objects.filter(name=TICKET_NUMBER_COUNTER).update(
+                value=F('value') + size
+            )
+            if not updated:
+                # The counter row is normally seeded by the migration
+                TicketNumberCounter.objects.create(
+                    name=TICKET_NUMBER_COUNTER,
+                    value=highest_ticket_number() + size
+                )
+            value = TicketNumberCounter.objects.get(name=TICKET_NUMBER_COUNTER).value
+        return list(range(value - size + 1, value + 1))
+
+
+def highest_ticket_number():
+    """
+    Highest number used by existing ``TICK-NNN`` tickets, compared numerically
+    """
+    highest = 0
+    numbers = Ticket.objects.filter(ticket_number__startswith='TICK-').values_list(
+        'ticket_number', flat=True
+    )
+    for ticket_number in numbers.iterator():
+        suffix = ticket_number.split('-', 1)[1]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
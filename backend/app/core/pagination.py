@@ -0,0 +1,318 @@
+"""
+Pagination classes for QuickDesk list endpoints
+"""
+import base64
+import binascii
+import json
+import uuid
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over ``(<sort field>, pk)``.
+
+    The sort field is taken from the queryset's first ordering term and must be
+    listed in the view's ``cursor_ordering_fields``. Each page is a range scan
+    starting after the last row of the previous one, so deep pages cost the
+    same as the first page and no COUNT(*) is run. Cursors are opaque strings
+    returned in the ``next`` and ``previous`` links.
+    """
+    page_size = None
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor.'
+    default_ordering_fields = ('created_at',)
+
+    def __init__(self, page_size=None):
+        if page_size is not None:
+            self.page_size = page_size
+
+    @classmethod
+    def cursor_after(cls, row, field):
+        """
+        Cursor for the page that follows ``row`` when ordered by ``field``
+        """
+        paginator = cls()
+        paginator.field = field
+        paginator.model = type(row)
+        return paginator.encode_cursor(row, 'next')
+    
+    @classmethod
+    def get_ordering(cls, queryset, view=None):
+        """
+        Return ``(field, descending)`` for the queryset's first ordering term,
+        or ``None`` when it can't be used as a keyset
+        """
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        if not ordering or not isinstance(ordering[0], str):
+            return None
+
+        field = ordering[0]
+        descending = field.startswith('-')
+        field = field.lstrip('-')
+        allowed = getattr(view, 'cursor_ordering_fields', cls.default_ordering_fields)
+        if field not in allowed:
+            return None
+        return field, descending
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = self.get_ordering(queryset, view)
+        if ordering is None:
+            raise NotFound('Cursor pagination is not available for this ordering.')
+        self.field, self.descending = ordering
+        self.model = queryset.model
+
+        position = self.decode_cursor(request)
+        reverse = position is not None and position['direction'] == 'prev'
+
+        # Walking backwards flips the scan direction, the page is re-reversed below
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+
+        if position is not None:
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': position['value']}) |
+                Q(**{self.field: position['value'], f'pk__{lookup}': position['pk']})
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        if reverse:
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._build_link(self.page[-1], 'next')
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._build_link(self.page[0], 'prev')
+
+    def _build_link(self, row, direction):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, direction))
+
+    def encode_cursor(self, row, direction):
+        value = self._resolve_value(row)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        payload = json.dumps({'v': value, 'pk': str(row.pk), 'd': direction}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            field = self._get_model_field()
+            return {
+                'value': field.to_python(payload['v']),
+                'pk': self.model._meta.pk.to_python(payload['pk']),
+                'direction': 'prev' if payload.get('d') == 'prev' else 'next',
+            }
+        except (TypeError, ValueError, KeyError, AttributeError, binascii.Error, ValidationError, FieldDoesNotExist) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+
+    def _resolve_value(self, row):
+        value = row
+        for part in self.field.split('__'):
+            value = getattr(value, part)
+        return value
+
+    def _get_model_field(self):
+        model = self.model
+        parts = self.field.split('__')
+        for part in parts[:-1]:
+            model = model._meta.get_field(part).related_model
+        return model._meta.get_field(parts[-1])
+
+
+class StandardPagination(PageNumberPagination):
+    """
+    Page number pagination with two opt-in fast paths:
+
+    * ``?paginate=cursor`` (or any ``?cursor=``) switches to keyset pagination
+      for views that declare ``cursor_ordering_fields``.
+    * ``?count=false`` skips the COUNT(*) query; ``count`` is returned as null
+      and ``next`` is detected by fetching one extra row.
+    """
+    cursor_param_value = 'cursor'
+    paginate_query_param = 'paginate'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        self.skip_count = False
+        self.request = request
+
+        if self.use_keyset(queryset, request, view):
+            self.keyset = KeysetPagination(page_size=self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        if request.query_params.get(self.count_query_param, '').lower() in ('0', 'false', 'no'):
+            return self.paginate_without_count(queryset, request)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def use_keyset(self, queryset, request, view):
+        wants_cursor = (
+            request.query_params.get(self.paginate_query_param) == self.cursor_param_value or
+            KeysetPagination.cursor_query_param in request.query_params
+        )
+        if not wants_cursor or not hasattr(view, 'cursor_ordering_fields'):
+            return False
+        return KeysetPagination.get_ordering(queryset, view) is not None
+
+    def paginate_without_count(self, queryset, request):
+        self.skip_count = True
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param) or 1)
+            if self.page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(page_number='', message='Invalid page number.'))
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        if self.skip_count:
+            return Response({
+                'count': None,
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'results': data,
+            })
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.skip_count:
+            if not self.has_next:
+                return None
+            url = self.request.build_absolute_uri()
+            return replace_query_param(url, self.page_query_param, self.page_number + 1)
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.skip_count:
+            if self.page_number <= 1:
+                return None
+            url = self.request.build_absolute_uri()
+            if self.page_number == 2:
+                return remove_query_param(url, self.page_query_param)
+            return replace_query_param(url, self.page_query_param, self.page_number - 1)
+        return super().get_previous_link()
+
+
+class InboxPagination(StandardPagination):
+    """
+    Pagination for the merged notification inbox, a UNION of personal and
+    broadcast rows. Page numbers and ``?count=false`` work as usual. In cursor
+    mode the view rebuilds the inbox with both sides filtered past the cursor's
+    ``(created_at, id)``, so each side stays a range scan. Inbox cursors only
+    move forward.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.inbox_cursor = None
+        if not (
+            request.query_params.get(self.paginate_query_param) == self.cursor_param_value or
+            KeysetPagination.cursor_query_param in request.query_params
+        ):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset = None
+        self.skip_count = False
+        self.request = request
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            queryset = view.get_inbox(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        self.inbox_cursor = rows[page_size - 1] if len(rows) > page_size else False
+        return rows[:page_size]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(KeysetPagination.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            created_at = parse_datetime(payload['v'])
+            if created_at is None:
+                raise ValueError
+            return created_at, uuid.UUID(payload['pk'])
+        except (TypeError, ValueError, KeyError, AttributeError, binascii.Error) as exc:
+            raise NotFound(KeysetPagination.invalid_cursor_message) from exc
+
+    def get_paginated_response(self, data):
+        if self.inbox_cursor is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if self.inbox_cursor is None:
+            return super().get_next_link()
+        if not self.inbox_cursor:
+            return None
+        row = self.inbox_cursor
+        payload = json.dumps(
+            {'v': row['item_created_at'].isoformat(), 'pk': str(row['item_id'])}, separators=(',', ':')
+        )
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, KeysetPagination.cursor_query_param, cursor)
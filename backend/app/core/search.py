@@ -0,0 +1,146 @@
+"""
+Full-text ticket search backed by the database's native text index
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+
+SEARCH_CONFIG = 'english'
+SQLITE_FTS_TABLE = 'core_ticket_fts'
+
+# External-content FTS5 table over core_ticket, keyed by its rowid and kept in sync by triggers
+SQLITE_FTS_STATEMENTS = {
+    SQLITE_FTS_TABLE: f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5(
+            ticket_number, subject, description,
+            content='core_ticket', content_rowid='rowid', tokenize='porter unicode61'
+        )
+    """,
+    f'{SQLITE_FTS_TABLE}_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_insert AFTER INSERT ON core_ticket BEGIN
+            INSERT INTO {SQLITE_FTS_TABLE}(rowid, ticket_number, subject, description)
+            VALUES (new.rowid, new.ticket_number, new.subject, new.description);
+        END
+    """,
+    f'{SQLITE_FTS_TABLE}_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_delete AFTER DELETE ON core_ticket BEGIN
+            INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, ticket_number, subject, description)
+            VALUES ('delete', old.rowid, old.ticket_number, old.subject, old.description);
+        END
+    """,
+    f'{SQLITE_FTS_TABLE}_update': f"""
+        CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_update
+        AFTER UPDATE OF ticket_number, subject, description ON core_ticket BEGIN
+            INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, ticket_number, subject, description)
+            VALUES ('delete', old.rowid, old.ticket_number, old.subject, old.description);
+            INSERT INTO {SQLITE_FTS_TABLE}(rowid, ticket_number, subject, description)
+            VALUES (new.rowid, new.ticket_number, new.subject, new.description);
+        END
+    """,
+}
+
+
+def install_sqlite_search_index(connection, rebuild=False):
+    """
+    Create the SQLite FTS5 table and its triggers if they are missing.
+
+    SQLite migrations that alter core_ticket copy it into a new table, which
+    drops the triggers and renumbers rowids, so the index is rebuilt whenever
+    anything had to be (re)created. Returns True when a rebuild ran.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s)" % ', '.join(['%s'] * len(SQLITE_FTS_STATEMENTS)),
+            list(SQLITE_FTS_STATEMENTS)
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        for name, statement in SQLITE_FTS_STATEMENTS.items():
+            if name not in existing:
+                cursor.execute(statement)
+                rebuild = True
+        if rebuild:
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+    return rebuild
+
+
+def ensure_search_index(sender, using='default', **kwargs):
+    """
+    post_migrate hook that repairs the SQLite search index after table rebuilds
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and SQLITE_FTS_TABLE in connection.introspection.table_names():
+        install_sqlite_search_index(connection)
+
+
+class TicketSearchBackend:
+    """
+    Filter a ticket queryset by a free-text query and annotate ``search_rank``
+    (higher is more relevant).
+
+    PostgreSQL matches the generated ``search_vector`` column through its GIN
+    index, SQLite matches the ``core_ticket_fts`` FTS5 table. An exact ticket
+    number always matches. Other databases fall back to ``icontains``.
+    """
+
+    @classmethod
+    def search(cls, queryset, query):
+        vendor = connections[queryset.db].vendor
+        table = connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)
+        exact_number = Q(ticket_number=query.strip().upper())
+
+        if vendor == 'postgresql':
+            return cls._search_postgresql(queryset, query, table, exact_number)
+        if vendor == 'sqlite':
+            return cls._search_sqlite(queryset, query, table, exact_number)
+
+        return queryset.filter(
+            Q(subject__icontains=query) | Q(description__icontains=query) | Q(ticket_number__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    @staticmethod
+    def _search_postgresql(queryset, query, table, exact_number):
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        matches = RawSQL(f"{table}.search_vector @@ {tsquery}", [query], output_field=BooleanField())
+        rank = RawSQL(f"ts_rank_cd({table}.search_vector, {tsquery})", [query], output_field=FloatField())
+        return queryset.filter(Q(matches) | exact_number).annotate(search_rank=rank)
+
+    @staticmethod
+    def _search_sqlite(queryset, query, table, exact_number):
+        # Quote every word so user input can't form FTS5 syntax, and match prefixes
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return queryset.filter(exact_number).annotate(search_rank=Value(0.0, output_field=FloatField()))
+        match = ' '.join(f'"{term}"*' for term in terms)
+
+        matches = RawSQL(
+            f"{table}.rowid IN (SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s)",
+            [match], output_field=BooleanField()
+        )
+        # bm25() is lower-is-better; weights mirror the A/A/B weights used on PostgreSQL
+        rank = RawSQL(
+            f"COALESCE((SELECT -bm25({SQLITE_FTS_TABLE}, 10.0, 10.0, 1.0) FROM {SQLITE_FTS_TABLE} "
+            f"WHERE {SQLITE_FTS_TABLE} MATCH %s AND {SQLITE_FTS_TABLE}.rowid = {table}.rowid), 0)",
+            [match], output_field=FloatField()
+        )
+        return queryset.filter(Q(matches) | exact_number).annotate(search_rank=rank)
+
+
+class TicketSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` through TicketSearchBackend. Results are ordered by relevance
+    unless the client asks for an explicit ``?ordering=``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').replace('\x00', '').strip()
+        if not query:
+            return queryset
+
+        queryset = TicketSearchBackend.search(queryset, query)
+        if filters.OrderingFilter.ordering_param not in request.query_params:
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
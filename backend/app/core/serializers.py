@@ -1,7 +1,13 @@
-from rest_framework import serializers
+from datetime import timedelta
+
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db.models import Prefetch
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from .models import (
     User, Category, Priority, Ticket, TicketComment, 
     TicketAttachment, TicketVote, TicketActivity, 
@@ -9,6 +15,15 @@ from .models import (
 )
 
 
+class StatusConflict(APIException):
+    """
+    The ticket's status was changed by someone else since it was loaded
+    """
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The ticket was changed by someone else.'
+    default_code = 'conflict'
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """
     Serializer for user registration
@@ -131,6 +146,38 @@ class PrioritySerializer(serializers.ModelSerializer):
         return obj.tickets.count()
 
 
+class UserSummarySerializer(serializers.ModelSerializer):
+    """
+    Lightweight user representation for embedding, without per-user counts
+    """
+    full_name = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'full_name', 'role']
+    
+    def get_full_name(self, obj):
+        return obj.get_full_name()
+
+
+class CategorySummarySerializer(serializers.ModelSerializer):
+    """
+    Compact category representation for embedding in ticket payloads
+    """
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'color']
+
+
+class PrioritySummarySerializer(serializers.ModelSerializer):
+    """
+    Compact priority representation for embedding in ticket payloads
+    """
+    class Meta:
+        model = Priority
+        fields = ['id', 'name', 'level', 'color']
+
+
 class TicketAttachmentSerializer(serializers.ModelSerializer):
     """
     Serializer for ticket attachments
@@ -193,7 +240,145 @@ class TicketActivitySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class TicketListSerializer(serializers.ModelSerializer):
+class TicketChangeCommentSerializer(TicketCommentSerializer):
+    """
+    Comment in the changes feed, with its ticket id
+    """
+    ticket = serializers.UUIDField(source='ticket_id', read_only=True)
+    
+    class Meta(TicketCommentSerializer.Meta):
+        fields = ['ticket'] + TicketCommentSerializer.Meta.fields
+
+
+class TicketChangeActivitySerializer(TicketActivitySerializer):
+    """
+    Activity in the changes feed, with its ticket id
+    """
+    ticket = serializers.UUIDField(source='ticket_id', read_only=True)
+    
+    class Meta(TicketActivitySerializer.Meta):
+        fields = ['ticket'] + TicketActivitySerializer.Meta.fields
+
+
+class DynamicFieldsMixin:
+    """
+    Lets clients choose the shape of a ticket payload:
+
+    * ``?fields=id,status,assigned_to`` keeps only the listed fields
+    * ``?expand=assigned_to,comments`` nests only the listed relations;
+      other relations are rendered as ids, or left out for collections
+
+    ``setup_eager_loading`` builds the matching queryset, so relations and
+    heavy columns the client did not ask for are never queried.
+    """
+    # name -> factory for the nested serializer field
+    expandable_fields = {}
+    # relations expanded when the request has no ?expand=
+    default_expand = ()
+    # collection name -> extra prefetch lookups needed by its serializer
+    prefetch_lookups = {}
+    # large columns deferred when no selected field reads them
+    deferrable_fields = ('description', 'tags')
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = self.get_field_selection(self.context.get('request'))
+        
+        for name, factory in self.expandable_fields.items():
+            if name in expand:
+                self.fields[name] = factory()
+            elif name in self.fields:
+                collapsed = self.collapse_field(name)
+                if collapsed is None:
+                    self.fields.pop(name)
+                else:
+                    self.fields[name] = collapsed
+        
+        if fields is not None:
+            for name in set(self.fields) - fields - expand:
+                self.fields.pop(name)
+    
+    @classmethod
+    def get_field_selection(cls, request):
+        """
+        Return ``(fields, expand)`` requested by the client; ``fields`` is
+        ``None`` when every field should be rendered
+        """
+        params = getattr(request, 'query_params', {})
+        fields = params.get('fields')
+        expand = params.get('expand')
+        
+        fields = {name.strip() for name in fields.split(',') if name.strip()} if fields else None
+        if expand is None:
+            expand = set(cls.default_expand)
+            if fields is not None:
+                expand &= fields
+        else:
+            expand = {name.strip() for name in expand.split(',') if name.strip()}
+        return fields, expand & set(cls.expandable_fields)
+    
+    def collapse_field(self, name):
+        model_field = self.Meta.model._meta.get_field(name)
+        if model_field.many_to_one or model_field.one_to_one:
+            return serializers.PrimaryKeyRelatedField(read_only=True)
+        return None
+    
+    @classmethod
+    def get_prefetches(cls, name, request):
+        """
+        Prefetch lookups for an embedded collection
+        """
+        return [name] + cls.prefetch_lookups.get(name, [])
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset, request):
+        """
+        Join, prefetch and annotate only what the selected fields need
+        """
+        from django.core.exceptions import FieldDoesNotExist
+        
+        serializer = cls(context={'request': request})
+        model = queryset.model
+        used = set()
+        select_related = set()
+        prefetch_related = []
+        
+        for name, field in serializer.fields.items():
+            if field.source == '*':
+                continue
+            root = field.source_attrs[0]
+            used.add(root)
+            try:
+                model_field = model._meta.get_field(root)
+            except FieldDoesNotExist:
+                # Collections read from a Prefetch to_attr are named after the relation
+                try:
+                    model_field = model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    continue
+                root = name
+            if model_field.many_to_one or model_field.one_to_one:
+                if len(field.source_attrs) > 1 or isinstance(field, serializers.BaseSerializer):
+                    select_related.add(root)
+            elif model_field.one_to_many or model_field.many_to_many:
+                prefetch_related.extend(cls.get_prefetches(root, request))
+        
+        if select_related:
+            queryset = queryset.select_related(*sorted(select_related))
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        
+        deferred = [name for name in cls.deferrable_fields if name not in used]
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        
+        if 'user_vote' in serializer.fields:
+            queryset = queryset.with_list_annotations(getattr(request, 'user', None))
+        
+        return queryset
+
+
+class TicketListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Simplified serializer for ticket lists
     """
@@ -203,26 +388,31 @@ class TicketListSerializer(serializers.ModelSerializer):
     category_color = serializers.CharField(source='category.color', read_only=True)
     priority_name = serializers.CharField(source='priority.name', read_only=True)
     priority_level = serializers.IntegerField(source='priority.level', read_only=True)
-    comments_count = serializers.SerializerMethodField()
-    attachments_count = serializers.SerializerMethodField()
+    comments_count = serializers.IntegerField(source='comment_count', read_only=True)
+    attachments_count = serializers.IntegerField(source='attachment_count', read_only=True)
     user_vote = serializers.SerializerMethodField()
     
     class Meta:
         model = Ticket
         fields = ['id', 'ticket_number', 'subject', 'status', 'created_by_username',
                  'assigned_to_username', 'category_name', 'category_color',
-                 'priority_name', 'priority_level', 'upvotes', 'downvotes',
+                 'priority_name', 'priority_level', 'upvotes', 'downvotes', 'hot_score',
                  'comments_count', 'attachments_count', 'user_vote',
+                 'last_activity_at', 'last_commenter_role',
                  'created_at', 'updated_at', 'resolved_at', 'is_internal']
         read_only_fields = ['id', 'ticket_number', 'created_at', 'updated_at']
     
-    def get_comments_count(self, obj):
-        return obj.comments.count()
-    
-    def get_attachments_count(self, obj):
-        return obj.attachments.count()
+    expandable_fields = {
+        'created_by': lambda: UserSummarySerializer(read_only=True),
+        'assigned_to': lambda: UserSummarySerializer(read_only=True),
+        'category': lambda: CategorySummarySerializer(read_only=True),
+        'priority': lambda: PrioritySummarySerializer(read_only=True),
+    }
     
     def get_user_vote(self, obj):
+        # Prefer the value annotated by TicketQuerySet.with_list_annotations
+        if hasattr(obj, 'user_vote'):
+            return obj.user_vote
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             vote = obj.votes.filter(user=request.user).first()
@@ -230,17 +420,24 @@ class TicketListSerializer(serializers.ModelSerializer):
         return None
 
 
-class TicketDetailSerializer(serializers.ModelSerializer):
+class TicketDetailSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Detailed serializer for individual tickets
+
+    With ``?embed_limit=N`` only the latest N comments, attachments and
+    activities are embedded (newest first), and ``<collection>_next`` links
+    page through the rest of each collection.
     """
-    created_by = UserSerializer(read_only=True)
-    assigned_to = UserSerializer(read_only=True)
+    created_by = UserSummarySerializer(read_only=True)
+    assigned_to = UserSummarySerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     priority = PrioritySerializer(read_only=True)
     comments = TicketCommentSerializer(many=True, read_only=True)
     attachments = TicketAttachmentSerializer(many=True, read_only=True)
     activities = TicketActivitySerializer(many=True, read_only=True)
+    comments_next = serializers.SerializerMethodField()
+    attachments_next = serializers.SerializerMethodField()
+    activities_next = serializers.SerializerMethodField()
     user_vote = serializers.SerializerMethodField()
     response_time = serializers.SerializerMethodField()
     resolution_time = serializers.SerializerMethodField()
@@ -251,12 +448,106 @@ class TicketDetailSerializer(serializers.ModelSerializer):
                  'created_by', 'assigned_to', 'category', 'priority',
                  'upvotes', 'downvotes', 'user_vote', 'tags', 'is_internal',
                  'comments', 'attachments', 'activities',
-                 'response_time', 'resolution_time',
+                 'comments_next', 'attachments_next', 'activities_next',
+                 'comment_count', 'attachment_count', 'last_activity_at', 'last_commenter_role',
+                 'first_response_at', 'response_time', 'resolution_time',
+                 'first_response_due_at', 'resolution_due_at', 'first_response_breached_at', 'resolution_breached_at',
                  'created_at', 'updated_at', 'resolved_at', 'closed_at']
         read_only_fields = ['id', 'ticket_number', 'upvotes', 'downvotes',
+                           'comment_count', 'attachment_count', 'last_activity_at', 'last_commenter_role',
+                           'first_response_at', 'first_response_due_at', 'resolution_due_at',
+                           'first_response_breached_at', 'resolution_breached_at',
                            'created_at', 'updated_at', 'resolved_at', 'closed_at']
     
+    expandable_fields = {
+        'created_by': lambda: UserSummarySerializer(read_only=True),
+        'assigned_to': lambda: UserSummarySerializer(read_only=True),
+        'category': lambda: CategorySerializer(read_only=True),
+        'priority': lambda: PrioritySerializer(read_only=True),
+        'comments': lambda **kwargs: TicketCommentSerializer(many=True, read_only=True, **kwargs),
+        'attachments': lambda **kwargs: TicketAttachmentSerializer(many=True, read_only=True, **kwargs),
+        'activities': lambda **kwargs: TicketActivitySerializer(many=True, read_only=True, **kwargs),
+    }
+    default_expand = tuple(expandable_fields)
+    
+    # Sub-resource that pages through each embedded collection
+    collection_urls = {
+        'comments': '/api/tickets/{pk}/comments/?ordering=-created_at',
+        'attachments': '/api/tickets/{pk}/attachments/?ordering=-created_at',
+        'activities': '/api/tickets/{pk}/activities/',
+    }
+    max_embed_limit = 100
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        self.embed_limit = self.get_embed_limit(self.context.get('request'))
+        for name in self.collection_urls:
+            if self.embed_limit is None or name not in self.fields:
+                self.fields.pop(f'{name}_next', None)
+            else:
+                # Sliced prefetches are stored on a separate attribute
+                self.fields[name] = self.expandable_fields[name](source=f'embedded_{name}')
+    
+    @classmethod
+    def get_embed_limit(cls, request):
+        value = getattr(request, 'query_params', {}).get('embed_limit')
+        try:
+            return min(max(int(value), 1), cls.max_embed_limit)
+        except (TypeError, ValueError):
+            return None
+    
+    @classmethod
+    def get_prefetches(cls, name, request):
+        """
+        Prefetch each embedded collection with everything its serializer reads,
+        keeping only the latest rows in embed_limit mode
+        """
+        user = getattr(request, 'user', None)
+        if name == 'comments':
+            queryset = TicketComment.objects.select_related('created_by').prefetch_related(
+                Prefetch('attachments', queryset=TicketAttachment.objects.select_related('uploaded_by'))
+            )
+            if user is not None and getattr(user, 'role', None) == 'customer':
+                queryset = queryset.filter(is_internal=False)
+        elif name == 'attachments':
+            queryset = TicketAttachment.objects.select_related('uploaded_by').order_by('created_at')
+        elif name == 'activities':
+            queryset = TicketActivity.objects.select_related('user')
+        else:
+            return super().get_prefetches(name, request)
+        
+        limit = cls.get_embed_limit(request)
+        if limit is not None:
+            queryset = queryset.order_by('-created_at', '-pk')[:limit]
+            return [Prefetch(name, queryset=queryset, to_attr=f'embedded_{name}')]
+        return [Prefetch(name, queryset=queryset)]
+    
+    def get_collection_next(self, obj, name):
+        rows = getattr(obj, f'embedded_{name}')
+        if len(rows) < self.embed_limit:
+            return None
+        from .pagination import KeysetPagination
+        
+        cursor = KeysetPagination.cursor_after(rows[-1], 'created_at')
+        url = self.collection_urls[name].format(pk=obj.pk)
+        url = f"{url}{'&' if '?' in url else '?'}cursor={cursor}"
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_comments_next(self, obj):
+        return self.get_collection_next(obj, 'comments')
+    
+    def get_attachments_next(self, obj):
+        return self.get_collection_next(obj, 'attachments')
+    
+    def get_activities_next(self, obj):
+        return self.get_collection_next(obj, 'activities')
+    
     def get_user_vote(self, obj):
+        # Prefer the value annotated by TicketQuerySet.with_list_annotations
+        if hasattr(obj, 'user_vote'):
+            return obj.user_vote
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             vote = obj.votes.filter(user=request.user).first()
@@ -296,10 +587,16 @@ class TicketUpdateSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         # Use the service to update ticket with notifications
-        from .services import TicketService
+        from .services import TicketService, TransitionConflict, TransitionError
         
         request = self.context.get('request')
-        return TicketService.update_ticket(instance, validated_data, request.user)
+        try:
+            return TicketService.update_ticket(instance, validated_data, request.user)
+        except TransitionConflict as e:
+            # Reported like a conflict on update_status, not as invalid input
+            raise StatusConflict(str(e))
+        except TransitionError as e:
+            raise serializers.ValidationError({'status': [str(e)]})
 
 
 class CommentCreateSerializer(serializers.ModelSerializer):
@@ -313,9 +610,8 @@ class CommentCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         from .services import TicketService
         
-        # Get ticket from context
-        ticket_id = self.context['ticket_id']
-        ticket = Ticket.objects.get(id=ticket_id)
+        # The view passes the ticket it already loaded; otherwise get it from context
+        ticket = validated_data.get('ticket') or Ticket.objects.get(id=self.context['ticket_id'])
         
         # Use service to add comment with notifications
         comment = TicketService.add_comment(
@@ -323,7 +619,8 @@ class CommentCreateSerializer(serializers.ModelSerializer):
             content=validated_data['content'],
             comment_type=validated_data.get('comment_type', 'comment'),
             user=self.context['request'].user,
-            is_internal=validated_data.get('is_internal', False)
+            is_internal=validated_data.get('is_internal', False),
+            new_status=validated_data.get('new_status')
         )
         
         return comment
@@ -342,6 +639,71 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class InboxNotificationSerializer(serializers.Serializer):
+    """
+    Serializer for inbox rows, which merge personal and broadcast notifications
+    """
+    id = serializers.UUIDField(source='item_id')
+    notification_type = serializers.CharField(source='item_type')
+    title = serializers.CharField(source='item_title')
+    message = serializers.CharField(source='item_message')
+    is_read = serializers.BooleanField(source='item_read')
+    ticket_number = serializers.CharField(source='item_ticket_number')
+    is_broadcast = serializers.BooleanField(source='item_broadcast')
+    created_at = serializers.DateTimeField(source='item_created_at')
+
+
+class NotificationMarkReadSerializer(serializers.Serializer):
+    """
+    Serializer for bulk mark-read: a list of ids, or everything up to one notification
+    """
+    MAX_IDS = 500
+    
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False, max_length=MAX_IDS)
+    up_to = serializers.UUIDField(required=False)
+    
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('up_to' in attrs):
+            raise serializers.ValidationError("Provide either ids or up_to")
+        return attrs
+
+
+class TicketBulkUpdateSerializer(serializers.Serializer):
+    """
+    Serializer for bulk ticket updates: the tickets and the changes applied to all of them
+    """
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+    status = serializers.ChoiceField(choices=Ticket.STATUS_CHOICES, required=False)
+    assigned_to = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.filter(role='agent', is_active=True), required=False, allow_null=True
+    )
+    priority = serializers.PrimaryKeyRelatedField(queryset=Priority.objects.all(), required=False)
+    category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.filter(is_active=True), required=False)
+    add_tags = serializers.ListField(
+        child=serializers.CharField(max_length=50), required=False, allow_empty=False
+    )
+    
+    def validate_ids(self, value):
+        max_ids = settings.QUICKDESK_SETTINGS.get('TICKET_BULK_MAX_IDS', 5000)
+        value = list(dict.fromkeys(value))
+        if len(value) > max_ids:
+            raise serializers.ValidationError(f"At most {max_ids} tickets can be updated at once")
+        return value
+    
+    def validate_add_tags(self, value):
+        tags = list(dict.fromkeys(tag.strip() for tag in value if tag.strip()))
+        if not tags:
+            raise serializers.ValidationError("Provide at least one non-blank tag")
+        return tags
+    
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError(
+                "Provide at least one of status, assigned_to, priority, category or add_tags"
+            )
+        return attrs
+
+
 class DashboardStatsSerializer(serializers.Serializer):
     """
     Serializer for dashboard statistics
@@ -353,11 +715,34 @@ class DashboardStatsSerializer(serializers.Serializer):
     closed_tickets = serializers.IntegerField()
     my_tickets = serializers.IntegerField(required=False)
     assigned_tickets = serializers.IntegerField(required=False)
+    unassigned_tickets = serializers.IntegerField(required=False)
     urgent_tickets = serializers.IntegerField()
     avg_response_time = serializers.CharField(required=False)
     avg_resolution_time = serializers.CharField(required=False)
 
 
+class DashboardTimeseriesSerializer(serializers.Serializer):
+    """
+    Serializer for dashboard time-series parameters
+    """
+    MAX_DAYS = 366
+    
+    date_from = serializers.DateField(required=False, help_text="First day (defaults to 30 days ago)")
+    date_to = serializers.DateField(required=False, help_text="Last day (defaults to today)")
+    category = serializers.UUIDField(required=False, help_text="Filter by category ID")
+    priority = serializers.UUIDField(required=False, help_text="Filter by priority ID")
+    assigned_to = serializers.UUIDField(required=False, help_text="Filter by assigned agent ID")
+    
+    def validate(self, attrs):
+        attrs.setdefault('date_to', timezone.localdate())
+        attrs.setdefault('date_from', attrs['date_to'] - timedelta(days=29))
+        if attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError("date_from must not be after date_to")
+        if (attrs['date_to'] - attrs['date_from']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"At most {self.MAX_DAYS} days can be requested")
+        return attrs
+
+
 class TicketSearchSerializer(serializers.Serializer):
     """
     Serializer for ticket search parameters
@@ -379,10 +764,13 @@ class TicketSearchSerializer(serializers.Serializer):
         choices=[
             'created_at', '-created_at',
             'updated_at', '-updated_at',
+            'last_activity_at', '-last_activity_at',
             'priority__level', '-priority__level',
             'status', '-status',
-            'upvotes', '-upvotes'
+            'upvotes', '-upvotes',
+            'hot_score', '-hot_score',
+            'relevance'
         ],
-        default='-created_at',
-        help_text="Sort by field"
+        required=False,
+        help_text="Sort by field (defaults to relevance when q is given, else -created_at)"
     )
\ No newline at end of file
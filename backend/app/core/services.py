@@ -1,18 +1,56 @@
 """
 Service classes for QuickDesk business logic
 """
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+import base64
+import binascii
+import json
+from collections import defaultdict
+
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
-from django.utils.html import strip_tags
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from . import events
+from .emails import EmailRenderer
 from .models import Notification, User
 
 
+class TransitionError(Exception):
+    """
+    A ticket status change that isn't allowed from the ticket's current status
+    """
+
+
+class TransitionConflict(TransitionError):
+    """
+    The ticket's status was changed by someone else since it was loaded
+    """
+
+
 class EmailService:
     """
     Service for sending email notifications
     """
     
+    @staticmethod
+    def queue_email(event, subject, context, recipients):
+        """
+        Render an email once for all its recipients and add it to the outbox. Call it inside
+        the transaction of the change it reports so the email is only sent if that change commits.
+        """
+        from .models import EmailOutbox
+        
+        html_message, text_message = EmailRenderer.render(event, context)
+        return EmailOutbox.objects.create(
+            event=event,
+            subject=subject,
+            body=text_message,
+            html_body=html_message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipients=recipients,
+        )
+    
     @staticmethod
     def send_ticket_created_email(ticket):
         """
@@ -48,26 +86,10 @@ class EmailService:
         # Prepare email content
         context = {
             'ticket': ticket,
-            'site_name': settings.QUICKDESK_SETTINGS.get('SITE_NAME', 'QuickDesk'),
-            'site_url': settings.QUICKDESK_SETTINGS.get('SITE_URL', 'http://localhost:3000'),
         }
         
         subject = f"New Ticket Created: {ticket.ticket_number} - {ticket.subject}"
-        html_message = render_to_string('emails/ticket_created.html', context)
-        plain_message = strip_tags(html_message)
-        
-        try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipients,
-                html_message=html_message,
-                fail_silently=False,
-            )
-        except Exception as e:
-            # Log error (you might want to use proper logging here)
-            print(f"Failed to send email: {e}")
+        EmailService.queue_email('ticket_created', subject, context, recipients)
     
     @staticmethod
     def send_ticket_updated_email(ticket, updated_by, changes):
@@ -99,25 +121,10 @@ class EmailService:
             'ticket': ticket,
             'updated_by': updated_by,
             'changes': changes,
-            'site_name': settings.QUICKDESK_SETTINGS.get('SITE_NAME', 'QuickDesk'),
-            'site_url': settings.QUICKDESK_SETTINGS.get('SITE_URL', 'http://localhost:3000'),
         }
         
         subject = f"Ticket Updated: {ticket.ticket_number} - {ticket.subject}"
-        html_message = render_to_string('emails/ticket_updated.html', context)
-        plain_message = strip_tags(html_message)
-        
-        try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipients,
-                html_message=html_message,
-                fail_silently=False,
-            )
-        except Exception as e:
-            print(f"Failed to send email: {e}")
+        EmailService.queue_email('ticket_updated', subject, context, recipients)
     
     @staticmethod
     def send_comment_added_email(comment):
@@ -160,25 +167,129 @@ class EmailService:
         context = {
             'comment': comment,
             'ticket': comment.ticket,
-            'site_name': settings.QUICKDESK_SETTINGS.get('SITE_NAME', 'QuickDesk'),
-            'site_url': settings.QUICKDESK_SETTINGS.get('SITE_URL', 'http://localhost:3000'),
         }
         
         subject = f"New Comment on Ticket: {comment.ticket.ticket_number}"
-        html_message = render_to_string('emails/comment_added.html', context)
-        plain_message = strip_tags(html_message)
+        EmailService.queue_email('comment_added', subject, context, recipients)
+
+
+class EmailOutboxService:
+    """
+    Service delivering queued emails from the outbox
+    """
+    
+    @staticmethod
+    def send_batch(batch_size=None, connection=None):
+        """
+        Send one batch of due emails over a single reused connection.
+        The batch is claimed and committed first, then each email is sent outside
+        any transaction and its result recorded as soon as it completes, so a crash
+        only repeats the email that was being sent. Failed emails are retried with
+        exponential backoff until the attempt limit is reached. Returns a dict of
+        sent / retried / failed counts.
+        """
+        results = {'sent': 0, 'retried': 0, 'failed': 0}
+        batch = EmailOutboxService.claim_batch(batch_size, results)
+        if not batch:
+            return results
         
+        connection = connection or get_connection(fail_silently=False)
         try:
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=recipients,
-                html_message=html_message,
-                fail_silently=False,
-            )
+            connection.open()
         except Exception as e:
-            print(f"Failed to send email: {e}")
+            for email in batch:
+                results[EmailOutboxService.record_failure(email, e)] += 1
+            return results
+        
+        try:
+            for email in batch:
+                message = EmailMultiAlternatives(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email,
+                    to=email.recipients,
+                    connection=connection,
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, 'text/html')
+                try:
+                    connection.send_messages([message])
+                except Exception as e:
+                    results[EmailOutboxService.record_failure(email, e)] += 1
+                else:
+                    EmailOutboxService.record_sent(email)
+                    results['sent'] += 1
+        finally:
+            connection.close()
+        return results
+    
+    @staticmethod
+    def claim_batch(batch_size, results):
+        """
+        Mark the next due emails as sending and count the attempt. Emails left sending
+        for EMAIL_OUTBOX_CLAIM_SECONDS by a worker that stopped are claimed again, or
+        given up once they have used all their attempts.
+        """
+        from datetime import timedelta
+        from .models import EmailOutbox
+        
+        options = settings.QUICKDESK_SETTINGS
+        batch_size = batch_size or options.get('EMAIL_OUTBOX_BATCH_SIZE', 50)
+        max_attempts = options.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        now = timezone.now()
+        
+        with transaction.atomic():
+            # Locked rows are skipped so several workers can drain the outbox side by side
+            batch = list(
+                EmailOutbox.objects.select_for_update(skip_locked=True)
+                .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+                .order_by('next_attempt_at', 'pk')[:batch_size]
+            )
+            abandoned = [email.pk for email in batch if email.attempts >= max_attempts]
+            if abandoned:
+                EmailOutbox.objects.filter(pk__in=abandoned).update(
+                    status='failed', last_error='Worker stopped while sending'
+                )
+                results['failed'] += len(abandoned)
+                batch = [email for email in batch if email.pk not in abandoned]
+            if batch:
+                EmailOutbox.objects.filter(pk__in=[email.pk for email in batch]).update(
+                    status='sending',
+                    attempts=F('attempts') + 1,
+                    next_attempt_at=now + timedelta(seconds=options.get('EMAIL_OUTBOX_CLAIM_SECONDS', 300)),
+                )
+        for email in batch:
+            email.attempts += 1
+        return batch
+    
+    @staticmethod
+    def record_sent(email):
+        from .models import EmailOutbox
+        
+        EmailOutbox.objects.filter(pk=email.pk).update(status='sent', sent_at=timezone.now(), last_error='')
+    
+    @staticmethod
+    def record_failure(email, error):
+        """
+        Schedule the next attempt, or give up after EMAIL_OUTBOX_MAX_ATTEMPTS.
+        Returns 'retried' or 'failed'.
+        """
+        from datetime import timedelta
+        from .models import EmailOutbox
+        
+        options = settings.QUICKDESK_SETTINGS
+        last_error = f"{type(error).__name__}: {error}"
+        if email.attempts >= options.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5):
+            EmailOutbox.objects.filter(pk=email.pk).update(status='failed', last_error=last_error)
+            return 'failed'
+        
+        delay = options.get('EMAIL_OUTBOX_RETRY_SECONDS', 30) * 2 ** (email.attempts - 1)
+        EmailOutbox.objects.filter(pk=email.pk).update(
+            status='pending',
+            last_error=last_error,
+            next_attempt_at=timezone.now() + timedelta(seconds=min(delay, 3600)),
+        )
+        return 'retried'
 
 
 class NotificationService:
@@ -187,15 +298,16 @@ class NotificationService:
     """
     
     @staticmethod
-    def create_ticket_notification(ticket, notification_type, recipient):
+    def ticket_notification_content(ticket, notification_type, message=None):
         """
-        Create a notification for ticket events
+        Title and message of a notification for ticket events
         """
         title_map = {
             'ticket_created': f"New ticket created: {ticket.ticket_number}",
             'ticket_assigned': f"Ticket assigned to you: {ticket.ticket_number}",
             'ticket_updated': f"Ticket updated: {ticket.ticket_number}",
             'status_changed': f"Ticket status changed: {ticket.ticket_number}",
+            'sla_breached': f"SLA breached: {ticket.ticket_number}",
         }
         
         message_map = {
@@ -205,12 +317,36 @@ class NotificationService:
             'status_changed': f"The status of ticket '{ticket.subject}' has been changed to {ticket.get_status_display()}",
         }
         
-        Notification.objects.create(
-            user=recipient,
-            ticket=ticket,
-            notification_type=notification_type,
-            title=title_map.get(notification_type, f"Ticket notification: {ticket.ticket_number}"),
-            message=message_map.get(notification_type, f"Update on ticket: {ticket.subject}")
+        return (
+            title_map.get(notification_type, f"Ticket notification: {ticket.ticket_number}"),
+            message or message_map.get(notification_type, f"Update on ticket: {ticket.subject}"),
+        )
+    
+    @staticmethod
+    def create_ticket_notification(ticket, notification_type, recipient, message=None):
+        """
+        Create a notification for ticket events
+        """
+        title, message = NotificationService.ticket_notification_content(ticket, notification_type, message)
+        with transaction.atomic():
+            Notification.objects.create(
+                user=recipient,
+                ticket=ticket,
+                notification_type=notification_type,
+                title=title,
+                message=message
+            )
+            NotificationService.adjust_unread([recipient.pk], 1)
+            events.publish_notification(ticket, notification_type, title, user_ids=[recipient.pk])
+    
+    @staticmethod
+    def comment_notification_content(comment):
+        """
+        Title and message of a notification for new comments
+        """
+        return (
+            f"New comment on ticket: {comment.ticket.ticket_number}",
+            f"{comment.created_by.get_full_name() or comment.created_by.username} added a comment to '{comment.ticket.subject}'",
         )
     
     @staticmethod
@@ -218,13 +354,347 @@ class NotificationService:
         """
         Create a notification for new comments
         """
-        Notification.objects.create(
-            user=recipient,
-            ticket=comment.ticket,
-            notification_type='comment_added',
-            title=f"New comment on ticket: {comment.ticket.ticket_number}",
-            message=f"{comment.created_by.get_full_name() or comment.created_by.username} added a comment to '{comment.ticket.subject}'"
+        title, message = NotificationService.comment_notification_content(comment)
+        with transaction.atomic():
+            Notification.objects.create(
+                user=recipient,
+                ticket=comment.ticket,
+                notification_type='comment_added',
+                title=title,
+                message=message
+            )
+            NotificationService.adjust_unread([recipient.pk], 1)
+            events.publish_notification(comment.ticket, 'comment_added', title, user_ids=[recipient.pk])
+    
+    @staticmethod
+    def notify_ticket_event(ticket, notification_type, recipients, message=None):
+        """
+        Fan a ticket event notification out to many recipients
+        """
+        title, message = NotificationService.ticket_notification_content(ticket, notification_type, message)
+        return NotificationService.fan_out(recipients, ticket, notification_type, title, message)
+    
+    @staticmethod
+    def notify_comment(comment, recipients):
+        """
+        Fan a new comment notification out to many recipients
+        """
+        title, message = NotificationService.comment_notification_content(comment)
+        return NotificationService.fan_out(recipients, comment.ticket, 'comment_added', title, message)
+    
+    @staticmethod
+    def broadcast(audience, ticket, notification_type, title, message, excluded_user=None):
+        """
+        Notify a whole audience (see BroadcastNotification.AUDIENCE_CHOICES) with one row.
+        Members see it through their inbox, so the cost doesn't grow with the audience.
+        """
+        from .models import BroadcastNotification, NotificationReadState
+        
+        broadcast = BroadcastNotification.objects.create(
+            audience=audience,
+            ticket=ticket,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            excluded_user=excluded_user
+        )
+        # One UPDATE over the members' read states keeps their badge counts current
+        members = NotificationReadState.objects.filter(
+            user__role__in=BroadcastNotification.AUDIENCE_ROLES[audience],
+            user__date_joined__lte=broadcast.created_at,
+        )
+        if excluded_user is not None:
+            members = members.exclude(user=excluded_user)
+        NotificationService.adjust_broadcast_unread(members, 1)
+        events.publish_notification(
+            ticket, notification_type, title, audience=audience,
+            excluded_user_id=excluded_user.pk if excluded_user else None
+        )
+        return broadcast
+    
+    @staticmethod
+    def broadcast_ticket_event(ticket, notification_type, audience, excluded_user=None, message=None):
+        """
+        Broadcast a ticket event notification to an audience
+        """
+        title, message = NotificationService.ticket_notification_content(ticket, notification_type, message)
+        return NotificationService.broadcast(audience, ticket, notification_type, title, message, excluded_user)
+    
+    @staticmethod
+    def broadcast_comment(comment, audience):
+        """
+        Broadcast a new comment notification to an audience, except its author
+        """
+        title, message = NotificationService.comment_notification_content(comment)
+        return NotificationService.broadcast(
+            audience, comment.ticket, 'comment_added', title, message, comment.created_by
+        )
+    
+    @staticmethod
+    def broadcasts_for(user):
+        """
+        Broadcasts visible to the user, annotated with their per-user is_read state
+        """
+        from django.db.models import BooleanField, Case, Exists, OuterRef, Q, Subquery, Value, When
+        from .models import BroadcastNotification, BroadcastOverride, NotificationReadState
+        
+        overrides = BroadcastOverride.objects.filter(user=user, broadcast=OuterRef('pk'))
+        read_until = NotificationReadState.objects.filter(user=user).values('broadcasts_read_at')
+        return BroadcastNotification.objects.filter(
+            audience__in=BroadcastNotification.audiences_for(user),
+            created_at__gte=user.date_joined,
+        ).exclude(
+            excluded_user=user
+        ).exclude(
+            Exists(overrides.filter(is_hidden=True))
+        ).annotate(
+            is_read=Case(
+                When(Q(created_at__lte=Subquery(read_until)) | Exists(overrides.filter(is_read=True)), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
+    
+    @staticmethod
+    def inbox(user, condition=None):
+        """
+        The user's personal notifications merged with the broadcasts they can see,
+        newest first, as one UNION ALL query of dicts. ``condition`` (a Q object) is
+        applied to both sides, e.g. for keyset pagination.
+        """
+        from django.db.models import BooleanField, CharField, F, Value
+        
+        personal = Notification.objects.filter(user=user)
+        broadcasts = NotificationService.broadcasts_for(user)
+        if condition is not None:
+            personal = personal.filter(condition)
+            broadcasts = broadcasts.filter(condition)
+        
+        sides = []
+        for queryset, is_broadcast in ((personal, False), (broadcasts, True)):
+            # Alias every column so both sides select them in the same order
+            sides.append(queryset.order_by().values(
+                **{
+                    'item_id': F('id'),
+                    'item_type': F('notification_type'),
+                    'item_title': F('title'),
+                    'item_message': F('message'),
+                    'item_read': F('is_read'),
+                    'item_ticket_number': F('ticket__ticket_number'),
+                    'item_broadcast': Value(is_broadcast, output_field=BooleanField()),
+                    'item_created_at': F('created_at'),
+                }
+            ))
+        return sides[0].union(sides[1], all=True).order_by('-item_created_at', '-item_id')
+    
+    @staticmethod
+    def set_broadcast_state(user, broadcast_id, **state):
+        """
+        Record the user's own is_read / is_hidden state of a visible broadcast.
+        Returns False if the user can't see the broadcast.
+        """
+        from .models import BroadcastOverride, NotificationReadState
+        
+        with transaction.atomic():
+            was_read = NotificationService.broadcasts_for(user).filter(pk=broadcast_id).values_list(
+                'is_read', flat=True
+            ).first()
+            if was_read is None:
+                return False
+            BroadcastOverride.objects.update_or_create(user=user, broadcast_id=broadcast_id, defaults=state)
+            if not was_read and (state.get('is_read') or state.get('is_hidden')):
+                NotificationService.adjust_broadcast_unread(NotificationReadState.objects.filter(user=user), -1)
+        return True
+    
+    @staticmethod
+    def adjust_unread(user_ids, delta):
+        """
+        Shift the maintained unread counters of the given users. Users without a
+        read state yet are skipped; their count is taken when the state is created.
+        """
+        from django.db.models.functions import Greatest
+        from .models import NotificationReadState
+        
+        if delta:
+            NotificationReadState.objects.filter(user_id__in=user_ids).update(
+                unread_count=Greatest(F('unread_count') + delta, 0)
+            )
+    
+    @staticmethod
+    def adjust_broadcast_unread(states, delta):
+        """
+        Shift the unread broadcast counters of a NotificationReadState queryset.
+        Counters that are still to be recounted are left alone.
+        """
+        from django.db.models.functions import Greatest
+        
+        if delta:
+            states.filter(unread_broadcast_count__isnull=False).update(
+                unread_broadcast_count=Greatest(F('unread_broadcast_count') + delta, 0)
+            )
+    
+    @staticmethod
+    def count_unread_broadcasts(user, read_until=None):
+        """
+        Unread broadcasts of the user, counted from the broadcasts themselves
+        """
+        broadcasts = NotificationService.broadcasts_for(user).filter(is_read=False)
+        if read_until is not None:
+            # Lets the (audience, created_at) index skip everything the cursor covers
+            broadcasts = broadcasts.filter(created_at__gt=read_until)
+        return broadcasts.count()
+    
+    @staticmethod
+    def broadcast_deleted(sender, instance, **kwargs):
+        """
+        post_delete receiver: have the audience's broadcast counters recounted
+        """
+        from .models import BroadcastNotification, NotificationReadState
+        
+        NotificationReadState.objects.filter(
+            user__role__in=BroadcastNotification.AUDIENCE_ROLES.get(instance.audience, ())
+        ).update(unread_broadcast_count=None)
+    
+    @staticmethod
+    def get_read_state(user, for_update=False):
+        """
+        The user's read state, created with a fresh unread count if missing
+        """
+        from .models import NotificationReadState
+        
+        queryset = NotificationReadState.objects.filter(user=user)
+        if for_update:
+            queryset = queryset.select_for_update()
+        state = queryset.first()
+        if state is None:
+            state, _ = NotificationReadState.objects.get_or_create(
+                user=user,
+                defaults={'unread_count': Notification.objects.filter(user=user, is_read=False).count()}
+            )
+        if state.unread_broadcast_count is None:
+            state.unread_broadcast_count = NotificationService.count_unread_broadcasts(user, state.broadcasts_read_at)
+            NotificationReadState.objects.filter(user=user).update(unread_broadcast_count=state.unread_broadcast_count)
+        return state
+    
+    @staticmethod
+    def recount_unread(user_ids):
+        """
+        Recompute the unread counters of the given users, e.g. after a bulk update
+        """
+        from django.db.models import Count, OuterRef, Subquery, Value
+        from django.db.models.functions import Coalesce
+        from .models import NotificationReadState
+        
+        unread = Notification.objects.filter(user=OuterRef('user'), is_read=False).order_by().values('user')
+        NotificationReadState.objects.filter(user_id__in=user_ids).update(
+            unread_count=Coalesce(Subquery(unread.annotate(total=Count('pk')).values('total')), Value(0)),
+            # Broadcasts are recounted on the next read
+            unread_broadcast_count=None,
         )
+    
+    @staticmethod
+    def unread_count(user):
+        """
+        Unread personal notifications plus unread broadcasts, both read from the
+        maintained counters
+        """
+        state = NotificationService.get_read_state(user)
+        return state.unread_count + state.unread_broadcast_count
+    
+    @staticmethod
+    def mark_read(user, ids):
+        """
+        Mark the given personal notifications and broadcasts read.
+        Returns the number of notifications that were unread.
+        """
+        from .models import BroadcastOverride, NotificationReadState
+        
+        with transaction.atomic():
+            count = Notification.objects.filter(user=user, pk__in=ids, is_read=False).update(is_read=True)
+            NotificationService.adjust_unread([user.pk], -count)
+            
+            broadcast_ids = list(
+                NotificationService.broadcasts_for(user).filter(pk__in=ids, is_read=False).values_list('pk', flat=True)
+            )
+            BroadcastOverride.objects.bulk_create(
+                [BroadcastOverride(user=user, broadcast_id=broadcast_id, is_read=True) for broadcast_id in broadcast_ids],
+                update_conflicts=True, unique_fields=['user', 'broadcast'], update_fields=['is_read', 'updated_at']
+            )
+            NotificationService.adjust_broadcast_unread(NotificationReadState.objects.filter(user=user), -len(broadcast_ids))
+        return count + len(broadcast_ids)
+    
+    @staticmethod
+    def mark_read_until(user, until):
+        """
+        Mark every notification created at or before ``until`` read and move the
+        broadcast read cursor up to it. Returns the number of notifications that were unread.
+        """
+        from .models import BroadcastOverride
+        
+        with transaction.atomic():
+            state = NotificationService.get_read_state(user, for_update=True)
+            count = NotificationService.broadcasts_for(user).filter(is_read=False, created_at__lte=until).count()
+            updated = Notification.objects.filter(user=user, is_read=False, created_at__lte=until).update(is_read=True)
+            
+            state.unread_count = max(state.unread_count - updated, 0)
+            state.unread_broadcast_count = max(state.unread_broadcast_count - count, 0)
+            if state.broadcasts_read_at is None or state.broadcasts_read_at < until:
+                state.broadcasts_read_at = until
+            state.save()
+            # The cursor covers these now; only hidden broadcasts still need an override
+            BroadcastOverride.objects.filter(
+                user=user, is_hidden=False, broadcast__created_at__lte=state.broadcasts_read_at
+            ).delete()
+        return count + updated
+    
+    @staticmethod
+    def mark_all_read(user):
+        """
+        Mark every notification read. Returns the number of notifications that were unread.
+        """
+        return NotificationService.mark_read_until(user, timezone.now())
+    
+    @staticmethod
+    def notification_deleted(sender, instance, **kwargs):
+        """
+        Keep the unread counter right when an unread notification is deleted
+        """
+        if not instance.is_read:
+            NotificationService.adjust_unread([instance.user_id], -1)
+    
+    @staticmethod
+    def fan_out(recipients, ticket, notification_type, title, message, batch_size=None):
+        """
+        Create the same notification for every recipient with chunked bulk INSERTs
+        in one transaction. ``recipients`` may be a User queryset, users or user ids.
+        Returns the number of notifications created.
+        """
+        from django.db.models.query import QuerySet
+        
+        if isinstance(recipients, QuerySet):
+            # Only the ids are needed, so skip building User instances
+            user_ids = list(recipients.values_list('pk', flat=True))
+        else:
+            user_ids = [getattr(recipient, 'pk', recipient) for recipient in recipients]
+        if not user_ids:
+            return 0
+        
+        batch_size = batch_size or settings.QUICKDESK_SETTINGS.get('NOTIFICATION_BATCH_SIZE', 500)
+        with transaction.atomic():
+            for start in range(0, len(user_ids), batch_size):
+                Notification.objects.bulk_create([
+                    Notification(
+                        user_id=user_id,
+                        ticket=ticket,
+                        notification_type=notification_type,
+                        title=title,
+                        message=message,
+                    )
+                    for user_id in user_ids[start:start + batch_size]
+                ])
+                NotificationService.adjust_unread(user_ids[start:start + batch_size], 1)
+            events.publish_notification(ticket, notification_type, title, user_ids=user_ids)
+        return len(user_ids)
 
 
 class TicketService:
@@ -232,95 +702,236 @@ class TicketService:
     Service for ticket-related business logic
     """
     
+    # Allowed status changes; closed tickets can only be reopened
+    STATUS_TRANSITIONS = {
+        'open': ('in_progress', 'resolved', 'closed'),
+        'in_progress': ('open', 'resolved', 'closed'),
+        'resolved': ('open', 'in_progress', 'closed'),
+        'closed': ('open',),
+    }
+    
     @staticmethod
-    def create_ticket(validated_data, user):
+    def log_activity(ticket, user, action, description, old_value=None, new_value=None, **ticket_updates):
         """
-        Create a new ticket with notifications
+        Record a ticket activity and bump the ticket's last_activity_at.
+        Extra keyword arguments are applied to the ticket row in the same UPDATE.
         """
-        from .models import Ticket, TicketActivity
+        activities = TicketService.record_activities(
+            ticket, user, [(action, description, old_value, new_value)], **ticket_updates
+        )
+        return activities[0] if activities else None
+    
+    @staticmethod
+    def record_activities(ticket, user, activities, expected_status=None, staff_only=False, **ticket_updates):
+        """
+        Write ``activities``, ``(action, description, old_value, new_value)`` tuples,
+        with one UPDATE of the ticket row that bumps last_activity_at and applies
+        ``ticket_updates``, then one INSERT each for the activities and the change log.
+        With ``staff_only`` their push events aren't sent to customers.
         
-        ticket = Ticket.objects.create(**validated_data, created_by=user)
+        With ``expected_status`` the UPDATE only matches while the row still has that
+        status; nothing is written and an empty list is returned when it doesn't.
+        Plain values in ``ticket_updates`` are copied onto the instance, expressions
+        are left to the caller.
+        """
+        from .models import Ticket, TicketActivity
         
-        # Create activity record
-        TicketActivity.objects.create(
-            ticket=ticket,
-            user=user,
-            action='created',
-            description=f"Ticket created by {user.username}"
-        )
+        now = timezone.now()
+        rows = Ticket.objects.filter(pk=ticket.pk)
+        if expected_status is not None:
+            rows = rows.filter(status=expected_status)
+        if not rows.update(last_activity_at=now, **ticket_updates):
+            return []
         
-        # Send email notifications
-        EmailService.send_ticket_created_email(ticket)
+        ticket.last_activity_at = now
+        for field, value in ticket_updates.items():
+            if not hasattr(value, 'resolve_expression'):
+                setattr(ticket, field, value)
         
-        # Create in-app notifications for agents
-        if user.role == 'customer':
-            agents = User.objects.filter(role='agent', is_active=True)
-            for agent in agents:
-                NotificationService.create_ticket_notification(
-                    ticket, 'ticket_created', agent
-                )
+        created = TicketActivity.objects.bulk_create([
+            TicketActivity(
+                ticket=ticket,
+                user=user,
+                action=action,
+                description=description,
+                old_value=old_value,
+                new_value=new_value
+            )
+            for action, description, old_value, new_value in activities
+        ])
+        TicketChangeService.record_many(ticket, [activity.action for activity in created])
+        for activity in created:
+            events.publish_ticket_changed(ticket, activity.action, staff_only)
+        return created
+    
+    @staticmethod
+    def check_transition(ticket, new_status):
+        """
+        Raise TransitionError unless ``ticket`` may move to ``new_status``
+        """
+        if new_status not in TicketService.STATUS_TRANSITIONS.get(ticket.status, ()):
+            raise TransitionError(f"Cannot change status from {ticket.status} to {new_status}")
+    
+    @staticmethod
+    def status_updates(new_status, now):
+        """
+        Ticket row updates for a move to ``new_status``, matching what Ticket.save() sets
+        """
+        from django.db.models import Value
+        from django.db.models.functions import Coalesce
         
-        return ticket
+        updates = {'status': new_status, 'updated_at': now}
+        if new_status == 'resolved':
+            updates['resolved_at'] = Coalesce(F('resolved_at'), Value(now))
+        elif new_status == 'closed':
+            updates['closed_at'] = Coalesce(F('closed_at'), Value(now))
+        return updates
     
     @staticmethod
-    def update_ticket(ticket, validated_data, user):
+    def status_activity(old_status, new_status):
+        return ('status_changed', 'Status changed', old_status, new_status)
+    
+    @staticmethod
+    def status_applied(ticket, new_status, now):
         """
-        Update a ticket with change tracking and notifications
+        Bookkeeping after a status UPDATE matched: mirror it on the instance and
+        move the ticket between rollup keys
         """
-        from .models import TicketActivity
+        if new_status == 'resolved' and not ticket.resolved_at:
+            ticket.resolved_at = now
+        elif new_status == 'closed' and not ticket.closed_at:
+            ticket.closed_at = now
         
-        # Track changes
-        changes = []
-        for field, new_value in validated_data.items():
-            old_value = getattr(ticket, field)
-            if old_value != new_value:
-                changes.append({
-                    'field': field,
-                    'old_value': str(old_value) if old_value else None,
-                    'new_value': str(new_value) if new_value else None
-                })
+        before = getattr(ticket, '_rollup_key', None)
+        if before is not None:
+            after = {**before, 'status': new_status}
+            TicketRollupService.record_change(before, after, when=now)
+            ticket._rollup_key = after
+    
+    @staticmethod
+    def transition(ticket, new_status, user):
+        """
+        Move ``ticket`` to ``new_status`` with a single UPDATE that only matches while
+        the row still has the status the instance was loaded with, so concurrent
+        changes can't be overwritten. Emails and notifications follow after commit.
         
-        # Update the ticket
-        for field, value in validated_data.items():
-            setattr(ticket, field, value)
-        ticket.save()
+        Returns False if the ticket already has ``new_status``. Raises TransitionError
+        for moves not in STATUS_TRANSITIONS and TransitionConflict when the status
+        changed since the ticket was loaded.
+        """
+        old_status = ticket.status
+        if new_status == old_status:
+            return False
+        TicketService.check_transition(ticket, new_status)
         
-        # Create activity records for changes
-        for change in changes:
-            TicketActivity.objects.create(
-                ticket=ticket,
-                user=user,
-                action=f"{change['field']}_changed",
-                description=f"{change['field'].replace('_', ' ').title()} changed",
-                old_value=change['old_value'],
-                new_value=change['new_value']
+        now = timezone.now()
+        with transaction.atomic():
+            applied = TicketService.record_activities(
+                ticket, user, [TicketService.status_activity(old_status, new_status)],
+                expected_status=old_status, **TicketService.status_updates(new_status, now)
             )
-        
-        # Send notifications if there were changes
-        if changes:
-            # Send email notifications
+            if not applied:
+                raise TransitionConflict(f"Ticket {ticket.ticket_number} was changed by someone else")
+            TicketService.status_applied(ticket, new_status, now)
+            changes = [{'field': 'status', 'old_value': old_status, 'new_value': new_status}]
+            transaction.on_commit(lambda: TicketService.notify_ticket_updated(ticket, user, changes))
+        return True
+    
+    @staticmethod
+    def notify_ticket_updated(ticket, user, changes):
+        """
+        Email and notify the requester and assignee about changes made by ``user``.
+        Runs after the change commits, so the ticket row is no longer locked.
+        """
+        with transaction.atomic():
             EmailService.send_ticket_updated_email(ticket, user, changes)
+            recipients = [
+                recipient_id for recipient_id in (ticket.created_by_id, ticket.assigned_to_id)
+                if recipient_id and recipient_id != user.pk
+            ]
+            if any(change['field'] == 'status' for change in changes):
+                NotificationService.notify_ticket_event(ticket, 'status_changed', recipients)
+            else:
+                NotificationService.notify_ticket_event(ticket, 'ticket_updated', recipients)
+    
+    @staticmethod
+    def create_ticket(validated_data, user):
+        """
+        Create a new ticket with notifications
+        """
+        from .models import Ticket
+        
+        # Emails are queued in the outbox, so they commit or roll back with the ticket
+        with transaction.atomic():
+            ticket = Ticket.objects.create(**validated_data, created_by=user)
             
-            # Create in-app notifications
-            recipients = []
+            # Create activity record
+            TicketService.log_activity(
+                ticket, user, 'created', f"Ticket created by {user.username}"
+            )
             
-            # Notify ticket creator (if not the updater)
-            if ticket.created_by != user:
-                recipients.append(ticket.created_by)
+            # Send email notifications
+            EmailService.send_ticket_created_email(ticket)
+            
+            # Create in-app notifications for agents
+            if user.role == 'customer':
+                NotificationService.broadcast_ticket_event(ticket, 'ticket_created', 'agents')
+        
+        return ticket
+    
+    @staticmethod
+    def update_ticket(ticket, validated_data, user):
+        """
+        Update a ticket with change tracking and notifications. Status changes follow
+        STATUS_TRANSITIONS and go through the same path as transition().
+        """
+        new_status = validated_data.get('status', ticket.status)
+        if new_status != ticket.status:
+            TicketService.check_transition(ticket, new_status)
+        
+        with transaction.atomic():
+            # Track changes
+            changes = []
+            for field, new_value in validated_data.items():
+                old_value = getattr(ticket, field)
+                if old_value != new_value:
+                    changes.append({
+                        'field': field,
+                        'old_value': str(old_value) if old_value else None,
+                        'new_value': str(new_value) if new_value else None
+                    })
             
-            # Notify assigned agent (if not the updater)
-            if ticket.assigned_to and ticket.assigned_to != user:
-                recipients.append(ticket.assigned_to)
+            old_status = ticket.status
+            other_fields = {field: value for field, value in validated_data.items() if field != 'status'}
+            if any(change['field'] != 'status' for change in changes):
+                for field, value in other_fields.items():
+                    setattr(ticket, field, value)
+                # The status is written below, only if it is still the one we loaded
+                ticket.save(update_fields=[*other_fields, 'updated_at'])
             
-            for recipient in recipients:
-                if any(change['field'] == 'status' for change in changes):
-                    NotificationService.create_ticket_notification(
-                        ticket, 'status_changed', recipient
-                    )
-                else:
-                    NotificationService.create_ticket_notification(
-                        ticket, 'ticket_updated', recipient
-                    )
+            if changes:
+                # One activity per change, written together with the status
+                now = timezone.now()
+                status_changed = new_status != old_status
+                applied = TicketService.record_activities(
+                    ticket, user,
+                    [
+                        (
+                            f"{change['field']}_changed",
+                            f"{change['field'].replace('_', ' ').title()} changed",
+                            change['old_value'],
+                            change['new_value']
+                        )
+                        for change in changes
+                    ],
+                    expected_status=old_status if status_changed else None,
+                    **(TicketService.status_updates(new_status, now) if status_changed else {})
+                )
+                if not applied:
+                    raise TransitionConflict(f"Ticket {ticket.ticket_number} was changed by someone else")
+                if status_changed:
+                    TicketService.status_applied(ticket, new_status, now)
+                transaction.on_commit(lambda: TicketService.notify_ticket_updated(ticket, user, changes))
         
         return ticket
     
@@ -329,16 +940,13 @@ class TicketService:
         """
         Assign a ticket to an agent with notifications
         """
-        from .models import TicketActivity
-        
         old_assignee = ticket.assigned_to
         ticket.assigned_to = agent
         ticket.save()
         
         # Create activity record
-        TicketActivity.objects.create(
-            ticket=ticket,
-            user=assigned_by,
+        TicketService.log_activity(
+            ticket, assigned_by,
             action='assigned',
             description=f"Ticket assigned to {agent.username}",
             old_value=old_assignee.username if old_assignee else None,
@@ -359,50 +967,1006 @@ class TicketService:
         return ticket
     
     @staticmethod
-    def add_comment(ticket, content, comment_type, user, is_internal=False):
+    def add_comment(ticket, content, comment_type, user, is_internal=False, new_status=None):
         """
-        Add a comment to a ticket with notifications
+        Add a comment to a ticket with notifications. With ``new_status`` the ticket
+        also moves to that status in the same UPDATE, unless its status changed
+        concurrently or the move isn't allowed.
         """
-        from .models import TicketComment, TicketActivity
+        from django.db.models import Value
+        from django.db.models.functions import Coalesce
+        from .models import TicketComment
         
-        comment = TicketComment.objects.create(
-            ticket=ticket,
-            created_by=user,
-            content=content,
-            comment_type=comment_type,
-            is_internal=is_internal
-        )
-        
-        # Create activity record
-        TicketActivity.objects.create(
-            ticket=ticket,
-            user=user,
-            action='comment_added',
-            description=f"Comment added by {user.username}"
+        with transaction.atomic():
+            comment = TicketComment.objects.create(
+                ticket=ticket,
+                created_by=user,
+                content=content,
+                comment_type=comment_type,
+                is_internal=is_internal
+            )
+            
+            ticket_updates = {
+                'comment_count': F('comment_count') + 1,
+                'last_commenter_role': user.role,
+            }
+            if user.role == 'agent' and not is_internal:
+                # Only the first public agent reply sets the first response
+                ticket_updates['first_response_at'] = Coalesce(F('first_response_at'), Value(comment.created_at))
+            
+            # Create activity records and update the ticket's counters
+            activities = [('comment_added', f"Comment added by {user.username}", None, None)]
+            old_status = ticket.status
+            moved = False
+            if new_status in TicketService.STATUS_TRANSITIONS.get(old_status, ()):
+                now = timezone.now()
+                moved = bool(TicketService.record_activities(
+                    ticket, user, [TicketService.status_activity(old_status, new_status), *activities],
+                    expected_status=old_status, staff_only=is_internal,
+                    **TicketService.status_updates(new_status, now), **ticket_updates
+                ))
+            if moved:
+                TicketService.status_applied(ticket, new_status, now)
+                changes = [{'field': 'status', 'old_value': old_status, 'new_value': new_status}]
+                transaction.on_commit(lambda: TicketService.notify_ticket_updated(ticket, user, changes))
+            else:
+                # Customers aren't told about internal notes on their tickets
+                TicketService.record_activities(ticket, user, activities, staff_only=is_internal, **ticket_updates)
+            ticket.comment_count += 1
+            ticket.last_commenter_role = user.role
+            if 'first_response_at' in ticket_updates and ticket.first_response_at is None:
+                ticket.first_response_at = comment.created_at
+            
+            # Send notifications
+            EmailService.send_comment_added_email(comment)
+            
+            # Create in-app notifications
+            if is_internal:
+                # For internal comments, notify agents/admins only
+                NotificationService.broadcast_comment(comment, 'staff')
+            else:
+                # For public comments, notify all stakeholders
+                recipients = []
+                if ticket.created_by_id != user.id:
+                    recipients.append(ticket.created_by_id)
+                
+                if ticket.assigned_to_id and ticket.assigned_to_id != user.id:
+                    recipients.append(ticket.assigned_to_id)
+                
+                NotificationService.notify_comment(comment, recipients)
+        
+        return comment
+    
+    @staticmethod
+    def attachment_added(ticket_id):
+        """
+        Update the ticket's counters after an attachment is uploaded
+        """
+        from .models import Ticket
+        
+        Ticket.objects.filter(pk=ticket_id).update(
+            attachment_count=F('attachment_count') + 1,
+            last_activity_at=timezone.now()
         )
+        TicketChangeService.record_for_id(ticket_id, 'attachment_added')
+    
+    @staticmethod
+    def attachment_removed(ticket_id):
+        """
+        Update the ticket's counters after an attachment is deleted
+        """
+        from .models import Ticket
         
-        # Send notifications
-        EmailService.send_comment_added_email(comment)
+        Ticket.objects.filter(pk=ticket_id, attachment_count__gt=0).update(
+            attachment_count=F('attachment_count') - 1,
+            updated_at=timezone.now()
+        )
+        TicketChangeService.record_for_id(ticket_id, 'attachment_removed')
+    
+    @staticmethod
+    def comment_removed(ticket_id, comment_id=None):
+        """
+        Update the ticket's counters after a comment is deleted
+        """
+        from .models import Ticket
         
-        # Create in-app notifications
-        recipients = []
+        Ticket.objects.filter(pk=ticket_id, comment_count__gt=0).update(
+            comment_count=F('comment_count') - 1,
+            updated_at=timezone.now()
+        )
+        TicketChangeService.record_for_id(ticket_id, 'comment_deleted', comment_id)
+    
+    @staticmethod
+    def comment_updated(comment):
+        """
+        Log an edit of a comment for the changes feed
+        """
+        TicketChangeService.record_for_id(comment.ticket_id, 'comment_updated', comment.pk)
+
+
+class TicketBulkService:
+    """
+    Service applying the same changes to many tickets with set-based writes
+    """
+    
+    FIELDS = (
+        'id', 'ticket_number', 'subject', 'status', 'created_by_id', 'assigned_to_id',
+        'priority_id', 'category_id', 'is_internal', 'tags',
+    )
+    
+    @staticmethod
+    def update(queryset, changes, user, chunk_size=None):
+        """
+        Apply ``changes`` (status, assigned_to, priority, category and/or add_tags)
+        to every ticket in ``queryset``.
         
-        if is_internal:
-            # For internal comments, notify agents/admins only
-            agents_admins = User.objects.filter(
-                role__in=['agent', 'admin'],
-                is_active=True
-            ).exclude(id=user.id)
-            recipients.extend(agents_admins)
-        else:
-            # For public comments, notify all stakeholders
-            if ticket.created_by != user:
-                recipients.append(ticket.created_by)
+        Each change is one UPDATE per chunk of tickets it actually changes, and the
+        activity rows, change log and rollup are written in bulk. Status changes
+        follow TicketService.STATUS_TRANSITIONS; tickets that can't make the move
+        still get the other changes. Each recipient gets one notification and one
+        email for all their tickets after commit.
+        Returns ``{'updated': [ids], 'unchanged': [ids], 'skipped': [{'id', 'error'}]}``.
+        """
+        from .models import Ticket, TicketActivity
+        
+        chunk_size = chunk_size or settings.QUICKDESK_SETTINGS.get('TICKET_BULK_CHUNK_SIZE', 1000)
+        now = timezone.now()
+        
+        with transaction.atomic():
+            # Lock in primary key order so overlapping bulk requests can't deadlock
+            rows = list(queryset.select_for_update().order_by('pk').values(*TicketBulkService.FIELDS))
+            before = {row['id']: {field: row[field] for field in Ticket.ROLLUP_FIELDS} for row in rows}
+            
+            activities = []
+            skipped = []
+            deadline_ids = set()
+            
+            def write(changed_rows, action, describe, **updates):
+                ids = [row['id'] for row in changed_rows]
+                for start in range(0, len(ids), chunk_size):
+                    Ticket.objects.filter(pk__in=ids[start:start + chunk_size]).update(
+                        **{'updated_at': now, 'last_activity_at': now, **updates}
+                    )
+                for row in changed_rows:
+                    description, old_value, new_value = describe(row)
+                    activities.append((row, action, description, old_value, new_value))
+            
+            new_status = changes.get('status')
+            if new_status:
+                moving = []
+                for row in rows:
+                    if row['status'] == new_status:
+                        continue
+                    if new_status in TicketService.STATUS_TRANSITIONS.get(row['status'], ()):
+                        moving.append(row)
+                    else:
+                        skipped.append({
+                            'id': row['id'],
+                            'error': f"Cannot change status from {row['status']} to {new_status}",
+                        })
+                write(
+                    moving, 'status_changed', lambda row: ('Status changed', row['status'], new_status),
+                    **TicketService.status_updates(new_status, now)
+                )
+                for row in moving:
+                    row['status'] = new_status
+            
+            if 'assigned_to' in changes:
+                agent = changes['assigned_to']
+                agent_id = agent.pk if agent else None
+                moving = [row for row in rows if row['assigned_to_id'] != agent_id]
+                previous = dict(User.objects.filter(
+                    pk__in={row['assigned_to_id'] for row in moving if row['assigned_to_id']}
+                ).values_list('pk', 'username'))
+                if agent:
+                    write(moving, 'assigned', lambda row: (
+                        f"Ticket assigned to {agent.username}", previous.get(row['assigned_to_id']), agent.username
+                    ), assigned_to=agent)
+                else:
+                    write(moving, 'unassigned', lambda row: (
+                        'Ticket unassigned', previous.get(row['assigned_to_id']), None
+                    ), assigned_to=None)
+                for row in moving:
+                    row['assigned_to_id'] = agent_id
+            
+            for field, action, label in (
+                ('priority', 'priority_changed', 'Priority changed'),
+                ('category', 'category_changed', 'Category changed'),
+            ):
+                if field not in changes:
+                    continue
+                target = changes[field]
+                moving = [row for row in rows if row[f'{field}_id'] != target.pk]
+                previous = {
+                    pk: str(instance) for pk, instance in
+                    type(target).objects.in_bulk({row[f'{field}_id'] for row in moving}).items()
+                }
+                write(moving, action, lambda row: (
+                    label, previous.get(row[f'{field}_id']), str(target)
+                ), **{field: target})
+                for row in moving:
+                    row[f'{field}_id'] = target.pk
+                    deadline_ids.add(row['id'])
             
-            if ticket.assigned_to and ticket.assigned_to != user:
-                recipients.append(ticket.assigned_to)
+            if changes.get('add_tags'):
+                tagged = []
+                for row in rows:
+                    tags = list(row['tags'] or [])
+                    missing = [tag for tag in changes['add_tags'] if tag not in tags]
+                    if missing:
+                        tagged.append(Ticket(pk=row['id'], tags=tags + missing, updated_at=now, last_activity_at=now))
+                        activities.append((row, 'tags_changed', 'Tags changed', str(tags), str(tags + missing)))
+                        row['tags'] = tags + missing
+                Ticket.objects.bulk_update(tagged, ['tags', 'updated_at', 'last_activity_at'], batch_size=chunk_size)
+            
+            if deadline_ids:
+                TicketBulkService.recompute_deadlines(deadline_ids, chunk_size)
+            
+            TicketActivity.objects.bulk_create([
+                TicketActivity(
+                    ticket_id=row['id'],
+                    user=user,
+                    action=action,
+                    description=description,
+                    old_value=old_value,
+                    new_value=new_value
+                )
+                for row, action, description, old_value, new_value in activities
+            ], batch_size=chunk_size)
+            TicketChangeService.record_bulk([(row, action) for row, action, *_ in activities], chunk_size)
+            
+            updated = {row['id']: row for row, *_ in activities}
+            TicketRollupService.record_changes(
+                [(before[pk], {field: row[field] for field in Ticket.ROLLUP_FIELDS}) for pk, row in updated.items()],
+                when=now
+            )
+            for row in updated.values():
+                events.publish_ticket_values(row, 'bulk_updated')
+            
+            summary = TicketBulkService.describe(changes)
+            transaction.on_commit(
+                lambda: TicketBulkService.notify(list(updated.values()), summary, changes.get('assigned_to'), user)
+            )
         
-        for recipient in recipients:
-            NotificationService.create_comment_notification(comment, recipient)
+        skipped_ids = {skip['id'] for skip in skipped}
+        return {
+            'updated': list(updated),
+            'unchanged': [row['id'] for row in rows if row['id'] not in updated and row['id'] not in skipped_ids],
+            'skipped': skipped,
+        }
+    
+    @staticmethod
+    def describe(changes):
+        """
+        ``{'field', 'new_value'}`` entries summarizing the requested changes for messages
+        """
+        summary = []
+        for field, value in changes.items():
+            if field == 'assigned_to':
+                value = value.username if value else 'Unassigned'
+            elif field == 'add_tags':
+                field, value = 'tags', ', '.join(value)
+            summary.append({'field': field, 'new_value': str(value)})
+        return summary
+    
+    @staticmethod
+    def recompute_deadlines(ticket_ids, chunk_size):
+        """
+        Refresh SLA deadlines after a bulk priority or category change
+        """
+        from .models import SLAPolicy, Ticket
         
-        return comment
+        policies = list(SLAPolicy.objects.filter(is_active=True))
+        ticket_ids = list(ticket_ids)
+        for start in range(0, len(ticket_ids), chunk_size):
+            tickets = list(
+                Ticket.objects.filter(pk__in=ticket_ids[start:start + chunk_size])
+                .only('id', 'created_at', 'priority', 'category')
+            )
+            for ticket in tickets:
+                SLAService.apply_deadlines(ticket, policies)
+            Ticket.objects.bulk_update(tickets, ['first_response_due_at', 'resolution_due_at'])
+    
+    @staticmethod
+    def notify(rows, summary, agent, user):
+        """
+        One notification and one email per recipient covering all their tickets:
+        requesters hear about their tickets, assignees about the tickets they now hold
+        """
+        from .models import Ticket
+        
+        if not rows:
+            return
+        tickets_for = defaultdict(list)
+        for row in rows:
+            for recipient_id in {row['created_by_id'], row['assigned_to_id']}:
+                if recipient_id and recipient_id != user.pk:
+                    tickets_for[recipient_id].append(row)
+        
+        shown = 10
+        notifications = []
+        emails = []
+        for recipient_id, tickets in tickets_for.items():
+            assigned = bool(agent) and recipient_id == agent.pk
+            count = len(tickets)
+            plural = 's' if count != 1 else ''
+            title = (
+                f"{count} ticket{plural} assigned to you" if assigned
+                else f"{count} ticket{plural} updated by {user.username}"
+            )
+            numbers = ', '.join(row['ticket_number'] for row in tickets[:shown])
+            if count > shown:
+                numbers += f" and {count - shown} more"
+            changed = '; '.join(f"{change['field'].replace('_', ' ')}: {change['new_value']}" for change in summary)
+            notifications.append((recipient_id, tickets[0], assigned, title, f"{numbers} ({changed})"))
+            emails.append((recipient_id, tickets, title))
+        
+        with transaction.atomic():
+            batch_size = settings.QUICKDESK_SETTINGS.get('NOTIFICATION_BATCH_SIZE', 500)
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=recipient_id,
+                    ticket_id=ticket['id'],
+                    notification_type='ticket_assigned' if assigned else 'ticket_updated',
+                    title=title,
+                    message=message
+                )
+                for recipient_id, ticket, assigned, title, message in notifications
+            ], batch_size=batch_size)
+            NotificationService.adjust_unread(list(tickets_for), 1)
+            for recipient_id, ticket, assigned, title, message in notifications:
+                events.publish_notification(
+                    Ticket(pk=ticket['id'], ticket_number=ticket['ticket_number']),
+                    'ticket_assigned' if assigned else 'ticket_updated', title, user_ids=[recipient_id]
+                )
+            
+            if not settings.QUICKDESK_SETTINGS.get('ENABLE_EMAIL_NOTIFICATIONS', True):
+                return
+            addresses = dict(
+                User.objects.filter(pk__in=list(tickets_for), email_notifications=True, is_active=True)
+                .exclude(email='').values_list('pk', 'email')
+            )
+            for recipient_id, tickets, title in emails:
+                if recipient_id in addresses:
+                    EmailService.queue_email('tickets_bulk_updated', title, {
+                        'updated_by': user,
+                        'tickets': tickets,
+                        'changes': summary,
+                    }, [addresses[recipient_id]])
+
+
+class TicketVoteService:
+    """
+    Service for ticket votes and the vote counts kept on tickets
+    """
+    
+    FIELDS = {'up': 'upvotes', 'down': 'downvotes'}
+    
+    @staticmethod
+    def decay_factor(since, now):
+        """
+        Share of a hot score computed at ``since`` that is left at ``now``
+        """
+        if since is None:
+            return 1.0
+        half_life = settings.QUICKDESK_SETTINGS.get('TRENDING_HALF_LIFE_HOURS', 24) * 3600
+        return 0.5 ** (max(0.0, (now - since).total_seconds()) / half_life)
+    
+    @staticmethod
+    def cast_vote(ticket, user, vote_type):
+        """
+        Apply a user's vote: the same type again removes it, the other type switches it.
+        
+        Each step is one conditional statement on the (ticket, user) row and its row
+        count gives the exact change, so the counts are adjusted with F() deltas
+        instead of recounting. Returns 'added', 'changed' or 'removed'.
+        """
+        from django.db import IntegrityError
+        from .models import TicketVote
+        
+        opposite = 'down' if vote_type == 'up' else 'up'
+        votes = TicketVote.objects.filter(ticket=ticket, user=user)
+        
+        with transaction.atomic():
+            for attempt in range(3):
+                if votes.filter(vote_type=vote_type).delete()[0]:
+                    result, deltas = 'removed', {vote_type: -1}
+                elif votes.filter(vote_type=opposite).update(vote_type=vote_type):
+                    result, deltas = 'changed', {vote_type: 1, opposite: -1}
+                else:
+                    try:
+                        with transaction.atomic():
+                            TicketVote.objects.create(ticket=ticket, user=user, vote_type=vote_type)
+                    except IntegrityError:
+                        # A concurrent request of the same user voted first; apply ours on top
+                        if attempt == 2:
+                            raise
+                        continue
+                    result, deltas = 'added', {vote_type: 1}
+                break
+            
+            TicketVoteService.add_to_counts(
+                ticket, **{TicketVoteService.FIELDS[kind]: delta for kind, delta in deltas.items()}
+            )
+            TicketChangeService.record(ticket, 'voted')
+        return result
+    
+    @staticmethod
+    def add_to_counts(ticket, upvotes=0, downvotes=0):
+        """
+        Add deltas to the ticket's counts, through a random shard for hot tickets
+        when VOTE_COUNTER_SHARDS is enabled
+        """
+        import random
+        from django.db.models.functions import Greatest
+        from .models import Ticket, TicketVoteShard
+        
+        options = settings.QUICKDESK_SETTINGS
+        shards = options.get('VOTE_COUNTER_SHARDS', 0)
+        if shards > 1 and ticket.upvotes + ticket.downvotes >= options.get('VOTE_SHARDING_THRESHOLD', 1000):
+            number = random.randrange(shards)
+            shard = TicketVoteShard.objects.filter(ticket=ticket, shard=number)
+            deltas = {'upvotes': F('upvotes') + upvotes, 'downvotes': F('downvotes') + downvotes}
+            if not shard.update(**deltas):
+                TicketVoteShard.objects.bulk_create(
+                    [TicketVoteShard(ticket=ticket, shard=number)], ignore_conflicts=True
+                )
+                shard.update(**deltas)
+            return
+        
+        now = timezone.now()
+        Ticket.objects.filter(pk=ticket.pk).update(
+            upvotes=Greatest(F('upvotes') + upvotes, 0),
+            downvotes=Greatest(F('downvotes') + downvotes, 0),
+            # Decayed from the instance's hot_score_at; a concurrent vote moved it by milliseconds at most
+            hot_score=F('hot_score') * TicketVoteService.decay_factor(ticket.hot_score_at, now) + (upvotes - downvotes),
+            hot_score_at=now,
+            updated_at=now
+        )
+    
+    @staticmethod
+    def flush_shards(ticket_ids=None):
+        """
+        Fold pending shard deltas into the ticket counts. Returns the number of tickets updated.
+        """
+        from collections import defaultdict
+        from django.db.models.functions import Greatest
+        from .models import Ticket, TicketVoteShard
+        
+        with transaction.atomic():
+            shards = TicketVoteShard.objects.exclude(upvotes=0, downvotes=0)
+            if ticket_ids is not None:
+                shards = shards.filter(ticket_id__in=ticket_ids)
+            rows = list(shards.select_for_update().values('pk', 'ticket_id', 'upvotes', 'downvotes'))
+            if not rows:
+                return 0
+            
+            totals = defaultdict(lambda: [0, 0])
+            for row in rows:
+                totals[row['ticket_id']][0] += row['upvotes']
+                totals[row['ticket_id']][1] += row['downvotes']
+            now = timezone.now()
+            scored_at = dict(Ticket.objects.filter(pk__in=totals).values_list('pk', 'hot_score_at'))
+            for ticket_id, (upvotes, downvotes) in totals.items():
+                factor = TicketVoteService.decay_factor(scored_at.get(ticket_id), now)
+                Ticket.objects.filter(pk=ticket_id).update(
+                    upvotes=Greatest(F('upvotes') + upvotes, 0),
+                    downvotes=Greatest(F('downvotes') + downvotes, 0),
+                    hot_score=F('hot_score') * factor + (upvotes - downvotes),
+                    hot_score_at=now,
+                    updated_at=now
+                )
+            # The rows are locked, so nothing was added since they were read
+            TicketVoteShard.objects.filter(pk__in=[row['pk'] for row in rows]).update(upvotes=0, downvotes=0)
+        return len(totals)
+    
+    @staticmethod
+    def decay_hot_scores(chunk_size=1000):
+        """
+        Bring every non-zero hot score forward to now, one UPDATE per chunk of
+        tickets. Scores that decayed below TRENDING_MIN_SCORE are reset to 0 and
+        leave the trending index. Returns the number of tickets decayed.
+        """
+        from django.db.models import Case, FloatField, When
+        from .models import Ticket
+        
+        now = timezone.now()
+        scored = Ticket.objects.filter(hot_score_at__isnull=False)
+        last_pk = None
+        decayed = 0
+        while True:
+            chunk = scored.order_by('pk')
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            rows = list(chunk.values_list('pk', 'hot_score_at')[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            # Tickets voted on after ``now`` already carry a newer score
+            Ticket.objects.filter(pk__in=[pk for pk, _ in rows], hot_score_at__lte=now).update(
+                hot_score=Case(
+                    *[
+                        When(pk=pk, then=F('hot_score') * TicketVoteService.decay_factor(scored_at, now))
+                        for pk, scored_at in rows
+                    ],
+                    output_field=FloatField()
+                ),
+                hot_score_at=now
+            )
+            decayed += len(rows)
+        
+        floor = settings.QUICKDESK_SETTINGS.get('TRENDING_MIN_SCORE', 0.05)
+        scored.filter(hot_score__gt=-floor, hot_score__lt=floor, hot_score_at__lte=now).update(
+            hot_score=0, hot_score_at=None
+        )
+        return decayed
+
+
+class TicketChangeService:
+    """
+    Service for the append-only ticket change log behind the changes feed
+    """
+    
+    @staticmethod
+    def record(ticket, action, comment_id=None):
+        """
+        Log a change of a ticket instance
+        """
+        from .models import TicketChange
+        
+        return TicketChange.objects.create(
+            ticket_id=ticket.pk,
+            owner_id=ticket.created_by_id,
+            is_internal=ticket.is_internal,
+            action=action,
+            comment_id=comment_id
+        )
+    
+    @staticmethod
+    def record_many(ticket, actions):
+        """
+        Log several changes of a ticket instance with one INSERT
+        """
+        from .models import TicketChange
+        
+        return TicketChange.objects.bulk_create([
+            TicketChange(
+                ticket_id=ticket.pk,
+                owner_id=ticket.created_by_id,
+                is_internal=ticket.is_internal,
+                action=action
+            )
+            for action in actions
+        ])
+    
+    @staticmethod
+    def record_bulk(changes, batch_size=1000):
+        """
+        Log ``(ticket, action)`` pairs, where ``ticket`` is a ``.values()`` row with
+        id, created_by_id and is_internal
+        """
+        from .models import TicketChange
+        
+        return TicketChange.objects.bulk_create([
+            TicketChange(
+                ticket_id=ticket['id'],
+                owner_id=ticket['created_by_id'],
+                is_internal=ticket['is_internal'],
+                action=action
+            )
+            for ticket, action in changes
+        ], batch_size=batch_size)
+    
+    @staticmethod
+    def record_for_id(ticket_id, action, comment_id=None):
+        """
+        Log a change of a ticket known only by id
+        """
+        from .models import Ticket, TicketChange
+        
+        ticket = Ticket.objects.filter(pk=ticket_id).values('created_by_id', 'is_internal').first()
+        if ticket is None:
+            return None
+        return TicketChange.objects.create(
+            ticket_id=ticket_id,
+            owner_id=ticket['created_by_id'],
+            is_internal=ticket['is_internal'],
+            action=action,
+            comment_id=comment_id
+        )
+    
+    @staticmethod
+    def ticket_deleted(sender, instance, **kwargs):
+        """
+        Leave a tombstone so synced clients drop the ticket
+        """
+        TicketChangeService.record(instance, 'deleted')
+    
+    @staticmethod
+    def visible_changes(user):
+        """
+        Changes the user may see, with the same role rules as the ticket endpoints
+        """
+        from .models import TicketChange
+        
+        queryset = TicketChange.objects.all()
+        if user.role == 'customer':
+            queryset = queryset.filter(owner_id=user.pk, is_internal=False)
+        elif user.role == 'agent':
+            queryset = queryset.filter(is_internal=False)
+        return queryset
+    
+    @staticmethod
+    def encode_cursor(sequence, created_at):
+        payload = json.dumps({'seq': sequence, 'at': created_at.isoformat()}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Return ``(sequence, created_at)``; raises ValueError for malformed cursors
+        """
+        from django.utils.dateparse import parse_datetime
+        
+        try:
+            payload = json.loads(base64.urlsafe_b64decode((cursor + '=' * (-len(cursor) % 4)).encode()).decode())
+            sequence = int(payload['seq'])
+            created_at = parse_datetime(payload['at'])
+        except (TypeError, KeyError, binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise ValueError('Invalid cursor') from exc
+        if created_at is None or sequence < 0:
+            raise ValueError('Invalid cursor')
+        return sequence, created_at
+    
+    @staticmethod
+    def head_cursor():
+        """
+        Cursor positioned after every change logged so far
+        """
+        from .models import TicketChange
+        
+        latest = TicketChange.objects.order_by('-id').values('id', 'created_at').first()
+        if latest is None:
+            return TicketChangeService.encode_cursor(0, timezone.now())
+        return TicketChangeService.encode_cursor(latest['id'], latest['created_at'])
+    
+    @staticmethod
+    def cursor_expired(sequence, created_at):
+        """
+        Whether changes after the cursor may have been pruned already
+        """
+        from datetime import timedelta
+        from .models import TicketChange
+        
+        retention = timedelta(days=settings.QUICKDESK_SETTINGS.get('TICKET_CHANGES_RETENTION_DAYS', 30))
+        if created_at >= timezone.now() - retention:
+            return False
+        oldest = TicketChange.objects.order_by('id').values_list('id', flat=True).first()
+        return oldest is not None and oldest > sequence + 1
+    
+    @staticmethod
+    def prune(before, chunk_size=5000):
+        """
+        Delete changes logged before ``before`` in chunks; returns the number deleted
+        """
+        from .models import TicketChange
+        
+        deleted = 0
+        while True:
+            ids = list(
+                TicketChange.objects.filter(created_at__lt=before).order_by('id')
+                .values_list('id', flat=True)[:chunk_size]
+            )
+            if not ids:
+                return deleted
+            deleted += TicketChange.objects.filter(id__in=ids).delete()[0]
+    
+    @staticmethod
+    def changes_since(user, sequence, created_at, limit=None):
+        """
+        Visible changes after ``sequence``, oldest first, plus the cursor to resume from.
+        
+        Ids are taken when a row is inserted but become visible when its transaction
+        commits, so a lower id can appear after a higher one. The cursor therefore
+        stops before the first change younger than the settle window; those changes
+        are returned now and again on the next call.
+        Returns ``(changes, next_cursor, has_more)``.
+        """
+        from datetime import timedelta
+        
+        options = settings.QUICKDESK_SETTINGS
+        limit = limit or options.get('TICKET_CHANGES_PAGE_SIZE', 500)
+        settled_before = timezone.now() - timedelta(seconds=options.get('TICKET_CHANGES_SETTLE_SECONDS', 5))
+        
+        rows = list(
+            TicketChangeService.visible_changes(user).filter(id__gt=sequence).order_by('id')
+            .values('id', 'ticket_id', 'action', 'comment_id', 'created_at')[:limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        position = (sequence, created_at)
+        for row in rows:
+            if row['created_at'] > settled_before:
+                break
+            position = (row['id'], row['created_at'])
+        return rows, TicketChangeService.encode_cursor(*position), has_more
+
+
+class TicketAnalyticsService:
+    """
+    Service for ticket performance metrics computed in the database
+    """
+    
+    PERCENTILES = (50, 90, 99)
+    
+    @staticmethod
+    def duration_percentiles(queryset, duration, group_by, percentiles=PERCENTILES):
+        """
+        Nearest-rank percentiles of a duration expression per value of each
+        field in ``group_by``, using window functions in a single query.
+        
+        Only the rows sitting at a percentile rank are fetched, so the result
+        size depends on the number of groups, not on the number of tickets.
+        Returns ``{field: {value: {'count': n, 'p50': timedelta, ...}}}``.
+        """
+        from django.db.models import Count, Q, Window
+        from django.db.models.functions import RowNumber
+        
+        queryset = queryset.annotate(duration=duration).filter(duration__isnull=False)
+        at_percentile = Q()
+        for field in group_by:
+            rank, total = f'{field}_rank', f'{field}_total'
+            queryset = queryset.annotate(**{
+                rank: Window(RowNumber(), partition_by=[F(field)], order_by=[F('duration').asc(), F('pk').asc()]),
+                total: Window(Count('pk'), partition_by=[F(field)]),
+            })
+            for p in percentiles:
+                # ceil(total * p / 100) in integer arithmetic
+                at_percentile |= Q(**{rank: (F(total) * p + 99) / 100})
+        
+        columns = ['duration']
+        for field in group_by:
+            columns += [field, f'{field}_rank', f'{field}_total']
+        
+        results = {field: {} for field in group_by}
+        for row in queryset.filter(at_percentile).values(*columns):
+            for field in group_by:
+                total = row[f'{field}_total']
+                group = results[field].setdefault(row[field], {'count': total})
+                for p in percentiles:
+                    if row[f'{field}_rank'] == (total * p + 99) // 100:
+                        group[f'p{p}'] = row['duration']
+        return results
+
+
+class TicketRollupService:
+    """
+    Service maintaining and reading the TicketDailyStat rollup
+    """
+    
+    BACKLOG_STATUSES = ('open', 'in_progress')
+    
+    @staticmethod
+    def record_change(before, after, when=None):
+        """
+        Move a ticket between rollup keys (see Ticket.get_rollup_key).
+        ``before`` is None for new tickets and ``after`` is None for deleted ones.
+        """
+        day = timezone.localdate(when or timezone.now())
+        if before is not None:
+            TicketRollupService.bump(day, before, left=1)
+        if after is not None:
+            increments = {'entered': 1}
+            if before is None:
+                increments['created'] = 1
+            if after['status'] == 'resolved' and (before is None or before['status'] != 'resolved'):
+                increments['resolved'] = 1
+            TicketRollupService.bump(day, after, **increments)
+    
+    @staticmethod
+    def record_changes(changes, when=None):
+        """
+        record_change for many tickets, with one bump per distinct rollup key.
+        ``changes`` are ``(before, after)`` pairs of existing tickets.
+        """
+        from collections import Counter
+        
+        day = timezone.localdate(when or timezone.now())
+        increments = defaultdict(Counter)
+        for before, after in changes:
+            if before == after:
+                continue
+            increments[tuple(sorted(before.items()))]['left'] += 1
+            entered = increments[tuple(sorted(after.items()))]
+            entered['entered'] += 1
+            if after['status'] == 'resolved' and before['status'] != 'resolved':
+                entered['resolved'] += 1
+        for key, amounts in increments.items():
+            TicketRollupService.bump(day, dict(key), **amounts)
+    
+    @staticmethod
+    def bump(day, key, **increments):
+        """
+        Add ``increments`` to one rollup row for the key, creating it if needed
+        """
+        from .models import TicketDailyStat
+        
+        # Update a single row so duplicates created by racing writers are never double counted
+        row_id = TicketDailyStat.objects.filter(day=day, **key).values_list('pk', flat=True).first()
+        if row_id is None:
+            TicketDailyStat.objects.create(day=day, **key, **increments)
+        else:
+            TicketDailyStat.objects.filter(pk=row_id).update(
+                **{field: F(field) + amount for field, amount in increments.items()}
+            )
+    
+    @staticmethod
+    def ticket_deleted(sender, instance, **kwargs):
+        """
+        post_delete receiver, also called for tickets removed by cascades
+        """
+        key = getattr(instance, '_rollup_key', None) or instance.get_rollup_key()
+        if key is not None:
+            TicketRollupService.record_change(key, None)
+    
+    @staticmethod
+    def status_counts(scope=None):
+        """
+        Live number of tickets per status, summed from the rollup
+        """
+        from django.db.models import Q, Sum
+        from .models import TicketDailyStat
+        
+        rows = TicketDailyStat.objects.filter(scope or Q()).values('status').annotate(
+            total=Sum(F('entered') - F('left'))
+        ).order_by()
+        return {row['status']: row['total'] for row in rows}
+    
+    @staticmethod
+    def flow_since(date_from, scope=None):
+        """
+        Tickets created and resolved from ``date_from`` up to today
+        """
+        from django.db.models import Q, Sum
+        from .models import TicketDailyStat
+        
+        totals = TicketDailyStat.objects.filter(scope or Q(), day__gte=date_from).aggregate(
+            created=Sum('created'), resolved=Sum('resolved')
+        )
+        return {key: value or 0 for key, value in totals.items()}
+    
+    @staticmethod
+    def timeseries(date_from, date_to, scope=None):
+        """
+        Created, resolved and end-of-day backlog per day between two dates (inclusive)
+        """
+        from datetime import timedelta
+        from django.db.models import Q, Sum
+        from .models import TicketDailyStat
+        
+        rows = TicketDailyStat.objects.filter(scope or Q())
+        in_backlog = Q(status__in=TicketRollupService.BACKLOG_STATUSES)
+        backlog = rows.filter(in_backlog, day__lt=date_from).aggregate(
+            total=Sum(F('entered') - F('left'))
+        )['total'] or 0
+        
+        days = {
+            row['day']: row for row in
+            rows.filter(day__gte=date_from, day__lte=date_to).values('day').annotate(
+                created_count=Sum('created'),
+                resolved_count=Sum('resolved'),
+                backlog_delta=Sum(F('entered') - F('left'), filter=in_backlog),
+            ).order_by()
+        }
+        
+        series = []
+        day = date_from
+        while day <= date_to:
+            row = days.get(day, {})
+            backlog += row.get('backlog_delta') or 0
+            series.append({
+                'date': day,
+                'created': row.get('created_count') or 0,
+                'resolved': row.get('resolved_count') or 0,
+                'backlog': backlog,
+            })
+            day += timedelta(days=1)
+        return series
+
+
+class SLAService:
+    """
+    Service for SLA deadlines and breach handling
+    """
+    
+    ACTIVE_STATUSES = ('open', 'in_progress')
+    
+    @staticmethod
+    def policy_for(priority_id, category_id, policies=None):
+        """
+        The most specific active SLAPolicy for a priority and category, or None.
+        ``policies`` can hold all active policies to avoid a query per ticket.
+        """
+        from django.db.models import Q
+        from .models import SLAPolicy
+        
+        if policies is None:
+            policies = SLAPolicy.objects.filter(is_active=True).filter(
+                Q(priority_id=priority_id, category_id=category_id) |
+                Q(priority_id=priority_id, category__isnull=True) |
+                Q(priority__isnull=True, category_id=category_id)
+            )
+        
+        def specificity(policy):
+            return (policy.category_id is not None and policy.priority_id is not None, policy.priority_id is not None)
+        
+        matching = [
+            policy for policy in policies
+            if policy.priority_id in (priority_id, None) and policy.category_id in (category_id, None)
+        ]
+        return max(matching, key=specificity, default=None)
+    
+    @staticmethod
+    def apply_deadlines(ticket, policies=None):
+        """
+        Set the ticket's due timestamps from its policy, counted from creation.
+        Called by Ticket.save, the caller writes the fields.
+        """
+        from datetime import timedelta
+        
+        policy = SLAService.policy_for(ticket.priority_id, ticket.category_id, policies)
+        start = ticket.created_at or timezone.now()
+        
+        def due(minutes):
+            return start + timedelta(minutes=minutes) if minutes else None
+        
+        ticket.first_response_due_at = due(policy and policy.first_response_minutes)
+        ticket.resolution_due_at = due(policy and policy.resolution_minutes)
+    
+    @staticmethod
+    def pending_deadlines(ticket):
+        """
+        ``(kind, due_at)`` pairs the ticket can still breach
+        """
+        if ticket.status not in SLAService.ACTIVE_STATUSES:
+            return []
+        deadlines = []
+        if ticket.first_response_due_at and not ticket.first_response_at and not ticket.first_response_breached_at:
+            deadlines.append(('first_response', ticket.first_response_due_at))
+        if ticket.resolution_due_at and not ticket.resolution_breached_at:
+            deadlines.append(('resolution', ticket.resolution_due_at))
+        return deadlines
+    
+    @staticmethod
+    def record_breach(ticket_id, kind, due_at, now=None):
+        """
+        Mark a deadline as breached and notify, if it still applies.
+        The conditional UPDATE makes concurrent workers notify only once.
+        Returns True when this call recorded the breach.
+        """
+        from django.db.models import Q
+        from .models import Ticket
+        
+        now = now or timezone.now()
+        still_pending = Q(
+            pk=ticket_id,
+            status__in=SLAService.ACTIVE_STATUSES,
+            **{f'{kind}_due_at': due_at, f'{kind}_due_at__lte': now, f'{kind}_breached_at__isnull': True}
+        )
+        if kind == 'first_response':
+            still_pending &= Q(first_response_at__isnull=True)
+        
+        with transaction.atomic():
+            if not Ticket.objects.filter(still_pending).update(**{f'{kind}_breached_at': now}):
+                return False
+            ticket = Ticket.objects.select_related('assigned_to', 'created_by').get(pk=ticket_id)
+            TicketChangeService.record(ticket, 'sla_breached')
+            
+            # The assignee owns the breach; unassigned tickets go to every admin
+            message = f"The {kind.replace('_', ' ')} target for '{ticket.subject}' was due at {due_at:%Y-%m-%d %H:%M %Z}"
+            if ticket.assigned_to:
+                NotificationService.notify_ticket_event(ticket, 'sla_breached', [ticket.assigned_to], message=message)
+            else:
+                NotificationService.broadcast_ticket_event(ticket, 'sla_breached', 'admins', message=message)
+        return True
@@ -1,3 +1,990 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection
+from django.db.models import Count, F, Q, Sum
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import events
+from .idempotency import claim, refresh
+from .pagination import KeysetPagination
+from .models import (
+    BroadcastNotification, Category, EmailOutbox, IdempotencyKey, Notification, Priority, SLAPolicy, Ticket, TicketActivity,
+    TicketChange, TicketComment, TicketDailyStat, TicketVote, TicketVoteShard, User
+)
+from .services import (
+    EmailOutboxService, NotificationService, TicketBulkService, TicketChangeService, TicketRollupService, TicketVoteService,
+    TicketService, TransitionConflict, TransitionError
+)
+
+
+def ticket_updates(queries):
+    return [query for query in queries if query['sql'].startswith('UPDATE "core_ticket" ')]
+
+
+class FailingEmailBackend(EmailBackend):
+    """
+    locmem backend that refuses messages to addresses starting with "bounce"
+    """
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(address.startswith('bounce') for address in message.to):
+                raise ConnectionError('Mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class QuickDeskTestCase(TestCase):
+    """
+    A customer, an agent, a category and a priority shared by the ticket tests
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user('customer', 'customer@example.com', 'pass', role='customer')
+        cls.agent = User.objects.create_user('agent', 'agent@example.com', 'pass', role='agent')
+        cls.category = Category.objects.create(name='General', created_by=cls.agent)
+        cls.priority = Priority.objects.create(name='medium', level=2)
+
+    def create_ticket(self, **fields):
+        fields = {
+            'subject': 'Printer on fire', 'description': 'It is on fire', 'category': self.category,
+            'priority': self.priority, 'created_by': self.customer, **fields
+        }
+        return Ticket.objects.create(**fields)
+
+
+class TicketSaveTests(QuickDeskTestCase):
+    """
+    Saving a loaded ticket writes its loaded fields and leaves maintained counters alone
+    """
+
+    def setUp(self):
+        self.ticket = self.create_ticket()
+
+    def test_save_keeps_concurrent_counter_updates(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(comment_count=3)
+        self.ticket.subject = 'Printer still on fire'
+        self.ticket.save()
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.comment_count, 3)
+        self.assertEqual(self.ticket.subject, 'Printer still on fire')
+
+    def test_save_of_partially_loaded_ticket(self):
+        ticket = Ticket.objects.only('id', 'ticket_number', 'subject').get(pk=self.ticket.pk)
+        ticket.subject = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            ticket.save()
+        # Deferred fields are neither fetched nor written
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')])
+        self.assertEqual(len(ticket_updates(queries)), 1)
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).subject, 'Renamed')
+
+
+class TicketDetailTests(QuickDeskTestCase):
+    """
+    Ticket detail embeds full categories and priorities with summarized users
+    """
+
+    def test_detail_payload(self):
+        ticket = self.create_ticket(assigned_to=self.agent)
+        client = APIClient()
+        client.force_authenticate(self.agent)
+
+        data = client.get(f'/api/tickets/{ticket.pk}/').json()
+        self.assertEqual(data['category']['description'], self.category.description)
+        self.assertIn('tickets_count', data['priority'])
+        self.assertEqual(set(data['assigned_to']), {'id', 'username', 'full_name', 'role'})
+
+
+class TicketTransitionTests(QuickDeskTestCase):
+    """
+    Status changes write the ticket row once and notify after commit
+    """
+
+    def setUp(self):
+        self.ticket = self.create_ticket(assigned_to=self.agent)
+
+    def test_transition_query_count(self):
+        # UPDATE ticket, INSERT activity, INSERT change log, two rollup bumps, savepoint pair
+        with self.assertNumQueries(9):
+            self.assertTrue(TicketService.transition(self.ticket, 'resolved', self.agent))
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.status, 'resolved')
+        self.assertIsNotNone(self.ticket.resolved_at)
+        activity = TicketActivity.objects.get(ticket=self.ticket, action='status_changed')
+        self.assertEqual((activity.old_value, activity.new_value), ('open', 'resolved'))
+
+    def test_transition_writes_ticket_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            TicketService.transition(self.ticket, 'in_progress', self.agent)
+        self.assertEqual(len(ticket_updates(queries)), 1)
+
+    def test_same_status_writes_nothing(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(TicketService.transition(self.ticket, 'open', self.agent))
+
+    def test_disallowed_transition(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(status='closed')
+        self.ticket.refresh_from_db()
+        with self.assertRaises(TransitionError):
+            TicketService.transition(self.ticket, 'resolved', self.agent)
+
+    def test_stale_status_conflicts(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(status='in_progress')
+        with self.assertRaises(TransitionConflict):
+            TicketService.transition(self.ticket, 'resolved', self.agent)
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).status, 'in_progress')
+        self.assertFalse(TicketActivity.objects.filter(ticket=self.ticket, action='status_changed').exists())
+
+    def test_notifications_follow_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            TicketService.transition(self.ticket, 'resolved', self.agent)
+            self.assertFalse(Notification.objects.filter(user=self.customer).exists())
+            self.assertFalse(EmailOutbox.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        notification = Notification.objects.get(user=self.customer)
+        self.assertEqual(notification.notification_type, 'status_changed')
+        self.assertTrue(EmailOutbox.objects.filter(event='ticket_updated').exists())
+        # The agent made the change and isn't notified about it
+        self.assertFalse(Notification.objects.filter(user=self.agent).exists())
+
+    def test_update_status_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.agent)
+        url = f'/api/tickets/{self.ticket.pk}/update_status/'
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(url, {'status': 'resolved'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ticket_updates(queries)), 1)
+        self.assertEqual(TicketActivity.objects.filter(ticket=self.ticket, action='status_changed').count(), 1)
+
+        Ticket.objects.filter(pk=self.ticket.pk).update(status='closed')
+        response = client.post(url, {'status': 'resolved'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_concurrent_status_change_on_update_conflicts(self):
+        client = APIClient()
+        client.force_authenticate(self.agent)
+        conflict = TransitionConflict(f"Ticket {self.ticket.ticket_number} was changed by someone else")
+
+        with mock.patch.object(TicketService, 'update_ticket', side_effect=conflict):
+            response = client.patch(f'/api/tickets/{self.ticket.pk}/', {'status': 'resolved'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['detail'], str(conflict))
+
+    def test_comment_moves_open_ticket_in_same_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            TicketService.add_comment(self.ticket, 'Looking into it', 'comment', self.agent, new_status='in_progress')
+        self.assertEqual(len(ticket_updates(queries)), 1)
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.status, 'in_progress')
+        self.assertEqual(self.ticket.comment_count, 1)
+        self.assertEqual(
+            sorted(TicketActivity.objects.filter(ticket=self.ticket).values_list('action', flat=True)),
+            ['comment_added', 'status_changed']
+        )
+
+    def test_comment_keeps_concurrently_changed_status(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(status='resolved')
+        TicketService.add_comment(self.ticket, 'Looking into it', 'comment', self.agent, new_status='in_progress')
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.status, 'resolved')
+        self.assertEqual(self.ticket.comment_count, 1)
+
+
+class IdempotencyKeyTests(QuickDeskTestCase):
+    """
+    POSTs retried with the same Idempotency-Key write once and replay the response
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.ticket_data = {
+            'subject': 'Cannot log in',
+            'description': 'Password reset link expired',
+            'category': str(self.category.pk),
+            'priority': str(self.priority.pk),
+        }
+
+    def test_retried_ticket_create_is_replayed(self):
+        first = self.client.post('/api/tickets/', self.ticket_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        retry = self.client.post('/api/tickets/', self.ticket_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Ticket.objects.count(), 1)
+        self.assertNotIn('quickdesk-idempotency', [thread.name for thread in threading.enumerate()])
+
+    def test_key_reused_for_other_request(self):
+        self.client.post('/api/tickets/', self.ticket_data, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        response = self.client.post(
+            '/api/tickets/', {**self.ticket_data, 'subject': 'Other'}, format='json', HTTP_IDEMPOTENCY_KEY='abc'
+        )
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        self.client.post('/api/tickets/', self.ticket_data, format='json')
+        self.client.post('/api/tickets/', self.ticket_data, format='json')
+        self.assertEqual(Ticket.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_abandoned_claim_is_taken_over(self):
+        record = IdempotencyKey.objects.create(
+            user=self.customer, key='abc', request_hash='fingerprint', created_at=timezone.now() - timedelta(minutes=2)
+        )
+        taken, response = claim(self.customer, 'abc', 'fingerprint')
+        self.assertIsNone(response)
+        self.assertEqual(taken.pk, record.pk)
+
+    def test_refreshed_claim_is_not_taken_over(self):
+        record = IdempotencyKey.objects.create(
+            user=self.customer, key='abc', request_hash='fingerprint', created_at=timezone.now() - timedelta(minutes=2)
+        )
+        self.assertEqual(refresh(record.pk), 1)
+        taken, response = claim(self.customer, 'abc', 'fingerprint')
+        self.assertIsNone(taken)
+        self.assertEqual(response.status_code, 409)
+
+    def test_retried_vote_does_not_toggle(self):
+        ticket = self.create_ticket(subject='Slow VPN')
+        url = f'/api/tickets/{ticket.pk}/vote/'
+        for _ in range(2):
+            response = self.client.post(url, {'vote_type': 'up'}, format='json', HTTP_IDEMPOTENCY_KEY='vote-1')
+            self.assertEqual(response.status_code, 200)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.upvotes, 1)
+
+    def test_comment_is_written_once(self):
+        ticket = self.create_ticket(subject='Slow VPN', assigned_to=self.agent)
+        url = f'/api/tickets/{ticket.pk}/comments/'
+        for _ in range(2):
+            response = self.client.post(url, {'content': 'Still slow'}, format='json', HTTP_IDEMPOTENCY_KEY='c-1')
+            self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(TicketComment.objects.filter(ticket=ticket).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.agent, notification_type='comment_added').count(), 1)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.comment_count, 1)
+
+
+class TicketBulkUpdateTests(QuickDeskTestCase):
+    """
+    Bulk updates write each change with set-based queries and notify each recipient once
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = User.objects.create_user('other', 'other@example.com', 'pass', role='customer')
+        cls.lead = User.objects.create_user('lead', 'lead@example.com', 'pass', role='agent')
+        cls.urgent = Priority.objects.create(name='urgent', level=4)
+
+    def setUp(self):
+        self.tickets = [
+            self.create_ticket(subject=f'Outage {number}', created_by=self.customer if number % 2 else self.other)
+            for number in range(20)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.lead)
+
+    def bulk(self, **data):
+        data.setdefault('ids', [str(ticket.pk) for ticket in self.tickets])
+        return self.client.post('/api/tickets/bulk/', data, format='json')
+
+    def test_writes_are_set_based(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk(status='in_progress', assigned_to=str(self.agent.pk), priority=str(self.urgent.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['updated']), 20)
+        # One UPDATE per change, plus one for the recomputed SLA deadlines
+        self.assertEqual(len(ticket_updates(queries)), 4)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "core_ticketactivity"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(Ticket.objects.filter(status='in_progress', assigned_to=self.agent, priority=self.urgent).count(), 20)
+        self.assertEqual(TicketActivity.objects.filter(action='assigned').count(), 20)
+
+    def test_disallowed_status_is_skipped(self):
+        closed = self.tickets[0]
+        Ticket.objects.filter(pk=closed.pk).update(status='closed')
+
+        result = self.bulk(status='resolved', add_tags=['outage']).json()
+        self.assertEqual([skip['id'] for skip in result['skipped']], [str(closed.pk)])
+        closed.refresh_from_db()
+        self.assertEqual(closed.status, 'closed')
+        self.assertEqual(closed.tags, ['outage'])
+        self.assertEqual(Ticket.objects.filter(status='resolved', resolved_at__isnull=False).count(), 19)
+
+    def test_repeated_changes_are_unchanged(self):
+        self.bulk(priority=str(self.urgent.pk))
+        result = self.bulk(priority=str(self.urgent.pk)).json()
+        self.assertEqual(result['updated'], [])
+        self.assertEqual(len(result['unchanged']), 20)
+        self.assertEqual(TicketActivity.objects.filter(action='priority_changed').count(), 20)
+
+    def test_visibility(self):
+        internal = self.create_ticket(subject='Internal', created_by=self.lead, is_internal=True)
+        result = self.bulk(ids=[str(internal.pk)], status='resolved').json()
+        self.assertEqual(result['not_found'], [str(internal.pk)])
+        self.assertEqual(Ticket.objects.get(pk=internal.pk).status, 'open')
+
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.bulk(status='closed').status_code, 403)
+
+    def test_requires_a_change(self):
+        self.assertEqual(self.bulk().status_code, 400)
+
+    def test_blank_tags_are_rejected(self):
+        response = self.bulk(add_tags=['  ', ''])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('add_tags', response.json())
+        self.assertFalse(TicketActivity.objects.filter(action='tags_changed').exists())
+
+    def test_one_notification_per_recipient(self):
+        queryset = Ticket.objects.filter(pk__in=[ticket.pk for ticket in self.tickets])
+        with self.captureOnCommitCallbacks() as callbacks:
+            TicketBulkService.update(queryset, {'assigned_to': self.agent, 'status': 'resolved'}, self.lead)
+            self.assertFalse(Notification.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Notification.objects.filter(user=self.customer).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.other).count(), 1)
+        assigned = Notification.objects.get(user=self.agent)
+        self.assertEqual(assigned.notification_type, 'ticket_assigned')
+        self.assertEqual(assigned.title, '20 tickets assigned to you')
+        self.assertFalse(Notification.objects.filter(user=self.lead).exists())
+        self.assertEqual(EmailOutbox.objects.filter(event='tickets_bulk_updated').count(), 3)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTests(TestCase):
+    """
+    The outbox worker claims a batch, sends outside the transaction and records each result
+    """
+
+    def queue(self, recipient):
+        return EmailOutbox.objects.create(
+            event='ticket_updated', subject=f'Hello {recipient}', body='Body', html_body='<p>Body</p>',
+            from_email='desk@example.com', recipients=[recipient]
+        )
+
+    def test_send(self):
+        email = self.queue('customer@example.com')
+        self.assertEqual(EmailOutboxService.send_batch(), {'sent': 1, 'retried': 0, 'failed': 0})
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '<p>Body</p>')
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+        self.assertIsNotNone(email.sent_at)
+        # Nothing is due any more
+        self.assertEqual(EmailOutboxService.send_batch(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+    @override_settings(EMAIL_BACKEND='app.core.tests.FailingEmailBackend')
+    def test_failure_is_recorded_per_email(self):
+        delivered = self.queue('customer@example.com')
+        bounced = self.queue('bounce@example.com')
+        before = timezone.now()
+
+        self.assertEqual(EmailOutboxService.send_batch(), {'sent': 1, 'retried': 1, 'failed': 0})
+        delivered.refresh_from_db()
+        bounced.refresh_from_db()
+        self.assertEqual(delivered.status, 'sent')
+        self.assertEqual((bounced.status, bounced.attempts), ('pending', 1))
+        self.assertIn('Mailbox unavailable', bounced.last_error)
+        self.assertGreaterEqual(bounced.next_attempt_at, before + timedelta(seconds=30))
+
+        # Backoff doubles with each attempt
+        EmailOutbox.objects.filter(pk=bounced.pk).update(next_attempt_at=timezone.now())
+        EmailOutboxService.send_batch()
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.attempts, 2)
+        self.assertGreaterEqual(bounced.next_attempt_at, before + timedelta(seconds=60))
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(EMAIL_BACKEND='app.core.tests.FailingEmailBackend')
+    def test_gives_up_after_max_attempts(self):
+        email = self.queue('bounce@example.com')
+        EmailOutbox.objects.filter(pk=email.pk).update(attempts=4)
+
+        self.assertEqual(EmailOutboxService.send_batch(), {'sent': 0, 'retried': 0, 'failed': 1})
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 5))
+
+    def test_claimed_emails_are_not_sent_twice(self):
+        email = self.queue('customer@example.com')
+        self.assertEqual([claimed.pk for claimed in EmailOutboxService.claim_batch(None, {})], [email.pk])
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'sending')
+
+        # Another worker skips it until the claim runs out
+        self.assertEqual(EmailOutboxService.send_batch(), {'sent': 0, 'retried': 0, 'failed': 0})
+        EmailOutbox.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(EmailOutboxService.send_batch()['sent'], 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class NotificationUnreadCountTests(QuickDeskTestCase):
+    """
+    The unread badge is read from maintained counters, broadcasts included
+    """
+
+    def setUp(self):
+        self.ticket = self.create_ticket()
+
+    def broadcast(self, excluded_user=None):
+        return NotificationService.broadcast_ticket_event(self.ticket, 'ticket_created', 'agents', excluded_user)
+
+    def assertUnread(self, expected):
+        with self.assertNumQueries(1):
+            self.assertEqual(NotificationService.unread_count(self.agent), expected)
+        self.assertEqual(NotificationService.count_unread_broadcasts(self.agent), expected)
+
+    def test_counts_follow_broadcasts(self):
+        first = self.broadcast()
+        # The first read counts what was broadcast before the read state existed
+        self.assertEqual(NotificationService.unread_count(self.agent), 1)
+
+        second, third = self.broadcast(), self.broadcast()
+        self.broadcast(excluded_user=self.agent)
+        self.assertUnread(3)
+
+        NotificationService.mark_read(self.agent, [first.pk])
+        self.assertUnread(2)
+        NotificationService.set_broadcast_state(self.agent, second.pk, is_hidden=True)
+        self.assertUnread(1)
+        NotificationService.set_broadcast_state(self.agent, third.pk, is_read=True)
+        self.assertUnread(0)
+
+        self.broadcast()
+        NotificationService.mark_all_read(self.agent)
+        self.assertUnread(0)
+
+    def test_deleted_broadcasts_are_recounted(self):
+        NotificationService.unread_count(self.agent)
+        broadcast = self.broadcast()
+        self.broadcast()
+        self.assertUnread(2)
+
+        BroadcastNotification.objects.filter(pk=broadcast.pk).delete()
+        self.assertEqual(NotificationService.unread_count(self.agent), 1)
+        self.assertUnread(1)
+
+
+class EventStreamTests(QuickDeskTestCase):
+    """
+    The event stream is only served under ASGI and follows the REST visibility rules
+    """
+
+    def published_events(self, **comment):
+        ticket = self.create_ticket()
+        backend = mock.Mock()
+        with mock.patch.object(events, 'get_backend', return_value=backend):
+            with self.captureOnCommitCallbacks(execute=True):
+                TicketService.add_comment(ticket, 'Checked the logs', 'comment', self.agent, **comment)
+        return [call.args[0] for call in backend.publish.call_args_list if call.args[0]['type'] == 'ticket.changed']
+
+    def test_internal_notes_are_hidden_from_customers(self):
+        [event] = self.published_events(is_internal=True)
+        self.assertFalse(events.is_visible(self.customer, event))
+        self.assertTrue(events.is_visible(self.agent, event))
+        self.assertNotIn('staff_only', events.client_payload(event))
+
+    def test_public_comments_reach_the_owner(self):
+        [event] = self.published_events()
+        self.assertTrue(events.is_visible(self.customer, event))
+
+    def test_refused_under_wsgi(self):
+        response = self.client.get('/api/events/stream/')
+        self.assertEqual(response.status_code, 501)
+
+    async def test_requires_authentication_under_asgi(self):
+        response = await AsyncClient().get('/api/events/stream/')
+        self.assertEqual(response.status_code, 401)
+
+
+class ConditionalGetTests(QuickDeskTestCase):
+    """
+    Ticket list and detail answer 304 until something they render changes
+    """
+
+    def setUp(self):
+        self.ticket = self.create_ticket()
+        self.client = APIClient()
+        self.client.force_authenticate(self.agent)
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def assert_revalidates_after_write(self, url):
+        # Backdate the row so the write moves Last-Modified by whole seconds
+        earlier = timezone.now() - timedelta(hours=1)
+        Ticket.objects.filter(pk=self.ticket.pk).update(updated_at=earlier, last_activity_at=earlier)
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        not_modified = self.revalidate(url, first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+
+        self.ticket.refresh_from_db()
+        self.ticket.subject = 'Printer on fire'
+        self.ticket.save()
+
+        stale = self.revalidate(url, first['ETag'])
+        self.assertEqual(stale.status_code, 200)
+        self.assertNotEqual(stale['ETag'], first['ETag'])
+        self.assertNotEqual(stale['Last-Modified'], first['Last-Modified'])
+        self.assertEqual(self.revalidate(url, stale['ETag']).status_code, 304)
+
+    def test_list_revalidates_after_ticket_write(self):
+        self.assert_revalidates_after_write('/api/tickets/')
+
+    def test_detail_revalidates_after_ticket_write(self):
+        self.assert_revalidates_after_write(f'/api/tickets/{self.ticket.pk}/')
+
+    def test_detail_revalidates_after_comment(self):
+        url = f'/api/tickets/{self.ticket.pk}/'
+        etag = self.client.get(url)['ETag']
+        TicketComment.objects.create(ticket=self.ticket, created_by=self.agent, content='On it')
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_validators_are_per_user(self):
+        etag = self.client.get('/api/tickets/')['ETag']
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.revalidate('/api/tickets/', etag).status_code, 200)
+
+    def test_list_etag_follows_hot_score_decay(self):
+        Ticket.objects.filter(pk=self.ticket.pk).update(
+            hot_score=4.0, hot_score_at=timezone.now() - timedelta(hours=24)
+        )
+        etag = self.client.get('/api/tickets/')['ETag']
+        self.assertEqual(self.revalidate('/api/tickets/', etag).status_code, 304)
+
+        TicketVoteService.decay_hot_scores()
+        response = self.revalidate('/api/tickets/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.json()['results'][0]['hot_score'], 2.0, places=2)
+
+
+class TicketPaginationTests(QuickDeskTestCase):
+    """
+    Keyset cursors and count-free pages on the ticket list
+    """
+
+    def setUp(self):
+        self.tickets = [self.create_ticket(subject=f'Printer {number}') for number in range(25)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.agent)
+
+    def decode(self, cursor, field='created_at'):
+        paginator = KeysetPagination()
+        paginator.field = field
+        paginator.model = Ticket
+        request = Request(APIRequestFactory().get('/api/tickets/', {'cursor': cursor}))
+        return paginator.decode_cursor(request)
+
+    def pages(self, url):
+        seen = []
+        while url:
+            body = self.client.get(url).json()
+            seen.append(body)
+            url = body['next']
+        return seen
+
+    def test_cursor_round_trip(self):
+        ticket = self.tickets[3]
+        position = self.decode(KeysetPagination.cursor_after(ticket, 'created_at'))
+        self.assertEqual(position, {'value': ticket.created_at, 'pk': ticket.pk, 'direction': 'next'})
+
+        position = self.decode(KeysetPagination.cursor_after(ticket, 'priority__level'), 'priority__level')
+        self.assertEqual(position['value'], 2)
+
+    def test_malformed_cursor(self):
+        for cursor in ('not-a-cursor', 'eyJ2IjoxfQ', KeysetPagination.cursor_after(self.tickets[0], 'priority__level')):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.decode(cursor)
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/tickets/', {'cursor': cursor}).status_code, 404)
+
+    def test_cursor_pages_across_equal_sort_keys(self):
+        Ticket.objects.update(created_at=timezone.now())
+        first, second = self.pages('/api/tickets/?paginate=cursor')
+        self.assertIsNone(first['previous'])
+        self.assertIsNone(second['next'])
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(set(ids), {str(ticket.pk) for ticket in self.tickets})
+
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+        self.assertEqual(self.client.get(back['next']).json()['results'], second['results'])
+
+    def test_count_false_skips_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get('/api/tickets/', {'count': 'false'}).json()
+        # The only COUNT is the one folded into the ETag validators
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT COUNT(*)')])
+        self.assertIsNone(first['count'])
+        self.assertEqual(len(first['results']), 20)
+        self.assertIsNone(first['previous'])
+
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        self.assertNotIn('page=', second['previous'])
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+
+class TicketRollupTests(QuickDeskTestCase):
+    """
+    The daily rollup tracks live ticket counts through every kind of write
+    """
+    KEY = ['category', 'priority', 'assigned_to', 'status', 'is_internal']
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.billing = Category.objects.create(name='Billing', created_by=cls.agent)
+        cls.urgent = Priority.objects.create(name='urgent', level=4)
+
+    def setUp(self):
+        self.tickets = [self.create_ticket(subject=f'Invoice {number}') for number in range(6)]
+
+    def rollup_counts(self):
+        rows = TicketDailyStat.objects.values(*self.KEY).annotate(total=Sum(F('entered') - F('left'))).order_by()
+        return {tuple(row[field] for field in self.KEY): row['total'] for row in rows if row['total']}
+
+    def ticket_counts(self):
+        rows = Ticket.objects.values(*self.KEY).annotate(total=Count('pk')).order_by()
+        return {tuple(row[field] for field in self.KEY): row['total'] for row in rows}
+
+    def daily_flow(self):
+        rows = TicketDailyStat.objects.values('day').annotate(created=Sum('created'), resolved=Sum('resolved')).order_by('day')
+        return list(rows)
+
+    def mixed_writes(self, delete=True):
+        first, second, third, fourth, fifth, _ = self.tickets
+        TicketService.transition(first, 'in_progress', self.agent)
+        TicketService.transition(first, 'resolved', self.agent)
+        TicketService.transition(second, 'resolved', self.agent)
+        TicketService.transition(second, 'closed', self.agent)
+        TicketService.update_ticket(third, {'category': self.billing, 'priority': self.urgent}, self.agent)
+        TicketService.assign_ticket(fourth, self.agent, self.agent)
+        TicketBulkService.update(
+            Ticket.objects.filter(pk__in=[third.pk, fifth.pk]), {'status': 'in_progress'}, self.agent
+        )
+        if delete:
+            # Deleted through an instance loaded before the bulk update moved it
+            fifth.delete()
+
+    def test_entered_and_left_per_change(self):
+        ticket = self.tickets[0]
+        self.assertEqual(TicketRollupService.status_counts(), {'open': 6})
+
+        TicketService.transition(ticket, 'in_progress', self.agent)
+        self.assertEqual(TicketRollupService.status_counts(), {'open': 5, 'in_progress': 1})
+        TicketService.transition(ticket, 'resolved', self.agent)
+        self.assertEqual(TicketRollupService.status_counts(), {'open': 5, 'in_progress': 0, 'resolved': 1})
+
+        TicketService.update_ticket(ticket, {'category': self.billing}, self.agent)
+        TicketService.update_ticket(ticket, {'priority': self.urgent}, self.agent)
+        TicketService.assign_ticket(ticket, self.agent, self.agent)
+        moved = TicketDailyStat.objects.filter(category=self.billing, priority=self.urgent, assigned_to=self.agent)
+        self.assertEqual(moved.aggregate(entered=Sum('entered'), left=Sum('left')), {'entered': 1, 'left': 0})
+        self.assertEqual(TicketRollupService.status_counts(Q(category=self.category)), {'open': 5, 'in_progress': 0, 'resolved': 0})
+
+        ticket.delete()
+        self.assertEqual(TicketRollupService.status_counts(Q(category=self.billing)), {'resolved': 0})
+        self.assertEqual(TicketRollupService.flow_since(timezone.localdate()), {'created': 6, 'resolved': 1})
+
+    def test_matches_tickets_after_mixed_writes(self):
+        self.mixed_writes()
+        self.assertEqual(self.rollup_counts(), self.ticket_counts())
+
+    def test_rebuild_matches_incremental_rows(self):
+        # A rebuild only sees tickets that still exist, so nothing is deleted here
+        self.mixed_writes(delete=False)
+        incremental, flow = self.rollup_counts(), self.daily_flow()
+
+        call_command('rebuild_ticket_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_counts(), incremental)
+        self.assertEqual(self.daily_flow(), flow)
+
+    def test_dashboard_status_counts(self):
+        TicketService.transition(self.tickets[0], 'resolved', self.agent)
+        self.create_ticket(subject='Internal', created_by=self.agent, is_internal=True)
+        client = APIClient()
+        statuses = ['total_tickets', 'open_tickets', 'in_progress_tickets', 'resolved_tickets', 'closed_tickets']
+
+        client.force_authenticate(self.agent)
+        with CaptureQueriesContext(connection) as queries:
+            stats = client.get('/api/dashboard/stats/').json()
+        self.assertEqual([stats[key] for key in statuses], [6, 5, 0, 1, 0])
+        self.assertTrue(any('core_ticketdailystat' in query['sql'] for query in queries))
+
+        client.force_authenticate(self.customer)
+        stats = client.get('/api/dashboard/stats/').json()
+        self.assertEqual([stats[key] for key in statuses], [6, 5, 0, 1, 0])
+        self.assertEqual(stats['my_tickets'], 6)
+
+    def test_timeseries(self):
+        today = timezone.localdate()
+        earlier = timezone.now() - timedelta(days=3)
+        key = {**self.tickets[0].get_rollup_key(), 'status': 'open'}
+        TicketRollupService.record_change(None, key, when=earlier)
+        TicketRollupService.record_change(None, {**key, 'status': 'closed'}, when=earlier)
+        TicketService.transition(self.tickets[0], 'resolved', self.agent)
+
+        series = TicketRollupService.timeseries(today - timedelta(days=2), today)
+        self.assertEqual([day['date'] for day in series], [today - timedelta(days=2), today - timedelta(days=1), today])
+        self.assertEqual(
+            [(day['created'], day['resolved'], day['backlog']) for day in series],
+            [(0, 0, 1), (0, 0, 1), (6, 1, 6)]
+        )
+
+
+class SLATests(QuickDeskTestCase):
+    """
+    SLA deadlines follow the most specific policy and breaches are notified once
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.billing = Category.objects.create(name='Billing', created_by=cls.agent)
+        cls.urgent = Priority.objects.create(name='urgent', level=4)
+        SLAPolicy.objects.create(name='Medium', priority=cls.priority, first_response_minutes=60, resolution_minutes=600)
+        SLAPolicy.objects.create(name='General', category=cls.category, first_response_minutes=30, resolution_minutes=300)
+        SLAPolicy.objects.create(
+            name='Medium general', priority=cls.priority, category=cls.category,
+            first_response_minutes=15, resolution_minutes=150
+        )
+        SLAPolicy.objects.create(name='Urgent', priority=cls.urgent, first_response_minutes=5, resolution_minutes=60)
+
+    def assert_due(self, ticket, first_response, resolution):
+        # New tickets count from just before created_at is stamped, so compare whole minutes
+        ticket.refresh_from_db()
+        minutes = [
+            round((due_at - ticket.created_at).total_seconds() / 60)
+            for due_at in (ticket.first_response_due_at, ticket.resolution_due_at)
+        ]
+        self.assertEqual(minutes, [first_response, resolution])
+
+    def run_worker(self, *args):
+        output = StringIO()
+        call_command('run_sla_worker', '--once', *args, stdout=output)
+        return output.getvalue()
+
+    def test_policy_precedence(self):
+        self.assert_due(self.create_ticket(), 15, 150)
+        self.assert_due(self.create_ticket(category=self.billing), 60, 600)
+        self.assert_due(self.create_ticket(priority=Priority.objects.create(name='low', level=1)), 30, 300)
+        self.assertIsNone(self.create_ticket(
+            category=self.billing, priority=Priority.objects.get(name='low')
+        ).first_response_due_at)
+
+    def test_priority_change_recomputes_deadlines(self):
+        ticket = self.create_ticket()
+        TicketService.update_ticket(ticket, {'priority': self.urgent}, self.agent)
+        self.assert_due(ticket, 5, 60)
+
+        TicketBulkService.update(Ticket.objects.filter(pk=ticket.pk), {'priority': self.priority}, self.agent)
+        self.assert_due(ticket, 15, 150)
+
+        SLAPolicy.objects.filter(name='Medium general').update(first_response_minutes=20)
+        self.run_worker('--recompute')
+        self.assert_due(ticket, 20, 150)
+
+    def test_breach_is_notified_once(self):
+        ticket = self.create_ticket(assigned_to=self.agent)
+        Ticket.objects.filter(pk=ticket.pk).update(created_at=timezone.now() - timedelta(minutes=20))
+
+        output = self.run_worker('--recompute')
+        self.assertIn('recording 1 breaches', output)
+        ticket.refresh_from_db()
+        self.assertIsNotNone(ticket.first_response_breached_at)
+        self.assertIsNone(ticket.resolution_breached_at)
+
+        self.assertIn('recording 0 breaches', self.run_worker())
+        self.assertEqual(Notification.objects.filter(user=self.agent, notification_type='sla_breached').count(), 1)
+
+    def test_heap_skips_superseded_deadlines(self):
+        from .management.commands.run_sla_worker import Command
+
+        ticket = self.create_ticket()
+        worker = Command(stdout=StringIO())
+        worker.heap, worker.pending, worker.breaches = [], {}, 0
+        worker.track(ticket)
+        worker.track(ticket)
+
+        # A later priority moves the deadline out; only the new heap entry stays live
+        TicketService.update_ticket(ticket, {'priority': self.urgent}, self.agent)
+        worker.refresh_changed(timezone.now() - timedelta(minutes=1))
+        self.assertEqual(len(worker.heap), 4)
+
+        worker.fire_due(ticket.created_at + timedelta(minutes=10))
+        self.assertEqual(worker.breaches, 1)
+        worker.fire_due(ticket.created_at + timedelta(minutes=20))
+        self.assertEqual(worker.breaches, 1)
+        self.assertEqual(BroadcastNotification.objects.filter(notification_type='sla_breached').count(), 1)
+
+
+class TicketChangesFeedTests(QuickDeskTestCase):
+    """
+    The changes feed resumes from opaque cursors and asks stale clients to resync
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.agent)
+
+    def open_ticket(self):
+        # Created through the service, which logs the change
+        return TicketService.create_ticket(
+            {'subject': 'Printer on fire', 'description': 'It is on fire', 'category': self.category, 'priority': self.priority},
+            self.customer
+        )
+
+    def changes(self, since=None):
+        return self.client.get('/api/tickets/changes/', {'since': since} if since else {})
+
+    def settle(self):
+        # Age every logged change past the settle window
+        TicketChange.objects.update(created_at=F('created_at') - timedelta(minutes=1))
+
+    def test_cursor_round_trip(self):
+        now = timezone.now()
+        self.assertEqual(TicketChangeService.decode_cursor(TicketChangeService.encode_cursor(42, now)), (42, now))
+
+        start = self.changes().json()['cursor']
+        ticket = self.open_ticket()
+        self.settle()
+        body = self.changes(start).json()
+        self.assertEqual([row['id'] for row in body['tickets']], [str(ticket.pk)])
+        self.assertFalse(body['has_more'])
+
+        latest = TicketChange.objects.order_by('-id').first()
+        self.assertEqual(TicketChangeService.decode_cursor(body['cursor']), (latest.id, latest.created_at))
+        self.assertEqual(self.changes(body['cursor']).json()['tickets'], [])
+
+    def test_bad_cursor(self):
+        for cursor in ('garbage', TicketChangeService.encode_cursor(-1, timezone.now()), 'eyJzZXEiOjF9'):
+            with self.subTest(cursor=cursor):
+                response = self.changes(cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+    def test_settle_window_holds_the_cursor(self):
+        start = self.changes().json()['cursor']
+        ticket = self.open_ticket()
+
+        # Fresh changes are returned, but the cursor stays before them until they settle
+        body = self.changes(start).json()
+        self.assertEqual([row['id'] for row in body['tickets']], [str(ticket.pk)])
+        self.assertEqual(body['cursor'], start)
+        self.assertEqual([row['id'] for row in self.changes(body['cursor']).json()['tickets']], [str(ticket.pk)])
+
+        self.settle()
+        self.assertNotEqual(self.changes(start).json()['cursor'], start)
+
+    def test_expired_after_pruning_past_cursor(self):
+        first = self.open_ticket()
+        self.open_ticket()
+        TicketChange.objects.update(created_at=timezone.now() - timedelta(days=40))
+        kept = self.open_ticket()
+        changes = list(TicketChange.objects.order_by('id'))
+        cursor = TicketChangeService.encode_cursor(changes[0].id, changes[0].created_at)
+
+        # Nothing is gone yet, or only the change the cursor already points at
+        self.assertEqual(self.changes(cursor).status_code, 200)
+        TicketChange.objects.filter(ticket_id=first.pk).delete()
+        self.assertEqual(self.changes(cursor).status_code, 200)
+
+        call_command('prune_ticket_changes', stdout=StringIO())
+        self.assertEqual(list(TicketChange.objects.values_list('ticket_id', flat=True)), [kept.pk])
+        self.assertEqual(self.changes(cursor).status_code, 410)
+        self.assertEqual(self.changes(self.changes().json()['cursor']).status_code, 200)
+
+
+class TicketVoteTests(QuickDeskTestCase):
+    """
+    Votes adjust the ticket's counts by deltas, directly or through shards
+    """
+
+    def setUp(self):
+        self.ticket = self.create_ticket()
+
+    def counts(self):
+        self.ticket.refresh_from_db()
+        return self.ticket.upvotes, self.ticket.downvotes
+
+    def vote_counts(self):
+        votes = TicketVote.objects.filter(ticket=self.ticket)
+        return votes.filter(vote_type='up').count(), votes.filter(vote_type='down').count()
+
+    def test_add_switch_remove(self):
+        steps = [
+            (self.agent, 'up', 'added', (1, 0)),
+            (self.customer, 'down', 'added', (1, 1)),
+            (self.agent, 'down', 'changed', (0, 2)),
+            (self.customer, 'up', 'changed', (1, 1)),
+            (self.customer, 'up', 'removed', (0, 1)),
+            (self.agent, 'down', 'removed', (0, 0)),
+        ]
+        for user, vote_type, result, counts in steps:
+            with self.subTest(user=user.username, vote_type=vote_type):
+                self.assertEqual(TicketVoteService.cast_vote(self.ticket, user, vote_type), result)
+                self.assertEqual(self.counts(), counts)
+                self.assertEqual(self.vote_counts(), counts)
+
+    def test_flush_vote_shards(self):
+        voters = [
+            User.objects.create_user(f'voter{number}', f'voter{number}@example.com', role='customer')
+            for number in range(12)
+        ]
+        sharded = {**settings.QUICKDESK_SETTINGS, 'VOTE_COUNTER_SHARDS': 4, 'VOTE_SHARDING_THRESHOLD': 0}
+        with override_settings(QUICKDESK_SETTINGS=sharded):
+            for number, voter in enumerate(voters):
+                TicketVoteService.cast_vote(self.ticket, voter, 'up' if number % 3 else 'down')
+            for voter in voters[:4]:
+                TicketVoteService.cast_vote(self.ticket, voter, 'up')
+
+        # Nothing reaches the ticket until the shards are flushed
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertEqual(self.vote_counts(), (8, 2))
+
+        output = StringIO()
+        call_command('flush_vote_shards', '--once', stdout=output)
+        self.assertIn('Flushed vote counts of 1 tickets', output.getvalue())
+        self.assertEqual(self.counts(), self.vote_counts())
+        self.assertEqual(self.ticket.hot_score, 6)
+        self.assertFalse(TicketVoteShard.objects.exclude(upvotes=0, downvotes=0).exists())
+
+        self.assertEqual(TicketVoteService.flush_shards(), 0)
+        self.assertEqual(self.counts(), (8, 2))
@@ -30,9 +30,13 @@ urlpatterns = [
     
     # Dashboard and search endpoints
     path('dashboard/stats/', views.DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('dashboard/timeseries/', views.DashboardTimeseriesView.as_view(), name='dashboard-timeseries'),
     path('admin/stats/', views.AdminStatsView.as_view(), name='admin-stats'),
     path('tickets/search/', views.TicketSearchView.as_view(), name='ticket-search'),
     
+    # Push channel (Server-Sent Events, ASGI only)
+    path('events/stream/', views.event_stream, name='event-stream'),
+    
     # Include router URLs
     path('', include(router.urls)),
     path('', include(tickets_router.urls)),
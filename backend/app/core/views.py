@@ -1,7 +1,15 @@
-from django.http import JsonResponse
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth import login, logout
-from django.db.models import Q, Count, Avg
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Q, Count, Avg, F, Max, OuterRef, Prefetch, Subquery
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework import generics, status, permissions, filters
@@ -10,6 +18,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import (
     User, Category, Priority, Ticket, TicketComment, 
@@ -22,9 +32,19 @@ from .serializers import (
     TicketListSerializer, TicketDetailSerializer, TicketCreateSerializer,
     TicketUpdateSerializer, TicketCommentSerializer, CommentCreateSerializer,
     TicketAttachmentSerializer, TicketVoteSerializer, TicketActivitySerializer,
-    NotificationSerializer, DashboardStatsSerializer, TicketSearchSerializer
+    TicketChangeCommentSerializer, TicketChangeActivitySerializer,
+    NotificationSerializer, InboxNotificationSerializer, NotificationMarkReadSerializer, DashboardStatsSerializer, DashboardTimeseriesSerializer,
+    TicketSearchSerializer, TicketBulkUpdateSerializer
+)
+from .services import (
+    EmailService, NotificationService, SLAService, TicketAnalyticsService, TicketBulkService, TicketChangeService,
+    TicketRollupService, TicketService, TicketVoteService, TransitionConflict, TransitionError
 )
-from .services import EmailService, NotificationService, TicketService
+from . import events
+from .conditional import ConditionalGetMixin, make_etag
+from .idempotency import idempotent
+from .pagination import InboxPagination
+from .search import TicketSearchBackend, TicketSearchFilter
 
 
 # ============================================================================
@@ -152,23 +172,24 @@ class PriorityViewSet(ModelViewSet):
 # Ticket Views
 # ============================================================================
 
-class TicketViewSet(ModelViewSet):
+class TicketViewSet(ConditionalGetMixin, ModelViewSet):
     """
     ViewSet for managing tickets
     """
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['subject', 'description', 'ticket_number']
-    ordering_fields = ['created_at', 'updated_at', 'priority__level', 'status']
+    # TicketSearchFilter runs last so it can order by relevance when no ?ordering= is given
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, TicketSearchFilter]
+    ordering_fields = ['created_at', 'updated_at', 'last_activity_at', 'priority__level', 'status']
     ordering = ['-created_at']
     filterset_fields = ['status', 'category', 'priority', 'assigned_to', 'created_by']
+    cursor_ordering_fields = ['created_at', 'updated_at', 'last_activity_at', 'priority__level', 'status']
     
-    def get_queryset(self):
+    def get_visible_queryset(self):
         """
         Filter tickets based on user role and permissions
         """
         user = self.request.user
-        queryset = Ticket.objects.select_related('created_by', 'assigned_to', 'category', 'priority')
+        queryset = Ticket.objects.all()
         
         if user.role == 'customer':
             # Customers can only see their own tickets and non-internal tickets
@@ -177,9 +198,55 @@ class TicketViewSet(ModelViewSet):
             # Agents can see all non-internal tickets
             queryset = queryset.filter(is_internal=False)
         # Admins can see all tickets
-        
         return queryset
     
+    def get_queryset(self):
+        queryset = self.get_visible_queryset()
+        
+        if self.action in ['list', 'retrieve']:
+            # Only load what the requested ?fields= / ?expand= need
+            return self.get_serializer_class().setup_eager_loading(queryset, self.request)
+        
+        return queryset.select_related('created_by', 'assigned_to', 'category', 'priority')
+    
+    def get_list_validators(self):
+        """
+        Validators for the filtered list: newest change plus row count. Hot scores
+        are rewritten by votes and decay without touching updated_at, so their
+        newest write counts as a change too.
+        """
+        queryset = self.filter_queryset(self.get_visible_queryset()).order_by()
+        state = queryset.aggregate(
+            updated=Max('updated_at'), activity=Max('last_activity_at'), scored=Max('hot_score_at'), total=Count('pk')
+        )
+        last_modified = max(filter(None, [state['updated'], state['activity'], state['scored']]), default=None)
+        etag = make_etag(state['updated'], state['activity'], state['scored'], state['total'], *self.validator_parts())
+        return etag, last_modified
+    
+    def get_object_validators(self):
+        """
+        Validators for one ticket: its row timestamps, counters and latest comment edit
+        """
+        latest_comment = TicketComment.objects.filter(
+            ticket=OuterRef('pk')
+        ).order_by('-updated_at').values('updated_at')[:1]
+        try:
+            state = self.get_visible_queryset().filter(pk=self.kwargs['pk']).annotate(
+                comment_updated=Subquery(latest_comment)
+            ).values(
+                'updated_at', 'last_activity_at', 'comment_updated',
+                'comment_count', 'attachment_count', 'upvotes', 'downvotes'
+            ).first()
+        except (ValueError, DjangoValidationError):
+            state = None
+        if state is None:
+            # Let retrieve() produce the 404
+            return None
+        
+        last_modified = max(filter(None, [state['updated_at'], state['last_activity_at'], state['comment_updated']]))
+        etag = make_etag(*state.values(), *self.validator_parts())
+        return etag, last_modified
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return TicketListSerializer
@@ -189,6 +256,10 @@ class TicketViewSet(ModelViewSet):
             return TicketUpdateSerializer
         return TicketDetailSerializer
     
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         # Use the service to create ticket with notifications
         validated_data = serializer.validated_data
@@ -240,20 +311,139 @@ class TicketViewSet(ModelViewSet):
                 return Response({'error': 'Customers can only close or reopen tickets'}, 
                               status=status.HTTP_403_FORBIDDEN)
         
-        # Update status
+        # One conditional UPDATE; notifications follow after commit
         old_status = ticket.status
-        ticket.status = new_status
-        ticket.save()
-        
-        # Use the service to handle notifications and activity tracking
-        TicketService.update_ticket(ticket, {'status': new_status}, request.user)
+        try:
+            TicketService.transition(ticket, new_status, request.user)
+        except TransitionConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        except TransitionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'message': f'Ticket status updated from {old_status} to {new_status}',
             'status': new_status
         })
     
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def bulk(self, request):
+        """
+        Apply the same changes to many tickets in one request
+        """
+        if request.user.role not in ['agent', 'admin']:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        serializer = TicketBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+        ids = changes.pop('ids')
+        
+        # Only tickets this user can see are touched; the rest are reported as not found
+        queryset = self.get_visible_queryset().filter(pk__in=ids)
+        result = TicketBulkService.update(queryset, changes, request.user)
+        
+        found = set(result['updated']) | set(result['unchanged']) | {skip['id'] for skip in result['skipped']}
+        result['not_found'] = [pk for pk in ids if pk not in found]
+        return Response(result)
+    
+    @action(detail=True, methods=['get'])
+    def activities(self, request, pk=None):
+        """
+        Paginated activity log of a ticket, newest first
+        """
+        ticket = self.get_object()
+        queryset = TicketActivity.objects.filter(ticket=ticket).select_related('user')
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = TicketActivitySerializer(page, many=True, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = TicketActivitySerializer(queryset, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """
+        Open tickets ranked by their decayed net votes, read from the hot score index
+        """
+        if request.user.role not in ['agent', 'admin']:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        queryset = self.get_visible_queryset().filter(
+            hot_score_at__isnull=False, hot_score__gt=0, status__in=SLAService.ACTIVE_STATUSES
+        ).order_by('-hot_score', 'id')
+        queryset = TicketListSerializer.setup_eager_loading(queryset, request)
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = TicketListSerializer(page, many=True, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = TicketListSerializer(queryset, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Tickets, comments and activities changed after ?since=<cursor>, for clients
+        that keep a local copy. Without ?since= only the current cursor is returned.
+        """
+        since = request.query_params.get('since')
+        if not since:
+            return Response({'cursor': TicketChangeService.head_cursor(), 'has_more': False})
+        try:
+            sequence, since_at = TicketChangeService.decode_cursor(since)
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if TicketChangeService.cursor_expired(sequence, since_at):
+            return Response(
+                {'error': 'Cursor expired, reload tickets and start again without ?since='},
+                status=status.HTTP_410_GONE
+            )
+        
+        changes, cursor, has_more = TicketChangeService.changes_since(request.user, sequence, since_at)
+        changed_ids = {change['ticket_id'] for change in changes}
+        
+        tickets = TicketListSerializer.setup_eager_loading(
+            self.get_visible_queryset().filter(pk__in=changed_ids), request
+        )
+        context = self.get_serializer_context()
+        ticket_data = TicketListSerializer(tickets, many=True, context=context).data
+        visible_ids = {ticket.pk for ticket in tickets}
+        
+        # Rows written inside the settle window may predate their change's sequence
+        options = settings.QUICKDESK_SETTINGS
+        window_start = since_at - timedelta(seconds=options.get('TICKET_CHANGES_SETTLE_SECONDS', 5))
+        comments = TicketComment.objects.filter(
+            ticket_id__in=visible_ids, updated_at__gt=window_start
+        ).select_related('created_by').prefetch_related(
+            Prefetch('attachments', queryset=TicketAttachment.objects.select_related('uploaded_by'))
+        ).order_by('created_at')
+        if request.user.role == 'customer':
+            comments = comments.filter(is_internal=False)
+        activities = TicketActivity.objects.filter(
+            ticket_id__in=visible_ids, created_at__gt=window_start
+        ).select_related('user').order_by('created_at')
+        
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'tickets': ticket_data,
+            # Deleted, or no longer visible to this user
+            'removed_tickets': sorted(str(ticket_id) for ticket_id in changed_ids - visible_ids),
+            'comments': TicketChangeCommentSerializer(comments, many=True, context=context).data,
+            'removed_comments': sorted({
+                str(change['comment_id']) for change in changes
+                if change['action'] == 'comment_deleted' and change['comment_id']
+            }),
+            'activities': TicketChangeActivitySerializer(activities, many=True, context=context).data,
+        })
+    
     @action(detail=True, methods=['post'])
+    @idempotent
     def vote(self, request, pk=None):
         """
         Vote on a ticket (upvote/downvote)
@@ -264,23 +454,10 @@ class TicketViewSet(ModelViewSet):
         if vote_type not in ['up', 'down']:
             return Response({'error': 'Invalid vote type'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check if user already voted
-        existing_vote = TicketVote.objects.filter(ticket=ticket, user=request.user).first()
-        
-        if existing_vote:
-            if existing_vote.vote_type == vote_type:
-                # Remove vote if same type
-                existing_vote.delete()
-                return Response({'message': 'Vote removed'})
-            else:
-                # Change vote type
-                existing_vote.vote_type = vote_type
-                existing_vote.save()
-                return Response({'message': f'{vote_type.title()}vote recorded'})
-        else:
-            # Create new vote
-            TicketVote.objects.create(ticket=ticket, user=request.user, vote_type=vote_type)
-            return Response({'message': f'{vote_type.title()}vote recorded'})
+        result = TicketVoteService.cast_vote(ticket, request.user, vote_type)
+        if result == 'removed':
+            return Response({'message': 'Vote removed'})
+        return Response({'message': f'{vote_type.title()}vote recorded'})
 
 
 # ============================================================================
@@ -293,6 +470,10 @@ class TicketCommentViewSet(ModelViewSet):
     """
     serializer_class = TicketCommentSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['created_at']
+    ordering = ['created_at']
+    cursor_ordering_fields = ['created_at']
     
     def get_queryset(self):
         ticket_id = self.kwargs.get('ticket_pk')
@@ -304,7 +485,9 @@ class TicketCommentViewSet(ModelViewSet):
         if user.role == 'customer':
             queryset = queryset.filter(is_internal=False)
         
-        return queryset.select_related('created_by')
+        return queryset.select_related('created_by').prefetch_related(
+            Prefetch('attachments', queryset=TicketAttachment.objects.select_related('uploaded_by'))
+        )
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -316,6 +499,10 @@ class TicketCommentViewSet(ModelViewSet):
         context['ticket_id'] = self.kwargs.get('ticket_pk')
         return context
     
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         """
         Create comment and update ticket status if agent comments
@@ -323,30 +510,27 @@ class TicketCommentViewSet(ModelViewSet):
         ticket_id = self.kwargs.get('ticket_pk')
         ticket = Ticket.objects.get(id=ticket_id)
         
-        # Save the comment
-        comment = serializer.save(
-            ticket=ticket,
-            created_by=self.request.user
-        )
-        
         # If an agent comments on an open ticket, change status to in_progress
+        new_status = None
         if (self.request.user.role in ['agent', 'admin'] and 
             ticket.status == 'open' and 
-            not comment.is_internal):
-            ticket.status = 'in_progress'
-            ticket.save()
-            
-            # Use the service to handle notifications
-            TicketService.update_ticket(ticket, {'status': 'in_progress'}, self.request.user)
-        
-        # Use the service to handle comment notifications
-        TicketService.add_comment(
-            ticket=ticket,
-            content=comment.content,
-            comment_type=comment.comment_type,
-            user=self.request.user,
-            is_internal=comment.is_internal
-        )
+            not serializer.validated_data.get('is_internal', False)):
+            new_status = 'in_progress'
+        
+        # The serializer adds the comment through TicketService.add_comment,
+        # which also sends its notifications and applies the status change
+        serializer.save(ticket=ticket, new_status=new_status)
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            comment = serializer.save()
+            TicketService.comment_updated(comment)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            comment_id = instance.pk
+            instance.delete()
+            TicketService.comment_removed(instance.ticket_id, comment_id)
 
 
 # ============================================================================
@@ -359,22 +543,33 @@ class TicketAttachmentViewSet(ModelViewSet):
     """
     serializer_class = TicketAttachmentSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['created_at']
+    ordering = ['created_at']
+    cursor_ordering_fields = ['created_at']
     
     def get_queryset(self):
         ticket_id = self.kwargs.get('ticket_pk')
-        return TicketAttachment.objects.filter(ticket_id=ticket_id)
+        return TicketAttachment.objects.filter(ticket_id=ticket_id).select_related('uploaded_by')
     
     def perform_create(self, serializer):
         ticket_id = self.kwargs.get('ticket_pk')
         file = self.request.FILES.get('file')
         
-        serializer.save(
-            ticket_id=ticket_id,
-            uploaded_by=self.request.user,
-            original_filename=file.name,
-            file_size=file.size,
-            content_type=file.content_type
-        )
+        with transaction.atomic():
+            serializer.save(
+                ticket_id=ticket_id,
+                uploaded_by=self.request.user,
+                original_filename=file.name,
+                file_size=file.size,
+                content_type=file.content_type
+            )
+            TicketService.attachment_added(ticket_id)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            TicketService.attachment_removed(instance.ticket_id)
 
 
 # ============================================================================
@@ -390,57 +585,100 @@ class DashboardStatsView(APIView):
     def get(self, request):
         user = request.user
         
-        # Base ticket queryset based on user role
+        # Scope of the shared counters, based on user role
         if user.role == 'customer':
-            base_queryset = Ticket.objects.filter(created_by=user)
+            scope = Q(created_by=user)
         elif user.role == 'agent':
             # Agents see all non-internal tickets for stats
-            base_queryset = Ticket.objects.filter(is_internal=False)
+            scope = Q(is_internal=False)
         else:  # admin
-            base_queryset = Ticket.objects.all()
-        
-        # Calculate statistics
-        total_tickets = base_queryset.count()
-        open_tickets = base_queryset.filter(status='open').count()
-        in_progress_tickets = base_queryset.filter(status='in_progress').count()
-        resolved_tickets = base_queryset.filter(status='resolved').count()
-        closed_tickets = base_queryset.filter(status='closed').count()
-        urgent_tickets = base_queryset.filter(priority__name='urgent').count()
+            scope = Q()
         
-        stats = {
-            'total_tickets': total_tickets,
-            'open_tickets': open_tickets,
-            'in_progress_tickets': in_progress_tickets,
-            'resolved_tickets': resolved_tickets,
-            'closed_tickets': closed_tickets,
-            'urgent_tickets': urgent_tickets,
-        }
+        # One conditionally aggregated query; agents also need their own internal tickets
+        queryset = Ticket.objects.filter(scope | Q(created_by=user)) if user.role == 'agent' else Ticket.objects.filter(scope)
+        aggregates = {'urgent_tickets': Count('pk', filter=scope & Q(priority__name='urgent'))}
+        if user.role == 'customer':
+            # The rollup has no creator dimension, so customers count their own tickets
+            aggregates.update({
+                'total_tickets': Count('pk', filter=scope),
+                'open_tickets': Count('pk', filter=scope & Q(status='open')),
+                'in_progress_tickets': Count('pk', filter=scope & Q(status='in_progress')),
+                'resolved_tickets': Count('pk', filter=scope & Q(status='resolved')),
+                'closed_tickets': Count('pk', filter=scope & Q(status='closed')),
+            })
         
         # Role-specific statistics
-        if user.role == 'customer':
-            stats['my_tickets'] = total_tickets
-        elif user.role == 'agent':
-            # For agents, also show assigned and unassigned tickets
-            stats['assigned_tickets'] = base_queryset.filter(assigned_to=user).count()
-            stats['unassigned_tickets'] = base_queryset.filter(assigned_to__isnull=True).count()
-            stats['my_tickets'] = Ticket.objects.filter(created_by=user).count()
+        if user.role == 'agent':
+            aggregates.update({
+                'assigned_tickets': Count('pk', filter=scope & Q(assigned_to=user)),
+                'unassigned_tickets': Count('pk', filter=scope & Q(assigned_to__isnull=True)),
+                'my_tickets': Count('pk', filter=Q(created_by=user)),
+            })
         
         # Performance metrics for agents and admins
         if user.role in ['agent', 'admin']:
-            # Calculate average response and resolution times
-            resolved_tickets_qs = base_queryset.filter(resolved_at__isnull=False)
-            
-            if resolved_tickets_qs.exists():
-                avg_resolution_time = resolved_tickets_qs.aggregate(
-                    avg_time=Avg('resolved_at') - Avg('created_at')
-                )['avg_time']
-                if avg_resolution_time:
-                    stats['avg_resolution_time'] = str(avg_resolution_time)
+            aggregates.update({
+                'avg_response_time': Avg(
+                    F('first_response_at') - F('created_at'), filter=scope & Q(first_response_at__isnull=False)
+                ),
+                'avg_resolution_time': Avg(
+                    F('resolved_at') - F('created_at'), filter=scope & Q(resolved_at__isnull=False)
+                ),
+            })
+        
+        stats = queryset.aggregate(**aggregates)
+        if user.role == 'customer':
+            stats['my_tickets'] = stats['total_tickets']
+        else:
+            # Status counts come from the daily rollup instead of scanning tickets
+            status_counts = TicketRollupService.status_counts(scope)
+            stats.update({
+                'total_tickets': sum(status_counts.values()),
+                'open_tickets': status_counts.get('open', 0),
+                'in_progress_tickets': status_counts.get('in_progress', 0),
+                'resolved_tickets': status_counts.get('resolved', 0),
+                'closed_tickets': status_counts.get('closed', 0),
+            })
+        for key in ('avg_response_time', 'avg_resolution_time'):
+            if key in stats:
+                if stats[key] is None:
+                    del stats[key]
+                else:
+                    stats[key] = str(stats[key])
         
         serializer = DashboardStatsSerializer(stats)
         return Response(serializer.data)
 
 
+class DashboardTimeseriesView(APIView):
+    """
+    Daily created / resolved / backlog curves from the ticket rollup
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        user = request.user
+        if user.role not in ['agent', 'admin']:
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        params = DashboardTimeseriesSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+        
+        # Agents see all non-internal tickets for stats
+        scope = Q(is_internal=False) if user.role == 'agent' else Q()
+        for field in ('category', 'priority', 'assigned_to'):
+            if filters.get(field):
+                scope &= Q(**{f'{field}_id': filters[field]})
+        
+        series = TicketRollupService.timeseries(filters['date_from'], filters['date_to'], scope)
+        return Response({
+            'date_from': filters['date_from'],
+            'date_to': filters['date_to'],
+            'series': series,
+        })
+
+
 class TicketSearchView(generics.ListAPIView):
     """
     Advanced ticket search endpoint
@@ -448,10 +686,11 @@ class TicketSearchView(generics.ListAPIView):
     serializer_class = TicketListSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    cursor_ordering_fields = ['created_at', 'updated_at', 'last_activity_at', 'priority__level', 'status', 'upvotes']
     
     def get_queryset(self):
         user = self.request.user
-        queryset = Ticket.objects.select_related('created_by', 'assigned_to', 'category', 'priority')
+        queryset = Ticket.objects.all()
         
         # Apply role-based filtering
         if user.role == 'customer':
@@ -468,12 +707,7 @@ class TicketSearchView(generics.ListAPIView):
             
             # Text search
             if filters.get('q'):
-                q = filters['q']
-                queryset = queryset.filter(
-                    Q(subject__icontains=q) |
-                    Q(description__icontains=q) |
-                    Q(ticket_number__icontains=q)
-                )
+                queryset = TicketSearchBackend.search(queryset, filters['q'])
             
             # Status filter
             if filters.get('status'):
@@ -506,11 +740,15 @@ class TicketSearchView(generics.ListAPIView):
             if filters.get('date_to'):
                 queryset = queryset.filter(created_at__lte=filters['date_to'])
             
-            # Sorting
-            sort_by = filters.get('sort_by', '-created_at')
-            queryset = queryset.order_by(sort_by)
+            # Sorting (relevance only applies to text searches)
+            sort_by = filters.get('sort_by') or 'relevance'
+            if sort_by == 'relevance':
+                ordering = ['-search_rank', '-created_at'] if filters.get('q') else ['-created_at']
+            else:
+                ordering = [sort_by]
+            queryset = queryset.order_by(*ordering)
         
-        return queryset
+        return self.get_serializer_class().setup_eager_loading(queryset, self.request)
 
 
 # ============================================================================
@@ -568,68 +806,81 @@ class AdminStatsView(APIView):
         """
         Get comprehensive admin statistics
         """
+        now = timezone.now()
+        month_ago = now - timedelta(days=30)
+        week_ago = now - timedelta(days=7)
+        
         # User statistics
-        total_users = User.objects.count()
-        active_agents = User.objects.filter(role='agent', is_active=True).count()
-        customers = User.objects.filter(role='customer').count()
-        total_agents = User.objects.filter(role='agent').count()
-        
-        # Ticket statistics
-        total_tickets = Ticket.objects.count()
-        open_tickets = Ticket.objects.filter(status='open').count()
-        in_progress_tickets = Ticket.objects.filter(status='in_progress').count()
-        resolved_tickets = Ticket.objects.filter(status='resolved').count()
-        closed_tickets = Ticket.objects.filter(status='closed').count()
+        users = User.objects.aggregate(
+            total_users=Count('pk'),
+            active_agents=Count('pk', filter=Q(role='agent', is_active=True)),
+            customers=Count('pk', filter=Q(role='customer')),
+            total_agents=Count('pk', filter=Q(role='agent')),
+        )
+        
+        # Ticket statistics, read from the daily rollup instead of scanning tickets
+        status_counts = TicketRollupService.status_counts()
+        this_week = TicketRollupService.flow_since(timezone.localdate(week_ago))
+        tickets = {
+            'total_tickets': sum(status_counts.values()),
+            'open_tickets': status_counts.get('open', 0),
+            'in_progress_tickets': status_counts.get('in_progress', 0),
+            'resolved_tickets': status_counts.get('resolved', 0),
+            'closed_tickets': status_counts.get('closed', 0),
+            'tickets_this_week': this_week['created'],
+            'resolved_this_week': this_week['resolved'],
+        }
         
         # Category statistics
         total_categories = Category.objects.filter(is_active=True).count()
         
-        # Performance metrics
-        recent_tickets = Ticket.objects.filter(
-            resolved_at__isnull=False,
-            created_at__gte=timezone.now() - timedelta(days=30)
-        )
-        
         avg_resolution_time = "0h"
         satisfaction_rate = "100%"
         
-        if recent_tickets.exists():
-            # Calculate average resolution time in hours
-            total_resolution_time = sum([
-                (ticket.resolved_at - ticket.created_at).total_seconds() / 3600
-                for ticket in recent_tickets
-                if ticket.resolved_at
-            ])
-            if total_resolution_time > 0:
-                avg_hours = total_resolution_time / recent_tickets.count()
-                avg_resolution_time = f"{avg_hours:.1f}h"
-        
-        # Weekly statistics
-        week_ago = timezone.now() - timedelta(days=7)
-        tickets_this_week = Ticket.objects.filter(created_at__gte=week_ago).count()
-        resolved_this_week = Ticket.objects.filter(
-            resolved_at__gte=week_ago,
-            resolved_at__isnull=False
-        ).count()
+        # Performance metrics
+        avg_resolution = Ticket.objects.filter(
+            resolved_at__isnull=False, created_at__gte=month_ago
+        ).aggregate(avg=Avg(F('resolved_at') - F('created_at')))['avg']
+        if avg_resolution:
+            avg_resolution_time = f"{avg_resolution.total_seconds() / 3600:.1f}h"
+        
+        # Resolution and first-response percentiles for tickets created in the last 30 days
+        recent_tickets = Ticket.objects.filter(created_at__gte=month_ago)
+        breakdown = ['category__name', 'priority__name']
+        resolution_percentiles = TicketAnalyticsService.duration_percentiles(
+            recent_tickets, F('resolved_at') - F('created_at'), breakdown
+        )
+        first_response_percentiles = TicketAnalyticsService.duration_percentiles(
+            recent_tickets, F('first_response_at') - F('created_at'), breakdown
+        )
         
         stats = {
-            'total_users': total_users,
-            'total_tickets': total_tickets,
-            'active_agents': active_agents,
+            **users,
+            **tickets,
             'total_categories': total_categories,
             'avg_resolution_time': avg_resolution_time,
             'satisfaction_rate': satisfaction_rate,
-            'open_tickets': open_tickets,
-            'in_progress_tickets': in_progress_tickets,
-            'resolved_tickets': resolved_tickets,
-            'closed_tickets': closed_tickets,
-            'customers': customers,
-            'total_agents': total_agents,
-            'tickets_this_week': tickets_this_week,
-            'resolved_this_week': resolved_this_week,
+            'resolution_percentiles': self.format_percentiles(resolution_percentiles),
+            'first_response_percentiles': self.format_percentiles(first_response_percentiles),
         }
         
         return Response(stats)
+    
+    @staticmethod
+    def format_percentiles(percentiles):
+        """
+        Express percentile durations in hours, keyed by category and priority name
+        """
+        return {
+            f"by_{field.split('__')[0]}": {
+                name: {
+                    key: round(value.total_seconds() / 3600, 2) if key != 'count' else value
+                    for key, value in group.items()
+                }
+                for name, group in groups.items()
+            }
+            for field, groups in percentiles.items()
+        }
 
 
 # ============================================================================
@@ -638,33 +889,160 @@ class AdminStatsView(APIView):
 
 class NotificationViewSet(ModelViewSet):
     """
-    ViewSet for managing user notifications
+    ViewSet for managing user notifications. The list is the user's inbox:
+    personal notifications merged with the broadcasts they can see.
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = InboxPagination
+    
+    def get_inbox(self, condition=None):
+        return NotificationService.inbox(self.request.user, condition)
     
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        if self.action == 'list':
+            return self.get_inbox()
+        return Notification.objects.filter(user=self.request.user).select_related('ticket').order_by('-created_at')
+    
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return InboxNotificationSerializer
+        return NotificationSerializer
+    
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            item = self.get_inbox(Q(pk=kwargs['pk'])).first()
+        except DjangoValidationError:
+            item = None
+        if item is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_serializer(item).data)
+    
+    def set_broadcast_state(self, **state):
+        """
+        Apply per-user state when the URL's pk is a broadcast; False otherwise
+        """
+        try:
+            return NotificationService.set_broadcast_state(self.request.user, self.kwargs['pk'], **state)
+        except DjangoValidationError:
+            return False
+    
+    def destroy(self, request, *args, **kwargs):
+        # Broadcasts are shared, so deleting one only hides it for this user
+        if self.set_broadcast_state(is_hidden=True):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return super().destroy(request, *args, **kwargs)
+    
+    def perform_update(self, serializer):
+        was_read = serializer.instance.is_read
+        with transaction.atomic():
+            notification = serializer.save()
+            if notification.is_read != was_read:
+                NotificationService.adjust_unread([notification.user_id], -1 if notification.is_read else 1)
     
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """
         Mark notification as read
         """
-        notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        if not self.set_broadcast_state(is_read=True):
+            notification = self.get_object()
+            NotificationService.mark_read(request.user, [notification.pk])
         return Response({'message': 'Notification marked as read'})
     
+    @action(detail=False, methods=['post'])
+    def bulk_mark_read(self, request):
+        """
+        Mark notifications as read by id, or everything up to and including one notification
+        """
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        if 'ids' in serializer.validated_data:
+            count = NotificationService.mark_read(request.user, serializer.validated_data['ids'])
+        else:
+            item = self.get_inbox(Q(pk=serializer.validated_data['up_to'])).first()
+            if item is None:
+                return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+            count = NotificationService.mark_read_until(request.user, item['item_created_at'])
+        
+        return Response({
+            'message': f'{count} notifications marked as read',
+            'unread_count': NotificationService.unread_count(request.user),
+        })
+    
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """
+        Number of unread notifications, for the unread badge
+        """
+        return Response({'unread_count': NotificationService.unread_count(request.user)})
+    
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """
         Mark all notifications as read
         """
-        count = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        count = NotificationService.mark_all_read(request.user)
         return Response({'message': f'{count} notifications marked as read'})
 
 
+# ============================================================================
+# Event Stream Views
+# ============================================================================
+
+async def authenticate_stream(request):
+    """
+    Session or token authentication for plain (non-DRF) async views
+    """
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    try:
+        result = await sync_to_async(TokenAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def stream_events(user):
+    heartbeat = settings.QUICKDESK_SETTINGS.get('EVENT_STREAM_HEARTBEAT_SECONDS', 15)
+    subscription = events.get_backend().subscribe()
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            event = await subscription.get(heartbeat)
+            if event is None:
+                # Comment line, keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+            elif events.is_visible(user, event):
+                data = json.dumps(events.client_payload(event), cls=DjangoJSONEncoder)
+                yield f"event: {event['type']}\ndata: {data}\n\n"
+    finally:
+        subscription.close()
+
+
+@require_http_methods(['GET'])
+async def event_stream(request):
+    """
+    Server-Sent Events stream of the user's notifications and of changes to tickets
+    they can see. Needs an ASGI server: WSGI would buffer the endless stream, so it
+    is refused there. Events are hints: after reconnecting, clients refresh from the
+    REST endpoints.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'The event stream needs an ASGI server.'}, status=501)
+    
+    user = await authenticate_stream(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    
+    response = StreamingHttpResponse(stream_events(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # ============================================================================
 # API Root View
 # ============================================================================
@@ -179,7 +179,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'app.core.pagination.StandardPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -223,6 +223,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
 
 CORS_ALLOW_METHODS = [
@@ -252,6 +253,34 @@ QUICKDESK_SETTINGS = {
     'MAX_FILE_SIZE': config('MAX_FILE_SIZE', default=10485760, cast=int),  # 10MB
     'ALLOWED_FILE_TYPES': ['pdf', 'doc', 'docx', 'txt', 'jpg', 'jpeg', 'png', 'gif'],
     'ENABLE_SMS_NOTIFICATIONS': config('ENABLE_SMS_NOTIFICATIONS', default=False, cast=bool),
+    'TICKET_NUMBER_BLOCK_SIZE': config('TICKET_NUMBER_BLOCK_SIZE', default=20, cast=int),
+    'EMAIL_OUTBOX_BATCH_SIZE': config('EMAIL_OUTBOX_BATCH_SIZE', default=50, cast=int),
+    'EMAIL_OUTBOX_MAX_ATTEMPTS': config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5, cast=int),
+    'EMAIL_OUTBOX_RETRY_SECONDS': config('EMAIL_OUTBOX_RETRY_SECONDS', default=30, cast=int),  # doubles per attempt
+    # Emails a stopped worker left sending are claimed again after this long
+    'EMAIL_OUTBOX_CLAIM_SECONDS': config('EMAIL_OUTBOX_CLAIM_SECONDS', default=300, cast=int),
+    'NOTIFICATION_BATCH_SIZE': config('NOTIFICATION_BATCH_SIZE', default=500, cast=int),
+    # app.core.events.PostgresBackend shares push events between worker processes
+    'EVENT_BACKEND': config('EVENT_BACKEND', default='app.core.events.InProcessBackend'),
+    'EVENT_STREAM_HEARTBEAT_SECONDS': config('EVENT_STREAM_HEARTBEAT_SECONDS', default=15, cast=int),
+    'EVENT_STREAM_MAX_QUEUED': config('EVENT_STREAM_MAX_QUEUED', default=100, cast=int),
+    # Spread vote count updates of tickets with at least VOTE_SHARDING_THRESHOLD votes over
+    # VOTE_COUNTER_SHARDS rows (0 disables); run flush_vote_shards to fold them into the ticket
+    'VOTE_COUNTER_SHARDS': config('VOTE_COUNTER_SHARDS', default=0, cast=int),
+    'VOTE_SHARDING_THRESHOLD': config('VOTE_SHARDING_THRESHOLD', default=1000, cast=int),
+    'TRENDING_HALF_LIFE_HOURS': config('TRENDING_HALF_LIFE_HOURS', default=24, cast=float),
+    'TRENDING_MIN_SCORE': config('TRENDING_MIN_SCORE', default=0.05, cast=float),
+    # Responses to POSTs with an Idempotency-Key are replayed for this long
+    'IDEMPOTENCY_KEY_TTL_HOURS': config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int),
+    # Running requests refresh their key every third of this; a key left unrefreshed this long
+    # (its process died) can be taken over by a retry
+    'IDEMPOTENCY_LOCK_SECONDS': config('IDEMPOTENCY_LOCK_SECONDS', default=60, cast=int),
+    'TICKET_CHANGES_PAGE_SIZE': config('TICKET_CHANGES_PAGE_SIZE', default=500, cast=int),
+    'TICKET_CHANGES_SETTLE_SECONDS': config('TICKET_CHANGES_SETTLE_SECONDS', default=5, cast=int),
+    'TICKET_CHANGES_RETENTION_DAYS': config('TICKET_CHANGES_RETENTION_DAYS', default=30, cast=int),
+    # Bulk updates accept at most TICKET_BULK_MAX_IDS tickets and write them in chunks
+    'TICKET_BULK_MAX_IDS': config('TICKET_BULK_MAX_IDS', default=5000, cast=int),
+    'TICKET_BULK_CHUNK_SIZE': config('TICKET_BULK_CHUNK_SIZE', default=1000, cast=int),
 }
 
 # Celery Configuration (for background tasks)
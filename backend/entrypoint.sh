@@ -14,12 +14,12 @@ python manage.py populate_defaults || echo "Default data population skipped (may
 echo "Creating superuser..."
 python manage.py shell < create_superuser.py || echo "Superuser creation skipped (may already exist)"
 
-echo "Starting gunicorn with detailed logging..."
-exec gunicorn config.wsgi:application \
+# ASGI workers serve the event stream without holding a worker per open connection
+echo "Starting gunicorn (ASGI) with detailed logging..."
+exec gunicorn config.asgi:application \
     --bind 0.0.0.0:$PORT \
     --workers 3 \
-    --worker-class gthread \
-    --worker-connections 1000 \
+    --worker-class uvicorn_worker.UvicornWorker \
     --max-requests 1000 \
     --max-requests-jitter 100 \
     --timeout 30 \